@@ -0,0 +1,235 @@
+"""商品/订单批量导入工具
+
+流式读取 CSV 或 JSONL 文件导入 goods 和 orders 表：按块 executemany，导入期间
+放宽同步和日志设置，导入前删除表上已有的二级索引、导入后统一重建，最后报告每秒行数。
+可选地通过 DBQuery 对导入后的数据库做查询延迟基准测试。
+
+用法:
+  python database/bulk_load.py ecommerce.db --goods goods.csv --orders orders.jsonl
+  python database/bulk_load.py bench.db --generate-goods 1000000 --generate-orders 1000000 --benchmark-lookups 2000
+"""
+import os
+import sys
+import csv
+import json
+import time
+import random
+import sqlite3
+import argparse
+import contextlib
+import io
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from database.init_db import init_db
+
+# 各表导入的列，顺序即 INSERT 的列顺序
+TABLE_COLUMNS = {
+    "goods": ("name", "stock"),
+    "orders": ("id", "status"),
+}
+
+DEFAULT_CHUNK_SIZE = 10000
+ORDER_STATUSES = ("ordered", "shipped", "delivered", "cancelled")
+
+def secondary_indexes(conn: sqlite3.Connection, table: str) -> List[Tuple[str, str]]:
+    """表上已有的二级索引（名称、建索引语句），不含主键自动索引
+
+    脚本里的查询都按主键（goods.name、orders.id）查找，这里不额外建索引；
+    运维按 SQL 审查建议加的索引在导入期间删除、导入后重建，避免逐行维护。
+    """
+    return conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+        (table,)
+    ).fetchall()
+
+def read_records(path: str, columns: Tuple[str, ...]) -> Iterator[Optional[tuple]]:
+    """按扩展名流式读取 CSV（带表头）或 JSONL，缺少列的行产出 None"""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            rows: Iterable[Optional[Dict[str, Any]]] = (_parse_json_line(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            if not isinstance(row, dict):
+                yield None
+                continue
+            values = tuple(row.get(column) for column in columns)
+            yield None if any(value in (None, "") for value in values) else values
+
+def _parse_json_line(line: str) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+def synthetic_records(table: str, count: int) -> Iterator[tuple]:
+    """生成测试用的商品或订单数据"""
+    rng = random.Random(count)
+    for i in range(count):
+        if table == "goods":
+            yield (f"sku-{i:08d}", rng.randint(0, 500))
+        else:
+            yield (f"{100000000 + i}", ORDER_STATUSES[rng.randrange(len(ORDER_STATUSES))])
+
+@contextlib.contextmanager
+def relaxed_pragmas(conn: sqlite3.Connection):
+    """导入期间关闭同步、日志放在内存，结束后恢复为连接池使用的 WAL 设置"""
+    conn.execute("PRAGMA journal_mode=MEMORY")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-262144")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    try:
+        yield conn
+    finally:
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+
+def load_table(conn: sqlite3.Connection, table: str, records: Iterable[Optional[tuple]],
+               chunk_size: int = DEFAULT_CHUNK_SIZE) -> Dict[str, Any]:
+    """按块导入一张表，每块一个事务；返回导入统计"""
+    columns = TABLE_COLUMNS[table]
+    sql = f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+    loaded = 0
+    skipped = 0
+    chunk: List[tuple] = []
+    start = time.perf_counter()
+
+    def write(rows):
+        conn.execute("BEGIN")
+        conn.executemany(sql, rows)
+        conn.execute("COMMIT")
+
+    for record in records:
+        if record is None:
+            skipped += 1
+            continue
+        chunk.append(record)
+        if len(chunk) >= chunk_size:
+            write(chunk)
+            loaded += len(chunk)
+            chunk = []
+    if chunk:
+        write(chunk)
+        loaded += len(chunk)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "table": table,
+        "rows": loaded,
+        "skipped": skipped,
+        "elapsed_s": round(elapsed, 3),
+        "rows_per_s": round(loaded / elapsed) if elapsed > 0 else loaded,
+    }
+
+def bulk_load(db_path: str, sources: Dict[str, Iterable[Optional[tuple]]],
+              chunk_size: int = DEFAULT_CHUNK_SIZE, truncate: bool = False) -> List[Dict[str, Any]]:
+    """导入多张表：先删除表上的二级索引，导入后重建并 ANALYZE"""
+    init_db(db_path)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    results = []
+    try:
+        with relaxed_pragmas(conn):
+            for table, records in sources.items():
+                indexes = secondary_indexes(conn, table)
+                for name, _ in indexes:
+                    conn.execute(f'DROP INDEX IF EXISTS "{name}"')
+                try:
+                    if truncate:
+                        conn.execute(f"DELETE FROM {table}")
+                    result = load_table(conn, table, records, chunk_size)
+                finally:
+                    # 导入失败也要把删除的索引建回来
+                    start = time.perf_counter()
+                    for _, create_sql in indexes:
+                        conn.execute(create_sql)
+                result["index_s"] = round(time.perf_counter() - start, 3)
+                results.append(result)
+            conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return results
+
+def benchmark_lookups(db_path: str, samples: int = 1000) -> Dict[str, Any]:
+    """用脚本里的 DBQuery 写法按主键随机查询商品和订单，返回延迟分位数（毫秒）"""
+    sys.path.insert(0, os.path.join(project_root, "src"))
+    from interpreter import DSLInterpreter
+
+    rng = random.Random(samples)
+    conn = sqlite3.connect(db_path)
+    keys = {}
+    for table, key_column in (("goods", "name"), ("orders", "id")):
+        max_rowid = conn.execute(f"SELECT MAX(rowid) FROM {table}").fetchone()[0] or 0
+        sampled = []
+        for _ in range(samples if max_rowid else 0):
+            row = conn.execute(f"SELECT {key_column} FROM {table} WHERE rowid >= ? LIMIT 1",
+                               (rng.randint(1, max_rowid),)).fetchone()
+            if row:
+                sampled.append(row[0])
+        keys[table] = sampled
+    conn.close()
+
+    queries = {
+        "goods": "SELECT stock FROM goods WHERE name='{key}'",
+        "orders": "SELECT status FROM orders WHERE id='{key}'",
+    }
+    results: Dict[str, Any] = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        interpreter = DSLInterpreter({"module": "ecommerce", "steps": {}}, None, db_path)
+        for table, query in queries.items():
+            if not keys[table]:
+                continue
+            latencies = []
+            for key in keys[table]:
+                interpreter.variables["key"] = key
+                start = time.perf_counter()
+                interpreter._execute_db_query(query, "value", "done")
+                latencies.append(time.perf_counter() - start)
+            interpreter._release_db_conn()
+            latencies.sort()
+            results[table] = {
+                "samples": len(latencies),
+                "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+                "p99_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 3),
+            }
+    return results
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="商品/订单批量导入工具")
+    parser.add_argument("db_path", help="目标数据库路径")
+    parser.add_argument("--goods", help="商品文件（CSV 表头 name,stock 或 JSONL）")
+    parser.add_argument("--orders", help="订单文件（CSV 表头 id,status 或 JSONL）")
+    parser.add_argument("--generate-goods", type=int, default=0, help="生成指定数量的测试商品")
+    parser.add_argument("--generate-orders", type=int, default=0, help="生成指定数量的测试订单")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="每个事务导入的行数")
+    parser.add_argument("--truncate", action="store_true", help="导入前清空目标表")
+    parser.add_argument("--benchmark-lookups", type=int, default=0, help="导入后通过DBQuery随机查询的次数")
+    args = parser.parse_args()
+
+    sources: Dict[str, Iterable[Optional[tuple]]] = {}
+    if args.goods:
+        sources["goods"] = read_records(args.goods, TABLE_COLUMNS["goods"])
+    elif args.generate_goods:
+        sources["goods"] = synthetic_records("goods", args.generate_goods)
+    if args.orders:
+        sources["orders"] = read_records(args.orders, TABLE_COLUMNS["orders"])
+    elif args.generate_orders:
+        sources["orders"] = synthetic_records("orders", args.generate_orders)
+
+    if sources:
+        for result in bulk_load(args.db_path, sources, args.chunk_size, args.truncate):
+            print(f"{result['table']}: 导入 {result['rows']} 行，跳过 {result['skipped']} 行，"
+                  f"耗时 {result['elapsed_s']}s（{result['rows_per_s']} 行/秒），建索引 {result['index_s']}s")
+    elif not args.benchmark_lookups:
+        parser.error("需要指定 --goods/--orders 或 --generate-goods/--generate-orders")
+
+    if args.benchmark_lookups:
+        for table, result in benchmark_lookups(args.db_path, args.benchmark_lookups).items():
+            print(f"DBQuery 查询 {table}: {result['samples']} 次，p50 {result['p50_ms']}ms，p99 {result['p99_ms']}ms")
+
+if __name__ == "__main__":
+    main()
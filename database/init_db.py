@@ -1,39 +1,28 @@
 import sqlite3
 import os
+import sys
+from datetime import datetime
 
-def init_db(db_path=None):
-    """初始化数据库，支持自定义路径"""
-    if db_path is None:
-        # 默认路径为项目根目录下的 database/ecommerce.db
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.dirname(current_dir)
-        db_path = os.path.join(project_root, "database", "ecommerce.db")
-    
-    # 确保数据库目录存在
-    db_dir = os.path.dirname(db_path)
-    if db_dir and not os.path.exists(db_dir):
-        os.makedirs(db_dir)
-    
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
+# 初始库存和订单，只在首次迁移时写入
+SEED_GOODS = [
+    ("phone", 10),
+    ("earphone", 20),
+    ("laptop", 5)
+]
+SEED_ORDERS = [
+    ("1001", "ordered"),
+    ("1002", "shipped"),
+    ("1003", "delivered")
+]
 
-    # 创建商品表
+def _create_tables(cur):
+    """创建商品表和订单表"""
     cur.execute("""
     CREATE TABLE IF NOT EXISTS goods (
         name TEXT PRIMARY KEY,
         stock INTEGER
     )
     """)
-
-    # 初始化库存
-    goods = [
-        ("phone", 10),
-        ("earphone", 20),
-        ("laptop", 5)
-    ]
-    cur.executemany("INSERT OR REPLACE INTO goods (name, stock) VALUES (?, ?)", goods)
-
-    # 创建订单表
     cur.execute("""
     CREATE TABLE IF NOT EXISTS orders (
         id TEXT PRIMARY KEY,
@@ -41,18 +30,98 @@ def init_db(db_path=None):
     )
     """)
 
-    # 初始订单
-    orders = [
-        ("1001", "ordered"),
-        ("1002", "shipped"),
-        ("1003", "delivered")
-    ]
-    cur.executemany("INSERT OR REPLACE INTO orders (id, status) VALUES (?, ?)", orders)
+def _seed_data(cur):
+    """写入初始数据，不覆盖已有的行"""
+    cur.executemany("INSERT OR IGNORE INTO goods (name, stock) VALUES (?, ?)", SEED_GOODS)
+    cur.executemany("INSERT OR IGNORE INTO orders (id, status) VALUES (?, ?)", SEED_ORDERS)
+
+# 按版本号顺序执行的迁移，已发布的迁移不要修改，新的变更追加在末尾
+MIGRATIONS = [
+    (1, "创建商品表和订单表", _create_tables),
+    (2, "写入初始库存和订单", _seed_data),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def default_db_path():
+    """默认路径为项目根目录下的 database/ecommerce.db"""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.dirname(current_dir)
+    return os.path.join(project_root, "database", "ecommerce.db")
+
+def schema_version(conn):
+    """读取当前结构版本，尚未迁移过的数据库为 0"""
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
 
-    conn.commit()
-    conn.close()
+def migrate(conn):
+    """执行所有未应用的迁移，返回应用的版本号列表"""
+    cur = conn.cursor()
+    cur.execute("BEGIN IMMEDIATE")
+    try:
+        cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT
+        )
+        """)
+        # 拿到写锁后重新读取版本，其他进程可能已经完成迁移
+        current = schema_version(conn)
+        applied = []
+        for version, description, migration in MIGRATIONS:
+            if version <= current:
+                continue
+            migration(cur)
+            cur.execute("INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                        (version, description, datetime.now().isoformat(timespec="seconds")))
+            applied.append(version)
+        cur.execute("COMMIT")
+        return applied
+    except Exception:
+        cur.execute("ROLLBACK")
+        raise
+
+def reset_seed_data(conn):
+    """把初始库存和订单恢复为种子数据（测试用）"""
+    cur = conn.cursor()
+    cur.execute("BEGIN")
+    cur.executemany("INSERT OR REPLACE INTO goods (name, stock) VALUES (?, ?)", SEED_GOODS)
+    cur.executemany("INSERT OR REPLACE INTO orders (id, status) VALUES (?, ?)", SEED_ORDERS)
+    cur.execute("COMMIT")
+
+def init_db(db_path=None, reset=False):
+    """初始化数据库，支持自定义路径
+
+    已是最新版本时只读取一次 schema_version，不写数据库。每次调用都会读取，
+    不在进程内缓存结果：数据库文件被删除重建、内存数据库被释放后再次打开时，
+    都需要重新迁移。reset 为 True 时额外把种子数据恢复到初始值。
+    """
+    if db_path is None:
+        db_path = default_db_path()
+
+    # 确保数据库目录存在；URI（如共享内存数据库 file:/name?vfs=memdb）直接交给 SQLite
+    uri = db_path.startswith("file:")
+    db_dir = os.path.dirname(db_path)
+    if not uri and db_dir and not os.path.exists(db_dir):
+        os.makedirs(db_dir)
 
-    print(f"数据库初始化完成: {db_path}")
+    conn = sqlite3.connect(db_path, isolation_level=None, uri=uri)
+    try:
+        if schema_version(conn) < LATEST_VERSION:
+            applied = migrate(conn)
+            if applied:
+                print(f"数据库迁移完成: {db_path}，应用版本 {applied}")
+        if reset:
+            reset_seed_data(conn)
+            print(f"数据库种子数据已重置: {db_path}")
+    finally:
+        conn.close()
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    # 用法: python init_db.py [数据库路径] [--reset]
+    args = [arg for arg in sys.argv[1:] if arg != "--reset"]
+    init_db(args[0] if args else None, reset="--reset" in sys.argv[1:])
+    print("数据库初始化完成")
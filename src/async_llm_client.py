@@ -0,0 +1,155 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, List, Optional
+
+from llm_client import ZhipuAIClient, DEFAULT_HTTP_POOL_SIZE
+from intent_cache import IntentCache
+from rate_limiter import PRIORITY_REPLY
+
+# 同时发往API的请求数上限，默认与HTTP连接池大小一致
+DEFAULT_MAX_IN_FLIGHT = DEFAULT_HTTP_POOL_SIZE
+
+
+class AsyncLLMClient:
+    """LLM客户端的 asyncio 接口
+
+    请求在有限大小的线程池中通过底层客户端的连接池发出，信号量限制同时在途的
+    请求数；同一时刻到达的相同意图识别请求（规范化输入加候选集合相同）合并为
+    一次上游调用，所有调用方得到同一个结果。实例只能在一个事件循环中使用。
+    """
+
+    def __init__(self, client: ZhipuAIClient = None, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        self.client = client or ZhipuAIClient(pool_size=max_in_flight)
+        self.max_in_flight = max_in_flight
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="llm-request")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+
+        # 统计（只在事件循环线程中修改）
+        self.upstream_calls = 0
+        self.coalesced = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+
+    async def _call(self, func, *args):
+        """在并发上限内调用底层客户端的同步方法"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        async with self._semaphore:
+            self.upstream_calls += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self._executor, func, *args)
+            finally:
+                self.in_flight -= 1
+
+    async def recognize_intent(self, user_input: str, candidate_intents: List[str],
+                               context: Dict[str, Any] = None) -> str:
+        """意图识别，合并相同的并发请求（用量计入发起上游调用的会话）"""
+        intent_cache = getattr(self.client, "intent_cache", None)
+        if intent_cache is not None:
+            cached = intent_cache.get(user_input, candidate_intents)
+            if cached is not None:
+                return cached
+
+        key = IntentCache.make_key(user_input, candidate_intents)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._call(self.client.recognize_intent, user_input, list(candidate_intents),
+                                                  context))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield：某个调用方被取消不影响其他等待同一结果的调用方
+        return await asyncio.shield(task)
+
+    async def generate_reply(self, user_input: str, context: Dict[str, Any] = None) -> str:
+        """生成智能回复（上下文各不相同，不做合并）"""
+        return await self._call(self.client.generate_reply, user_input, context)
+
+    async def complete(self, prompt: str, temperature: float = 0.1, priority: int = PRIORITY_REPLY,
+                       contexts: List[Dict[str, Any]] = None) -> str:
+        """发送单条提示（如批量意图识别）"""
+        return await self._call(self.client.complete, prompt, temperature, priority, contexts)
+    
+    async def stream_reply(self, user_input: str, context: Dict[str, Any] = None,
+                           on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """流式生成回复，占用一个并发名额直到流结束；on_delta 在请求线程中调用"""
+        return await self._call(self.client.stream_reply, user_input, context, on_delta)
+
+    def stats(self) -> Dict[str, Any]:
+        """并发统计"""
+        return {
+            "max_in_flight": self.max_in_flight,
+            "upstream_calls": self.upstream_calls,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+        }
+
+    def close(self):
+        """关闭线程池和底层客户端"""
+        self._executor.shutdown(wait=True)
+        self.client.close()
+
+
+class SyncLLMClient:
+    """AsyncLLMClient 的同步外观
+
+    在后台线程运行事件循环，会话线程调用 recognize_intent / generate_reply 时
+    把协程提交到该循环并等待结果，接口与 ZhipuAIClient 相同，可直接交给解释器。
+    多个会话线程共享一个实例，才能共享并发上限和请求合并。
+    """
+
+    def __init__(self, client: ZhipuAIClient = None, max_in_flight: int = DEFAULT_MAX_IN_FLIGHT):
+        self.async_client = AsyncLLMClient(client, max_in_flight)
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="llm-event-loop", daemon=True)
+        self._thread.start()
+
+    def __getattr__(self, name):
+        # 其余属性（api_key、intent_cache、warm_up 等）取自底层客户端
+        if name == "async_client":
+            raise AttributeError(name)
+        return getattr(self.async_client.client, name)
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def recognize_intent(self, user_input: str, candidate_intents: List[str],
+                         context: Dict[str, Any] = None) -> str:
+        """意图识别"""
+        return self._run(self.async_client.recognize_intent(user_input, candidate_intents, context))
+
+    def generate_reply(self, user_input: str, context: Dict[str, Any] = None) -> str:
+        """生成智能回复"""
+        return self._run(self.async_client.generate_reply(user_input, context))
+
+    def complete(self, prompt: str, temperature: float = 0.1, priority: int = PRIORITY_REPLY,
+                 contexts: List[Dict[str, Any]] = None) -> str:
+        """发送单条提示"""
+        return self._run(self.async_client.complete(prompt, temperature, priority, contexts))
+    
+    def stream_reply(self, user_input: str, context: Dict[str, Any] = None,
+                     on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """流式生成智能回复"""
+        return self._run(self.async_client.stream_reply(user_input, context, on_delta))
+
+    def stats(self) -> Dict[str, Any]:
+        """并发统计"""
+        return self._run(self._stats())
+
+    async def _stats(self):
+        return self.async_client.stats()
+
+    def close(self):
+        """停止事件循环并关闭底层客户端"""
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+        self.loop.close()
+        self.async_client.close()
@@ -0,0 +1,302 @@
+import sqlite3
+import threading
+import queue
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+# 连接初始化参数
+DEFAULT_POOL_SIZE = 8
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+DEFAULT_CACHE_SIZE_KB = 8192
+
+# UPDATE/INSERT/DELETE ... RETURNING 需要 SQLite 3.35+
+SUPPORTS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+def is_uri(db_path: str) -> bool:
+    """是否为 SQLite URI（如 memory_db_uri 返回的内存数据库）"""
+    return db_path.startswith("file:")
+
+
+def memory_db_uri(name: str) -> str:
+    """进程内共享的命名内存数据库 URI
+
+    使用 memdb VFS：同名的所有连接看到同一个数据库，并按普通数据库加锁；
+    最后一个连接关闭后数据库即被释放，需要时用 open_memory_db 保持一个锚连接。
+    """
+    return f"file:/{name}?vfs=memdb"
+
+
+def connect(db_path: str, busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+            cache_size_kb: int = DEFAULT_CACHE_SIZE_KB, **kwargs) -> sqlite3.Connection:
+    """打开一个按统一参数初始化的连接：WAL、busy_timeout、synchronous=NORMAL、页缓存
+
+    内存数据库不支持 WAL，journal_mode 会保持为 memory。
+    """
+    kwargs.setdefault("uri", is_uri(db_path))
+    conn = sqlite3.connect(db_path, timeout=busy_timeout_ms / 1000, check_same_thread=False, **kwargs)
+    cursor = conn.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+    cursor.execute("PRAGMA journal_mode = WAL")
+    cursor.execute("PRAGMA synchronous = NORMAL")
+    cursor.execute(f"PRAGMA cache_size = -{int(cache_size_kb)}")
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    cursor.close()
+    return conn
+
+
+def statement_result(cursor: sqlite3.Cursor) -> Any:
+    """写语句的结果：带 RETURNING 时为第一行返回值（单列取标量），否则为影响行数"""
+    if cursor.description is None:
+        return cursor.rowcount
+    # 必须把 RETURNING 的结果取完，语句才算执行结束
+    rows = cursor.fetchall()
+    if not rows:
+        return None
+    return rows[0][0] if len(rows[0]) == 1 else rows[0]
+
+
+class PoolTimeoutError(Exception):
+    """等待连接池超时"""
+    pass
+
+
+class ConnectionPool:
+    """有界的SQLite连接池，供多个会话共享
+
+    每个连接在创建时设置 WAL、busy_timeout、synchronous=NORMAL 和页缓存大小。
+    连接在同一时刻只属于一个线程：同一线程重复 acquire 会拿到同一个连接（可重入），
+    只有持有者线程才能归还连接。
+    """
+
+    def __init__(self, db_path: str, size: int = DEFAULT_POOL_SIZE,
+                 busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+                 cache_size_kb: int = DEFAULT_CACHE_SIZE_KB,
+                 checkout_timeout: float = 30.0):
+        if size < 1:
+            raise ValueError("连接池大小必须大于0")
+        self.db_path = db_path
+        self.size = size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_size_kb = cache_size_kb
+        self.checkout_timeout = checkout_timeout
+
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        # 线程ident -> [连接, 重入深度]
+        self._owners: Dict[int, list] = {}
+        self._closed = False
+
+        # 监控指标
+        self._checkouts = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _connect(self) -> sqlite3.Connection:
+        """创建并初始化一个新连接"""
+        # 连接会在不同线程间流转，由连接池保证同一时刻只有一个线程使用
+        conn = connect(self.db_path, self.busy_timeout_ms, self.cache_size_kb)
+        cursor = conn.cursor()
+        self._warm(cursor)
+        cursor.close()
+        return conn
+
+    @staticmethod
+    def _warm(cursor: sqlite3.Cursor):
+        """预热：加载schema并把各表的根页读入页缓存"""
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+        for (table,) in cursor.fetchall():
+            cursor.execute(f'SELECT 1 FROM "{table}" LIMIT 1').fetchall()
+
+    def warm_up(self, count: Optional[int] = None):
+        """启动时预先建立连接，避免首个请求承担建连开销"""
+        count = self.size if count is None else min(count, self.size)
+        with self._lock:
+            while self._created < count:
+                self._idle.put(self._connect())
+                self._created += 1
+
+    def acquire(self, timeout: Optional[float] = None) -> sqlite3.Connection:
+        """借出连接；同一线程重复调用返回同一连接"""
+        if self._closed:
+            raise PoolTimeoutError("连接池已关闭")
+
+        ident = threading.get_ident()
+        with self._lock:
+            owned = self._owners.get(ident)
+            if owned:
+                owned[1] += 1
+                return owned[0]
+            self._checkouts += 1
+            conn = None
+            create = False
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                if self._created < self.size:
+                    self._created += 1
+                    create = True
+
+        if conn is None:
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                conn = self._wait_for_connection(timeout)
+
+        with self._lock:
+            self._owners[ident] = [conn, 1]
+        return conn
+
+    def _wait_for_connection(self, timeout: Optional[float]) -> sqlite3.Connection:
+        """连接全部借出时排队等待，并记录等待时间"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeoutError(f"等待数据库连接超时({timeout}s): {self.db_path}")
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._waits += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        """归还连接；只有持有者线程可以归还"""
+        ident = threading.get_ident()
+        with self._lock:
+            owned = self._owners.get(ident)
+            if not owned or owned[0] is not conn:
+                raise RuntimeError("只能由借出连接的线程归还连接")
+            owned[1] -= 1
+            if owned[1] > 0:
+                return
+            del self._owners[ident]
+
+        # 回滚未提交的事务，避免把脏状态交给下一个使用者
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """with 语句形式的借还"""
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self) -> Dict[str, Any]:
+        """连接池监控指标"""
+        with self._lock:
+            return {
+                "db_path": self.db_path,
+                "size": self.size,
+                "created": self._created,
+                "in_use": len(self._owners),
+                "idle": self._idle.qsize(),
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "total_wait_ms": round(self._total_wait * 1000, 3),
+                "avg_wait_ms": round(self._total_wait * 1000 / self._waits, 3) if self._waits else 0.0,
+                "max_wait_ms": round(self._max_wait * 1000, 3),
+            }
+
+    def close(self):
+        """关闭所有空闲连接；借出中的连接在归还时关闭"""
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+# 按数据库路径共享的连接池
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path: str, **kwargs) -> ConnectionPool:
+    """获取（必要时创建）某个数据库的共享连接池"""
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None or pool._closed:
+            pool = ConnectionPool(db_path, **kwargs)
+            _pools[db_path] = pool
+        return pool
+
+
+def close_all_pools():
+    """关闭全部共享连接池"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+# 命名内存数据库的锚连接：保证会话之间没有连接时数据库也不会被释放
+_memory_anchors: Dict[str, sqlite3.Connection] = {}
+_memory_lock = threading.Lock()
+
+
+def open_memory_db(name: str) -> str:
+    """创建（或复用）命名内存数据库并保持其存活，返回可传给解释器和 init_db 的 URI
+
+    name 也可以直接是 memory_db_uri 形式的 URI。
+    """
+    uri = name if is_uri(name) else memory_db_uri(name)
+    with _memory_lock:
+        if uri not in _memory_anchors:
+            _memory_anchors[uri] = sqlite3.connect(uri, uri=True, check_same_thread=False)
+    return uri
+
+
+def close_memory_db(uri: str):
+    """关闭该内存数据库的连接池和锚连接，数据随之释放"""
+    with _pools_lock:
+        pool = _pools.pop(uri, None)
+    if pool is not None:
+        pool.close()
+    with _memory_lock:
+        anchor = _memory_anchors.pop(uri, None)
+    if anchor is not None:
+        anchor.close()
+
+
+def snapshot_db(db_path: str) -> bytes:
+    """把数据库完整序列化为字节串，可用作测试夹具"""
+    conn = sqlite3.connect(db_path, uri=is_uri(db_path))
+    try:
+        return conn.serialize()
+    finally:
+        conn.close()
+
+
+def restore_db(db_path: str, snapshot: bytes):
+    """用快照覆盖数据库内容；其他连接无需重新打开"""
+    source = sqlite3.connect(":memory:")
+    target = sqlite3.connect(db_path, uri=is_uri(db_path))
+    try:
+        source.deserialize(snapshot)
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
@@ -6,7 +6,8 @@ from typing import Dict, List, Any, Optional
 tokens = (
     'MODULE', 'STEP', 'SPEAK', 'LISTEN', 'CASE', 'DEFAULT', 'GOTO', 
     'AIREPLY', 'EXIT', 'LOCK', 'UNLOCK', 'DBQUERY', 'DBEXEC', 'IF', 
-    'ASSIGN', 'STRING', 'ID', 'ARROW', 'COMPARE', 'NUMBER'
+    'ASSIGN', 'CACHE', 'ROWS', 'FOREACH', 'IN', 'ENDFOREACH', 'RESERVE', 'RELEASE',
+    'SYNONYM', 'STRING', 'ID', 'ARROW', 'COMPARE', 'NUMBER', 'COMMA'
 )
 
 # 保留字
@@ -26,11 +27,20 @@ reserved = {
     'DBExec': 'DBEXEC',
     'If': 'IF',
     'assign': 'ASSIGN',
+    'cache': 'CACHE',
+    'rows': 'ROWS',
+    'ForEach': 'FOREACH',
+    'in': 'IN',
+    'EndForEach': 'ENDFOREACH',
+    'Reserve': 'RESERVE',
+    'Release': 'RELEASE',
+    'Synonym': 'SYNONYM',
 }
 
 # 运算符
 t_ARROW = r'->'
 t_COMPARE = r'<=|>=|==|!=|<|>'
+t_COMMA = r','
 
 # 忽略字符
 t_ignore = ' \t'
@@ -102,6 +112,7 @@ def p_action(p):
     '''action : speak_action
               | listen_action
               | case_action
+              | synonym_action
               | default_action
               | goto_action
               | aireply_action
@@ -111,6 +122,9 @@ def p_action(p):
               | dbquery_action
               | dbexec_action
               | if_action
+              | foreach_action
+              | reserve_action
+              | release_action
               | listen_assign_action'''
     p[0] = p[1]
 
@@ -130,6 +144,19 @@ def p_case_action(p):
     '''case_action : CASE STRING ARROW GOTO ID'''
     p[0] = {'type': 'Case', 'pattern': p[2], 'target': p[5]}
 
+def p_synonym_action(p):
+    '''synonym_action : SYNONYM STRING string_list'''
+    # 第一个字符串是 Case 模式，其余是它的同义说法
+    p[0] = {'type': 'Synonym', 'pattern': p[2], 'phrases': p[3]}
+
+def p_string_list(p):
+    '''string_list : STRING string_list
+                   | STRING'''
+    if len(p) == 2:
+        p[0] = [p[1]]
+    else:
+        p[0] = [p[1]] + p[2]
+
 def p_default_action(p):
     '''default_action : DEFAULT ARROW GOTO ID'''
     p[0] = {'type': 'Default', 'target': p[4]}
@@ -155,12 +182,71 @@ def p_unlock_action(p):
     p[0] = {'type': 'Unlock', 'resource': p[2]}
 
 def p_dbquery_action(p):
-    '''dbquery_action : DBQUERY STRING ARROW GOTO ID ID'''
+    '''dbquery_action : DBQUERY STRING ARROW GOTO ID id_list
+                      | DBQUERY STRING ARROW GOTO ID id_list query_options'''
     p[0] = {'type': 'DBQuery', 'query': p[2], 'variable': p[6], 'target': p[5]}
+    if len(p) == 8:
+        p[0].update(p[7])
+
+def p_query_options(p):
+    '''query_options : query_option
+                     | query_option query_options'''
+    p[0] = dict(p[1])
+    if len(p) == 3:
+        p[0].update(p[2])
+
+def p_query_option(p):
+    '''query_option : CACHE NUMBER
+                    | ROWS
+                    | ROWS NUMBER'''
+    if p[1] == 'cache':
+        # 结果缓存有效期（秒），0 表示该查询不缓存
+        p[0] = {'cache_ttl': p[2]}
+    else:
+        # 返回全部行（列表，每行按列名存成字典），可指定最多保留的行数
+        p[0] = {'multi_row': True}
+        if len(p) == 3:
+            p[0]['max_rows'] = p[2]
 
 def p_dbexec_action(p):
-    '''dbexec_action : DBEXEC STRING'''
+    '''dbexec_action : DBEXEC STRING
+                     | DBEXEC STRING ARROW ASSIGN id_list'''
     p[0] = {'type': 'DBExec', 'query': p[2]}
+    if len(p) == 6:
+        # 影响行数（或 RETURNING 的返回值）存入变量
+        p[0]['variable'] = p[5]
+
+def p_id_list(p):
+    '''id_list : ID
+               | ID COMMA id_list'''
+    # 单个变量保持字符串，多个变量为列表，按列依次绑定
+    if len(p) == 2:
+        p[0] = p[1]
+    else:
+        rest = p[3] if isinstance(p[3], list) else [p[3]]
+        p[0] = [p[1]] + rest
+
+def p_foreach_action(p):
+    '''foreach_action : FOREACH ID IN ID actions ENDFOREACH'''
+    p[0] = {'type': 'ForEach', 'item': p[2], 'source': p[4], 'actions': p[5]}
+
+def p_reserve_action(p):
+    '''reserve_action : RESERVE STRING quantity
+                      | RESERVE STRING quantity ARROW ASSIGN ID'''
+    p[0] = {'type': 'Reserve', 'sku': p[2], 'quantity': p[3]}
+    if len(p) == 7:
+        # 预留成功存 1，库存不足存 0
+        p[0]['variable'] = p[6]
+
+def p_release_action(p):
+    '''release_action : RELEASE STRING quantity'''
+    p[0] = {'type': 'Release', 'sku': p[2], 'quantity': p[3]}
+
+def p_quantity(p):
+    '''quantity : NUMBER
+                | ID'''
+    # 数字为固定数量，标识符为变量名
+    p[0] = p[1]
 
 def p_if_action(p):
     '''if_action : IF condition ARROW GOTO ID'''
@@ -4,8 +4,8 @@ import threading
 import queue
 import os
 import sys
-import sqlite3
 import uuid
+import argparse
 import time
 from datetime import datetime
 from typing import Dict, Any
@@ -17,34 +17,46 @@ sys.path.insert(0, project_root)
 
 from src.dsl_parser import load_script_from_file
 from src.interpreter import DSLInterpreter
-from src.llm_client import ZhipuAIClient
+from src.llm_client import CircuitBreaker, ResilientCaller, RetryPolicy
+from src.llm_backends import LLMBackend, BACKEND_NAMES, build_backend, http_clients, is_error_reply
+from src.intent_cache import IntentCache
+from src.async_llm_client import SyncLLMClient, DEFAULT_MAX_IN_FLIGHT
+from src.intent_batcher import IntentBatcher
+from src.rate_limiter import LLMRateLimiter
+from src.llm_usage import UsageTracker
+from src.query_cache import QueryCache
+from src.write_batcher import WriteBatcher
 from database.init_db import init_db
 
 class ThreadSafeDSLInterpreter(DSLInterpreter):
     """线程安全的DSL解释器"""
     
-    def __init__(self, script_ast: Dict[str, Any], llm_client: ZhipuAIClient = None, db_path: str = None):
-        super().__init__(script_ast, llm_client, db_path)
-        # 不在初始化时连接数据库，在运行线程中连接
-        self.db_path = db_path
-        self.db_conn = None
+    def __init__(self, script_ast: Dict[str, Any], llm_client: LLMBackend = None, db_path: str = None,
+                 query_cache: QueryCache = None, write_batcher: WriteBatcher = None):
+        # 数据库连接由共享连接池按步骤借出，可在会话线程中直接使用
+        super().__init__(script_ast, llm_client, db_path, query_cache, write_batcher)
         self.gui_output_callback = None  # GUI输出回调
+        self.gui_stream_callback = None  # GUI流式输出回调 (增量文本, 是否结束)
     
     def set_gui_output_callback(self, callback):
         """设置GUI输出回调函数"""
         self.gui_output_callback = callback
     
-    def run(self):
-        """运行解释器 - 在线程中连接数据库"""
-        # 在线程中连接数据库
-        if self.db_path and not self.db_conn:
-            try:
-                self.db_conn = sqlite3.connect(self.db_path)
-                print(f"数据库连接成功: {self.db_path}")
-            except Exception as e:
-                print(f"数据库连接失败: {e}")
-        
-        super().run()
+    def set_gui_stream_callback(self, callback):
+        """设置GUI流式输出回调函数，设置后AI回复边生成边显示"""
+        self.gui_stream_callback = callback
+        self.stream_replies = callback is not None
+    
+    def _begin_partial_output(self):
+        pass
+    
+    def _output_partial(self, delta: str):
+        if self.gui_stream_callback:
+            self.gui_stream_callback(delta, False)
+    
+    def _end_partial_output(self):
+        if self.gui_stream_callback:
+            self.gui_stream_callback("", True)
     
     def _execute_speak(self, message: str) -> None:
         """重写说话动作，使用GUI输出并替换变量"""
@@ -73,21 +85,24 @@ class ThreadSafeDSLInterpreter(DSLInterpreter):
             if self.gui_output_callback:
                 self.gui_output_callback("AI功能未启用")
             return None
+        
+        if not self._llm_available("reply"):
+            if self.gui_output_callback:
+                self.gui_output_callback("抱歉，AI服务暂时不可用，请稍后再试")
+            return None
             
         if self.gui_output_callback:
             self.gui_output_callback("正在思考中...")
         
-        context = {
-            "conversation_history": self.conversation_history,
-            "current_step": self.current_step,
-            "script_module": self.script.get('module', ''),
-            "variables": self.variables
-        }
+        context = self._llm_context()
         
         try:
-            reply = self.llm_client.generate_reply(user_input, context)
-            if self.gui_output_callback:
-                self.gui_output_callback(reply)
+            if self.stream_replies and hasattr(self.llm_client, "stream_reply"):
+                reply = self._stream_ai_reply(user_input, context)
+            else:
+                reply = self.llm_client.generate_reply(user_input, context)
+                if self.gui_output_callback:
+                    self.gui_output_callback(reply)
             
             self.conversation_history.append({
                 "role": "assistant",
@@ -99,14 +114,6 @@ class ThreadSafeDSLInterpreter(DSLInterpreter):
                 self.gui_output_callback(f"抱歉，AI服务暂时不可用: {e}")
         
         return None
-    
-    def __del__(self):
-        """清理资源"""
-        if self.db_conn:
-            try:
-                self.db_conn.close()
-            except:
-                pass
 
 class UserSession:
     """用户会话类"""
@@ -186,10 +193,18 @@ class SessionManager:
 class DSLChatbot:
     """DSL智能客服主类"""
     
-    def __init__(self, script_path: str, use_ai: bool = True, db_path: str = None):
+    def __init__(self, script_path: str, use_ai: bool = True, db_path: str = None,
+                 llm_client: LLMBackend = None, llm_intent_backend: str = None, llm_reply_backend: str = None,
+                 llm_backend_options: Dict[str, Dict[str, Any]] = None):
         self.script_path = script_path
         self.use_ai = use_ai
         self.db_path = db_path
+        # 传入的客户端由调用方检查过可用性，多个会话共享其连接池
+        self.shared_llm_client = llm_client
+        # 没有传入客户端时按这些配置创建后端（取值同 build_backend）
+        self.llm_intent_backend = llm_intent_backend
+        self.llm_reply_backend = llm_reply_backend
+        self.llm_backend_options = llm_backend_options
         self.llm_client = None
         self.interpreter = None
         self.script_ast = None
@@ -206,12 +221,15 @@ class DSLChatbot:
             print(f"脚本加载成功 - 模块: {module_name}")
             
             # 初始化LLM客户端
-            if self.use_ai:
-                self.llm_client = ZhipuAIClient()
+            if self.use_ai and self.shared_llm_client:
+                self.llm_client = self.shared_llm_client
+            elif self.use_ai:
+                self.llm_client = build_backend(self.llm_intent_backend, self.llm_reply_backend,
+                                                options=self.llm_backend_options)
                 # 测试AI连接
                 try:
                     test_result = self.llm_client.recognize_intent("测试", ["测试"])
-                    if "错误" in test_result or "未启用" in test_result:
+                    if is_error_reply(test_result):
                         print("AI服务不可用，将使用规则模式")
                         self.llm_client = None
                     else:
@@ -220,18 +238,7 @@ class DSLChatbot:
                     print(f"AI服务初始化失败: {e}")
                     self.llm_client = None
             
-            # 初始化数据库（如果需要）
-            if self.db_path:
-                try:
-                    db_dir = os.path.dirname(self.db_path)
-                    if db_dir and not os.path.exists(db_dir):
-                        os.makedirs(db_dir)
-                    init_db(self.db_path)
-                    print("数据库初始化成功")
-                except Exception as e:
-                    print(f"数据库初始化失败: {e}")
-                    self.db_path = None
-            
+            # 数据库结构在界面启动时已检查过，创建会话不写数据库
             return True
             
         except Exception as e:
@@ -241,7 +248,9 @@ class DSLChatbot:
 class MultiUserDSLChatbotGUI:
     """多用户DSL智能客服图形界面"""
     
-    def __init__(self, root):
+    def __init__(self, root, intent_batch_window_ms: float = None, rate_limiter: LLMRateLimiter = None,
+                 usage_tracker: UsageTracker = None, llm_intent_backend: str = None,
+                 llm_reply_backend: str = None, llm_backend_options: Dict[str, Dict[str, Any]] = None):
         self.root = root
         self.root.title("多用户DSL智能客服系统")
         self.root.geometry("1000x700")
@@ -253,6 +262,34 @@ class MultiUserDSLChatbotGUI:
         # 输出队列映射：user_id -> output_queue
         self.output_queues: Dict[str, queue.Queue] = {}
         
+        # 所有会话共享的查询结果缓存
+        self.query_cache = QueryCache()
+        
+        # 正在流式输出AI回复的用户
+        self.streaming_users = set()
+        
+        # 所有会话共享的LLM客户端（及其HTTP连接池），首个启用AI的会话创建
+        self.llm_client = None
+        self.llm_client_checked = False
+        self.llm_client_lock = threading.Lock()
+        # 意图识别和回复生成使用的后端及各后端的地址、模型（见 build_backend）
+        self.llm_intent_backend = llm_intent_backend
+        self.llm_reply_backend = llm_reply_backend
+        self.llm_backend_options = llm_backend_options
+        # 设置后，各会话同一时间窗口内的意图识别合并为一次批量请求
+        self.intent_batch_window_ms = intent_batch_window_ms
+        # 所有会话共用API配额，超出时意图识别优先
+        self.rate_limiter = rate_limiter
+        # 按会话和步骤统计AI用量，可设置每个会话的token预算
+        self.usage_tracker = usage_tracker
+        
+        # 启动时执行一次数据库迁移检查，之后创建会话不再访问数据库结构
+        self.db_path = os.path.join(project_root, "database", "ecommerce.db")
+        try:
+            init_db(self.db_path)
+        except Exception as e:
+            print(f"数据库初始化失败: {e}")
+        
         # 创建界面
         self.create_widgets()
         
@@ -378,6 +415,48 @@ class MultiUserDSLChatbotGUI:
         
         self.status_var.set(f"已创建用户 {user_id} - 会话已启动")
     
+    def get_shared_llm_client(self):
+        """返回共享的LLM客户端，首次调用时检查AI服务并预热连接；不可用时返回None"""
+        with self.llm_client_lock:
+            if self.llm_client_checked:
+                return self.llm_client
+            self.llm_client_checked = True
+            
+            backend = build_backend(self.llm_intent_backend, self.llm_reply_backend,
+                                    options=self.llm_backend_options)
+            try:
+                test_result = backend.recognize_intent("测试", ["测试"])
+                if is_error_reply(test_result):
+                    print("AI服务不可用，将使用规则模式")
+                    backend.close()
+                    return None
+            except Exception as e:
+                print(f"AI服务初始化失败: {e}")
+                backend.close()
+                return None
+            
+            # 各会话的相同说法共用一份意图缓存
+            intent_cache = IntentCache()
+            clients = http_clients(backend)
+            for client in clients:
+                # 测试请求已建立一个连接，再为并发会话多预热几个
+                client.warm_up(min(4, client.pool_size))
+                client.intent_cache = intent_cache
+                client.rate_limiter = self.rate_limiter
+                client.usage_tracker = self.usage_tracker
+                # 每个服务一个熔断器，所有会话共用：服务故障时各会话一起改用规则模式，不必各自等待超时
+                client.resilience = ResilientCaller(
+                    retry=RetryPolicy(),
+                    breaker=CircuitBreaker(on_state_change=lambda previous, state: print(f"AI服务熔断器: {previous} -> {state}"))
+                )
+            print("AI服务初始化成功")
+            # 所有会话经同一个事件循环发请求：限制在途请求数，并合并同时到达的相同意图识别
+            max_in_flight = max((client.pool_size for client in clients), default=DEFAULT_MAX_IN_FLIGHT)
+            self.llm_client = SyncLLMClient(backend, max_in_flight=max_in_flight)
+            if self.intent_batch_window_ms:
+                self.llm_client = IntentBatcher(self.llm_client, max_delay_ms=self.intent_batch_window_ms)
+            return self.llm_client
+    
     def run_user_session(self, user_id: str):
         """运行用户会话（在线程中）"""
         try:
@@ -391,13 +470,15 @@ class MultiUserDSLChatbotGUI:
             # 确定数据库路径
             db_path = None
             if session.module_type == "ecommerce":
-                db_path = os.path.join(project_root, "database", "ecommerce.db")
+                db_path = self.db_path
             
             # 创建聊天机器人实例
+            llm_client = self.get_shared_llm_client() if session.use_ai else None
             chatbot = DSLChatbot(
                 script_path=script_path,
-                use_ai=session.use_ai,
-                db_path=db_path
+                use_ai=llm_client is not None,
+                db_path=db_path,
+                llm_client=llm_client
             )
             
             # 初始化聊天机器人
@@ -411,11 +492,16 @@ class MultiUserDSLChatbotGUI:
             interpreter = ThreadSafeDSLInterpreter(
                 script_ast=chatbot.script_ast,
                 llm_client=chatbot.llm_client,
-                db_path=db_path
+                db_path=db_path,
+                query_cache=self.query_cache
             )
             
+            # 用量按GUI的用户ID统计
+            interpreter.session_id = user_id
+            
             # 设置GUI输出回调
             interpreter.set_gui_output_callback(lambda msg: self.gui_output(user_id, msg))
+            interpreter.set_gui_stream_callback(lambda delta, done: self.gui_stream(user_id, delta, done))
             
             # 重写输入函数，使用用户的输入队列
             interpreter.input_function = lambda prompt: self.get_user_input(user_id, prompt)
@@ -477,6 +563,20 @@ class MultiUserDSLChatbotGUI:
             except:
                 pass  # 如果队列已关闭，忽略错误
     
+    def gui_stream(self, user_id: str, delta: str, done: bool):
+        """GUI流式输出回调函数：增量文本追加在同一行，结束时换行"""
+        if user_id not in self.output_queues:
+            return
+        if done:
+            if user_id in self.streaming_users:
+                self.streaming_users.discard(user_id)
+                self.output_queues[user_id].put(("partial", "\n"))
+            return
+        if user_id not in self.streaming_users:
+            self.streaming_users.add(user_id)
+            delta = f"机器人: {delta}"
+        self.output_queues[user_id].put(("partial", delta))
+    
     def on_user_selected(self, event=None):
         """用户选择事件"""
         user_id = self.user_var.get()
@@ -574,10 +674,10 @@ class MultiUserDSLChatbotGUI:
         if message.lower() in ['退出', 'exit', 'quit']:
             self.delete_user_session()
     
-    def display_message(self, message):
+    def display_message(self, message, end="\n"):
         """在对话显示区域显示消息"""
         self.chat_display.config(state=tk.NORMAL)
-        self.chat_display.insert(tk.END, message + "\n")
+        self.chat_display.insert(tk.END, message + end)
         self.chat_display.see(tk.END)
         self.chat_display.config(state=tk.DISABLED)
     
@@ -591,6 +691,9 @@ class MultiUserDSLChatbotGUI:
                         # 只在当前用户是活跃用户时显示消息
                         if user_id == self.current_user_id:
                             self.display_message(content)
+                    elif item_type == "partial":
+                        if user_id == self.current_user_id:
+                            self.display_message(content, end="")
                     elif item_type == "error":
                         messagebox.showerror("错误", content)
             except queue.Empty:
@@ -620,15 +723,52 @@ class MultiUserDSLChatbotGUI:
         for user_id in list(self.session_manager.sessions.keys()):
             self.session_manager.remove_session(user_id)
         self.output_queues.clear()
+        if self.llm_client:
+            self.llm_client.close()
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="多用户DSL智能客服系统")
+    parser.add_argument(
+        "--intent-batch-window-ms",
+        type=float,
+        default=None,
+        help="启用跨会话意图识别微批处理并设置收集窗口（毫秒）"
+    )
+    parser.add_argument("--llm-intent-backend", choices=BACKEND_NAMES, default=None,
+                        help="意图识别使用的后端：zhipu（默认）、openai（OpenAI兼容的本地服务）或 rules（本地规则）")
+    parser.add_argument("--llm-reply-backend", choices=BACKEND_NAMES, default=None,
+                        help="AIReply 回复生成使用的后端，取值同上，默认 zhipu")
+    parser.add_argument("--openai-base-url", default=None,
+                        help="OpenAI兼容服务的地址（如 http://127.0.0.1:8000/v1），默认读取 OPENAI_BASE_URL")
+    parser.add_argument("--openai-model", default=None, help="OpenAI兼容服务的模型名，默认读取 OPENAI_MODEL")
+    parser.add_argument("--llm-rpm", type=float, default=None, help="每分钟最多发出的AI请求数")
+    parser.add_argument("--llm-tpm", type=float, default=None, help="每分钟最多使用的token数（按字符估计）")
+    parser.add_argument("--llm-session-budget", type=int, default=None,
+                        help="每个会话最多使用的AI token数，超出后该会话改用规则模式")
+    parser.add_argument("--llm-usage-export", default=None, metavar="FILE",
+                        help="退出时导出AI用量（.csv 为明细，其余为JSON汇总）")
+    args = parser.parse_args()
+    usage_tracker = UsageTracker(session_token_budget=args.llm_session_budget)
+    
     root = tk.Tk()
-    app = MultiUserDSLChatbotGUI(root)
+    app = MultiUserDSLChatbotGUI(
+        root, intent_batch_window_ms=args.intent_batch_window_ms,
+        rate_limiter=LLMRateLimiter(args.llm_rpm, args.llm_tpm) if args.llm_rpm or args.llm_tpm else None,
+        usage_tracker=usage_tracker,
+        llm_intent_backend=args.llm_intent_backend,
+        llm_reply_backend=args.llm_reply_backend,
+        llm_backend_options={"openai": {"base_url": args.openai_base_url, "model": args.openai_model}}
+    )
     
     # 处理窗口关闭事件
     def on_closing():
         app.stop_all_sessions()
+        if args.llm_usage_export:
+            try:
+                usage_tracker.export(args.llm_usage_export)
+            except OSError as e:
+                print(f"AI用量导出失败: {e}")
         root.destroy()
     
     root.protocol("WM_DELETE_WINDOW", on_closing)
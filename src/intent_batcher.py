@@ -0,0 +1,223 @@
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from llm_client import is_error_reply
+from intent_cache import IntentCache
+from rate_limiter import PRIORITY_INTENT
+
+# (用户输入, 候选意图, 等待结果的 Future, 调用方的上下文)
+_Request = Tuple[str, List[str], Future, Optional[Dict[str, Any]]]
+
+
+def build_batch_prompt(items: List[Tuple[str, List[str]]]) -> str:
+    """把多条意图识别请求合成一个提示，要求按顺序返回 JSON 数组"""
+    requests_json = json.dumps(
+        [{"id": i, "input": user_input, "candidates": candidates}
+         for i, (user_input, candidates) in enumerate(items)],
+        ensure_ascii=False, indent=2
+    )
+    return f"""
+            请严格分析下面每条用户输入的意图，为每条输入从它自己的候选意图中选择最匹配的一个。
+
+            请求列表（JSON）：
+            {requests_json}
+
+            分析要求：
+            1. 每条输入独立判断，只能从该条的 candidates 中选择
+            2. 如果完全不匹配任何候选意图，该条返回 "unknown"
+            3. 按 id 顺序输出，数组长度必须是 {len(items)}
+
+            请只返回一个JSON字符串数组，不要任何其他解释。
+
+            示例：
+            ["挂号", "unknown", "体检"]
+            """
+
+
+def parse_intent_array(response: str, count: int) -> Optional[List[str]]:
+    """从模型输出中解析意图数组，格式或长度不对时返回 None"""
+    start, end = response.find("["), response.rfind("]")
+    if start < 0 or end < start:
+        return None
+    try:
+        intents = json.loads(response[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(intents, list) or len(intents) != count:
+        return None
+    if not all(isinstance(intent, str) for intent in intents):
+        return None
+    return [intent.strip().strip('"\'') for intent in intents]
+
+
+class IntentBatcher:
+    """跨会话的意图识别微批处理
+
+    各会话调用 recognize_intent 时把请求放入队列，收集线程在一个小的时间窗口或
+    数量上限内收集多条请求，合成一个提示让模型返回 JSON 意图数组，再把结果分发
+    给各调用方。批内规范化后相同的请求只占一个位置；返回无法解析时逐条调用
+    底层客户端的 recognize_intent。接口与 ZhipuAIClient 相同，可直接交给解释器。
+    批量请求的用量按请求条数分摊到各等待的会话，会话预算照常生效。
+    """
+
+    def __init__(self, client, max_batch: int = 16, max_delay_ms: float = 10.0,
+                 max_concurrent_batches: int = 4):
+        if max_batch < 1:
+            raise ValueError("批大小必须大于0")
+        self.client = client
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        # 一批请求在途时，收集线程继续收集下一批
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent_batches, thread_name_prefix="intent-batch")
+
+        # 监控指标
+        self._requests = 0
+        self._batches = 0
+        self._batched_requests = 0
+        self._max_batch_seen = 0
+        self._fallbacks = 0
+
+        self._thread = threading.Thread(target=self._run, name="intent-batcher", daemon=True)
+        self._thread.start()
+
+    def __getattr__(self, name):
+        # 其余属性（api_key、available、generate_reply 等）取自底层客户端
+        if name == "client":
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+    def recognize_intent(self, user_input: str, candidate_intents: List[str],
+                         context: Dict[str, Any] = None) -> str:
+        """意图识别，与同一时间窗口内其他会话的请求合并发送"""
+        intent_cache = getattr(self.client, "intent_cache", None)
+        if intent_cache is not None:
+            cached = intent_cache.get(user_input, candidate_intents)
+            if cached is not None:
+                return cached
+        if self._closed:
+            raise RuntimeError("意图批处理器已关闭")
+
+        future: Future = Future()
+        self._queue.put((user_input, list(candidate_intents), future, context))
+        return future.result()
+
+    def _collect(self) -> List[_Request]:
+        """阻塞等待第一条请求，然后在时间窗口内尽量多收集"""
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # 关闭信号：处理完当前批次后退出
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        """收集线程主循环"""
+        while True:
+            batch = self._collect()
+            if not batch:
+                break
+            self._executor.submit(self._execute_batch, batch)
+
+    def _execute_batch(self, batch: List[_Request]):
+        """发送一批请求并分发结果"""
+        # 规范化后相同的请求合并为一项
+        groups: Dict[tuple, List[_Request]] = {}
+        for request in batch:
+            groups.setdefault(IntentCache.make_key(request[0], request[1]), []).append(request)
+        items = [(requests[0][0], requests[0][1]) for requests in groups.values()]
+
+        with self._lock:
+            self._requests += len(batch)
+            self._max_batch_seen = max(self._max_batch_seen, len(items))
+
+        if len(items) == 1:
+            self._resolve_single(list(groups.values())[0])
+            return
+
+        try:
+            response = self.client.complete(build_batch_prompt(items), temperature=0.1, priority=PRIORITY_INTENT,
+                                            contexts=[request[3] for request in batch])
+        except Exception as e:
+            for _, _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self._batches += 1
+            self._batched_requests += len(items)
+
+        if is_error_reply(response):
+            # 服务本身出错，逐条重发也不会成功
+            for _, _, future, _ in batch:
+                future.set_result("unknown")
+            return
+
+        intents = parse_intent_array(response, len(items))
+        if intents is None:
+            with self._lock:
+                self._fallbacks += 1
+            for requests in groups.values():
+                self._executor.submit(self._resolve_single, requests)
+            return
+
+        intent_cache = getattr(self.client, "intent_cache", None)
+        for (user_input, candidates), intent, requests in zip(items, intents, groups.values()):
+            if intent in candidates:
+                if intent_cache is not None:
+                    intent_cache.put(user_input, candidates, intent)
+            else:
+                intent = "unknown"
+            for _, _, future, _ in requests:
+                future.set_result(intent)
+
+    def _resolve_single(self, requests: List[_Request]):
+        """单独识别一项（批内只有一项或批量返回无法解析时）"""
+        user_input, candidates, _, context = requests[0]
+        try:
+            intent = self.client.recognize_intent(user_input, candidates, context=context)
+        except Exception as e:
+            for _, _, future, _ in requests:
+                future.set_exception(e)
+            return
+        for _, _, future, _ in requests:
+            future.set_result(intent)
+
+    def stats(self) -> Dict[str, Any]:
+        """微批处理统计"""
+        with self._lock:
+            return {
+                "requests": self._requests,
+                "batches": self._batches,
+                "avg_batch_size": round(self._batched_requests / self._batches, 2) if self._batches else 0.0,
+                "max_batch_size": self._max_batch_seen,
+                "fallbacks": self._fallbacks,
+                "pending": self._queue.qsize(),
+            }
+
+    def close(self, timeout: Optional[float] = None):
+        """处理完已提交的请求后停止收集线程，并关闭底层客户端"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._executor.shutdown(wait=True)
+        self.client.close()
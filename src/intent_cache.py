@@ -0,0 +1,143 @@
+import os
+import json
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional, Tuple
+
+# 句末常见的语气符号，不影响意图
+_TRAILING_PUNCTUATION = "。.!！?？~～,，、;；…"
+
+
+def normalize_input(text: str) -> str:
+    """规范化用户输入：全角转半角、英文小写、去掉空白和句末标点"""
+    normalized = unicodedata.normalize("NFKC", text).lower()
+    normalized = "".join(normalized.split())
+    return normalized.rstrip(_TRAILING_PUNCTUATION)
+
+
+class IntentCache:
+    """recognize_intent 结果缓存
+
+    键为规范化后的用户输入加候选意图集合，按 LRU 淘汰并设有效期。过期时间用
+    墙上时间记录，指定 persist_path 时启动加载、save() 写回，重启后不必冷启动。
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = 3600,
+                 persist_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persist_path = persist_path
+        self._entries: "OrderedDict[Tuple[str, Tuple[str, ...]], Tuple[str, Optional[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 命中率统计
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if persist_path and os.path.exists(persist_path):
+            self.load(persist_path)
+
+    @staticmethod
+    def make_key(user_input: str, candidate_intents: Iterable[str]) -> Tuple[str, Tuple[str, ...]]:
+        """由规范化输入和候选意图集合构造缓存键"""
+        return (normalize_input(user_input), tuple(sorted(set(candidate_intents))))
+
+    def get(self, user_input: str, candidate_intents: Iterable[str]) -> Optional[str]:
+        """查找缓存的意图，未命中或已过期返回None"""
+        key = self.make_key(user_input, candidate_intents)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                intent, expires_at = entry
+                if expires_at is None or expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return intent
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, user_input: str, candidate_intents: Iterable[str], intent: str):
+        """写入识别结果，超过容量时淘汰最久未使用的项"""
+        key = self.make_key(user_input, candidate_intents)
+        expires_at = time.time() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._entries[key] = (intent, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def save(self, path: Optional[str] = None) -> int:
+        """把未过期的缓存项写入 JSON 文件，返回写入的条数"""
+        path = path or self.persist_path
+        if not path:
+            return 0
+        now = time.time()
+        with self._lock:
+            records = [
+                {"input": key[0], "candidates": list(key[1]), "intent": intent, "expires_at": expires_at}
+                for key, (intent, expires_at) in self._entries.items()
+                if expires_at is None or expires_at > now
+            ]
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        # 先写临时文件再替换，避免中途退出留下损坏的缓存文件
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return len(records)
+
+    def load(self, path: Optional[str] = None) -> int:
+        """从 JSON 文件加载未过期的缓存项，返回加载的条数；文件损坏时忽略"""
+        path = path or self.persist_path
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                records = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"意图缓存加载失败，忽略: {e}")
+            return 0
+
+        now = time.time()
+        loaded = 0
+        with self._lock:
+            # 文件中按最久未使用到最近使用的顺序排列
+            for record in records:
+                try:
+                    key = (record["input"], tuple(record["candidates"]))
+                    intent, expires_at = record["intent"], record["expires_at"]
+                except (KeyError, TypeError):
+                    continue
+                if expires_at is not None and expires_at <= now:
+                    continue
+                self._entries[key] = (intent, expires_at)
+                self._entries.move_to_end(key)
+                loaded += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return loaded
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,119 @@
+import re
+from typing import Dict, Any, Iterable, List, NamedTuple, Optional, Tuple
+
+from intent_cache import normalize_input
+from similarity_index import SimilarityIndex, DEFAULT_SIMILARITY_THRESHOLD
+
+# 纯字母数字的模式（如 "ai"）按整词匹配，避免命中 "email" 之类的输入
+_ASCII_WORD = re.compile(r"^[0-9a-z]+$")
+
+
+class MatchResult(NamedTuple):
+    target: Optional[str]      # 唯一确定的跳转目标，没有或有歧义时为 None
+    tier: Optional[str]        # 命中的层级
+    candidates: List[str]      # 命中的 Case 模式，按匹配长度（或相似度）从高到低
+
+
+def _contains(keyword: str, text: str) -> bool:
+    if not keyword:
+        return False
+    if _ASCII_WORD.match(keyword):
+        return re.search(rf"(?<![0-9a-z]){re.escape(keyword)}(?![0-9a-z])", text) is not None
+    return keyword in text
+
+
+class IntentMatcher:
+    """单个步骤的本地意图匹配器
+
+    依次尝试：原文精确匹配、规范化后相等、输入包含 Case 模式或其同义词，
+    最后是与模式及同义词的 n-gram TF-IDF 相似度（不低于阈值才算命中）。
+    命中的模式都指向同一目标时直接返回；指向多个目标视为有歧义，
+    交给调用方（通常是LLM）在命中的候选里选择。similarity_threshold 为 None 时不做相似度匹配。
+    """
+
+    def __init__(self, cases: Iterable[Tuple[str, str]], synonyms: Dict[str, List[str]] = None,
+                 similarity_threshold: Optional[float] = DEFAULT_SIMILARITY_THRESHOLD):
+        # 同一模式出现多次时以第一个 Case 为准，与逐条精确匹配一致
+        self.targets: Dict[str, str] = {}
+        for pattern, target in cases:
+            self.targets.setdefault(pattern, target)
+        self._patterns = [(pattern, normalize_input(pattern)) for pattern in self.targets]
+        self._synonyms = [
+            (pattern, normalize_input(phrase))
+            for pattern, phrases in (synonyms or {}).items() if pattern in self.targets
+            for phrase in phrases
+        ]
+        self.similarity_threshold = similarity_threshold
+        self._index = None
+        if similarity_threshold is not None:
+            documents = [(pattern, pattern) for pattern in self.targets]
+            documents += [(pattern, phrase) for pattern, phrase in self._synonyms]
+            self._index = SimilarityIndex(documents)
+
+    def match(self, user_input: str) -> MatchResult:
+        """匹配用户输入"""
+        if user_input in self.targets:
+            return MatchResult(self.targets[user_input], "exact", [user_input])
+
+        text = normalize_input(user_input)
+        if not text:
+            return MatchResult(None, None, [])
+
+        exact = {pattern: len(norm) for pattern, norm in self._patterns if norm and norm == text}
+        if exact:
+            return self._resolve("normalized", exact)
+
+        # 关键词和同义词一起判断歧义，避免 "我买的手机要退货" 只因包含 "买" 就进入购买
+        keywords = {pattern: len(norm) for pattern, norm in self._patterns if _contains(norm, text)}
+        hits = self._synonym_hits(text)
+        for pattern, length in keywords.items():
+            hits[pattern] = max(hits.get(pattern, 0), length)
+        if hits:
+            return self._resolve("keyword" if keywords else "synonym", hits)
+
+        if self._index is not None:
+            similar = {pattern: score for pattern, score in self._index.scores(user_input)
+                       if score >= self.similarity_threshold}
+            if similar:
+                return self._resolve("similarity", similar)
+        return MatchResult(None, None, [])
+
+    def _synonym_hits(self, text: str) -> Dict[str, int]:
+        hits: Dict[str, int] = {}
+        for pattern, phrase in self._synonyms:
+            if _contains(phrase, text):
+                hits[pattern] = max(hits.get(pattern, 0), len(phrase))
+        return hits
+
+    def _resolve(self, tier: str, hits: Dict[str, int]) -> MatchResult:
+        candidates = sorted(hits, key=lambda pattern: -hits[pattern])
+        targets = {self.targets[pattern] for pattern in candidates}
+        if len(targets) == 1:
+            return MatchResult(targets.pop(), tier, candidates)
+        return MatchResult(None, tier, candidates)
+
+
+def step_synonyms(step: Dict[str, Any]) -> Dict[str, List[str]]:
+    """收集步骤中 Synonym 动作定义的同义词表"""
+    synonyms: Dict[str, List[str]] = {}
+    for action in step.get('actions', []):
+        if action.get('type') == 'Synonym':
+            synonyms.setdefault(action['pattern'], []).extend(action['phrases'])
+    return synonyms
+
+
+def build_matchers(script_ast: Dict[str, Any],
+                   similarity_threshold: Optional[float] = DEFAULT_SIMILARITY_THRESHOLD) -> Dict[str, IntentMatcher]:
+    """加载脚本时为每个带 Case 的步骤构建匹配器"""
+    matchers = {}
+    for step_name, step in script_ast.get('steps', {}).items():
+        cases = [(action['pattern'], action['target'])
+                 for action in step.get('actions', []) if action.get('type') == 'Case']
+        if not cases:
+            continue
+        synonyms = step_synonyms(step)
+        for pattern in synonyms:
+            if not any(pattern == case_pattern for case_pattern, _ in cases):
+                print(f"警告：步骤 {step_name} 的同义词 \"{pattern}\" 没有对应的 Case，已忽略")
+        matchers[step_name] = IntentMatcher(cases, synonyms, similarity_threshold)
+    return matchers
@@ -1,36 +1,92 @@
 import sqlite3
 import re
+import uuid
 from typing import Dict, List, Any, Optional
-from llm_client import ZhipuAIClient
+from llm_backends import LLMBackend
+from db_pool import get_pool, statement_result, SUPPORTS_RETURNING
+from query_cache import QueryCache, is_cacheable, read_tables, write_tables
+from write_batcher import WriteBatcher
+from inventory import InventoryEngine
+from intent_matcher import IntentMatcher, build_matchers
+from similarity_index import DEFAULT_SIMILARITY_THRESHOLD
+
+# 只查询上一次写入影响行数的语句，如 "SELECT changes() as updated"
+_CHANGES_QUERY = re.compile(r"^\s*SELECT\s+changes\(\)(\s+(AS\s+)?\w+)?\s*;?\s*$", re.IGNORECASE)
 
 class DSLInterpreter:
     """DSL解释器"""
     
-    def __init__(self, script_ast: Dict[str, Any], llm_client: ZhipuAIClient = None, db_path: str = None):
+    # 多行查询默认最多保留的行数，以及每次 fetchmany 的批量
+    DEFAULT_MAX_QUERY_ROWS = 100
+    QUERY_FETCH_BATCH = 50
+    
+    def __init__(self, script_ast: Dict[str, Any], llm_client: LLMBackend = None, db_path: str = None,
+                 query_cache: QueryCache = None, write_batcher: WriteBatcher = None,
+                 inventory: InventoryEngine = None,
+                 similarity_threshold: Optional[float] = DEFAULT_SIMILARITY_THRESHOLD):
         """初始化解释器"""
         self.script = script_ast
         self.llm_client = llm_client
         self.current_step = "welcome"
+        # 正在执行的步骤：Listen 之后 current_step 已指向跳转目标，同一步骤里后续的
+        # AIReply 仍属于这个步骤
+        self._executing_step = None
+        # 会话标识，随上下文传给LLM客户端，用于按会话统计用量和预算
+        self.session_id = uuid.uuid4().hex[:8]
         self.conversation_history: List[Dict[str, str]] = []
         self.variables: Dict[str, Any] = {}
         self.locks: Dict[str, bool] = {}
         self.is_running = True
         self.input_function = input
+        # 开启后 AIReply 使用流式接口，边生成边输出
+        self.stream_replies = False
 
-        # 初始化数据库连接
+        # 初始化数据库连接池（按数据库路径在会话间共享）
+        # db_conn 只在一个动作执行期间从连接池借出，动作结束即归还，等待用户输入时不占用连接
+        self.db_path = db_path
+        self.db_pool = None
         self.db_conn = None
+        self._db_conn_pooled = False
+        # 可选的查询结果缓存，可在同一数据库的多个会话间共享
+        self.query_cache = query_cache
+        # 可选的组提交写线程，DBExec 交给它与其他会话的写入合并提交
+        self.write_batcher = write_batcher
+        self.last_exec_result = None  # 最近一次 DBExec 的结果
+        self.last_exec_rowcount = None  # 最近一次 DBExec（不带 RETURNING）的影响行数
+        # 可选的内存库存引擎，Reserve/Release 优先走引擎，未管理的商品回退到数据库原子更新
+        self.inventory = inventory
+        self.max_query_rows = self.DEFAULT_MAX_QUERY_ROWS
+        # 每个步骤的本地意图匹配器，只有本地无法确定时才调用LLM；阈值为 None 时不做相似度匹配
+        self.intent_matchers = build_matchers(script_ast, similarity_threshold)
+        self.intent_stats: Dict[str, int] = {}
         if db_path:
             try:
-                self.db_conn = sqlite3.connect(db_path)
+                self.db_pool = get_pool(db_path)
+                self.db_pool.warm_up(1)
                 print(f"数据库连接成功: {db_path}")
             except Exception as e:
+                self.db_pool = None
                 print(f"数据库连接失败: {e}")
     
     def __del__(self):
         """清理资源"""
-        if self.db_conn:
+        if self.db_conn and not self._db_conn_pooled:
             self.db_conn.close()
     
+    def _acquire_db_conn(self) -> Optional[sqlite3.Connection]:
+        """获取当前动作使用的数据库连接，首次使用时从连接池借出"""
+        if self.db_conn is None and self.db_pool:
+            self.db_conn = self.db_pool.acquire()
+            self._db_conn_pooled = True
+        return self.db_conn
+    
+    def _release_db_conn(self):
+        """动作结束时把借出的连接还给连接池"""
+        if self._db_conn_pooled and self.db_conn is not None:
+            conn, self.db_conn = self.db_conn, None
+            self._db_conn_pooled = False
+            self.db_pool.release(conn)
+    
     def run(self):
         """运行解释器"""
         module_name = self.script.get('module', '通用机器人')
@@ -39,11 +95,15 @@ class DSLInterpreter:
         print("=" * 50)
         
         while self.is_running and self.current_step:
-            self._execute_current_step()
+            try:
+                self._execute_current_step()
+            finally:
+                self._release_db_conn()
     
     def _execute_current_step(self):
         """执行当前步骤"""
         step_name = self.current_step
+        self._executing_step = step_name
         step_data = self.script['steps'].get(step_name)
         
         if not step_data:
@@ -58,7 +118,11 @@ class DSLInterpreter:
             if not self.is_running:
                 break
                 
-            result = self._execute_action(action)
+            try:
+                result = self._execute_action(action)
+            finally:
+                # 每个动作结束就归还连接：后面的 Listen 可能要等用户很久
+                self._release_db_conn()
             
             # 如果有跳转结果，立即跳转
             if result and "next_step" in result:
@@ -93,13 +157,24 @@ class DSLInterpreter:
             elif action_type == "Unlock":
                 return self._execute_unlock(action['resource'])
             elif action_type == "DBQuery":
-                return self._execute_db_query(action['query'], action['variable'], action['target'])
+                if action.get('multi_row'):
+                    return self._execute_db_query_rows(action['query'], action['variable'], action['target'],
+                                                       action.get('max_rows'), action.get('cache_ttl'))
+                return self._execute_db_query(action['query'], action['variable'], action['target'],
+                                              action.get('cache_ttl'))
             elif action_type == "DBExec":
-                return self._execute_db_exec(action['query'])
+                self._execute_db_exec(action['query'], action.get('variable'))
+                return None
             elif action_type == "If":
                 return self._execute_if(action['condition'], action['target'])
-            elif action_type in ["Case", "Default"]:
-                # Case和Default在handle_user_input中处理
+            elif action_type == "Reserve":
+                return self._execute_reserve(action['sku'], action['quantity'], action.get('variable'))
+            elif action_type == "Release":
+                return self._execute_release(action['sku'], action['quantity'])
+            elif action_type == "ForEach":
+                return self._execute_foreach(action['item'], action['source'], action['actions'])
+            elif action_type in ["Case", "Default", "Synonym"]:
+                # Case、Default和Synonym在handle_user_input中处理
                 return None
             else:
                 print(f"未知动作类型: {action_type}")
@@ -171,20 +246,24 @@ class DSLInterpreter:
         if not self.llm_client:
             print("AI功能未启用")
             return None
+        
+        if not self._llm_available("reply"):
+            # 熔断期间直接返回，不再等待超时
+            print("机器人: 抱歉，AI服务暂时不可用，请稍后再试")
+            return None
             
         print("正在思考中...")
         
-        context = {
-            "conversation_history": self.conversation_history,
-            "current_step": self.current_step,
-            "script_module": self.script.get('module', ''),
-            "variables": self.variables
-        }
+        context = self._llm_context()
         
         try:
-            reply = self.llm_client.generate_reply(user_input, context)
-            print(f"机器人: {reply}")
+            if self.stream_replies and hasattr(self.llm_client, "stream_reply"):
+                reply = self._stream_ai_reply(user_input, context)
+            else:
+                reply = self.llm_client.generate_reply(user_input, context)
+                print(f"机器人: {reply}")
             
+            # 流式输出时历史中记录的也是完整回复
             self.conversation_history.append({
                 "role": "assistant",
                 "content": reply
@@ -195,6 +274,36 @@ class DSLInterpreter:
         
         return None
     
+    def _stream_ai_reply(self, user_input: str, context: Dict[str, Any]) -> str:
+        """流式生成回复，收到的增量文本立即输出，返回完整回复"""
+        received = []
+        
+        def on_delta(delta):
+            received.append(delta)
+            self._output_partial(delta)
+        
+        self._begin_partial_output()
+        try:
+            reply = self.llm_client.stream_reply(user_input, context, on_delta)
+            if not received:
+                # 请求失败时没有增量文本，整体输出错误信息
+                self._output_partial(reply)
+            return reply
+        finally:
+            self._end_partial_output()
+    
+    def _begin_partial_output(self):
+        """开始输出一条流式回复"""
+        print("机器人: ", end="", flush=True)
+    
+    def _output_partial(self, delta: str):
+        """输出流式回复的一段增量文本"""
+        print(delta, end="", flush=True)
+    
+    def _end_partial_output(self):
+        """结束流式回复的输出"""
+        print()
+    
     def _execute_exit(self) -> Dict[str, Any]:
         """执行退出动作"""
         self.is_running = False
@@ -218,51 +327,219 @@ class DSLInterpreter:
             print(f"资源 '{resource}' 未被锁定")
         return None
     
-    def _execute_db_query(self, query: str, variable: str, target: str) -> Dict[str, Any]:
+    def _execute_db_query(self, query: str, variable, target: str, cache_ttl: int = None) -> Dict[str, Any]:
         """执行数据库查询动作"""
-        if not self.db_conn:
+        if not self.db_conn and not self.db_pool:
             print("错误：数据库未连接")
             return {"next_step": target}
         
         try:
             # 替换查询中的变量
             formatted_query = self._replace_variables(query)
-            cursor = self.db_conn.cursor()
-            cursor.execute(formatted_query)
-            result = cursor.fetchone()
+            if _CHANGES_QUERY.match(formatted_query) and self.last_exec_rowcount is not None:
+                # changes() 只对执行写入的那个连接有效；组提交或连接池下写入不在本连接上执行，
+                # 用 DBExec 时记录的影响行数回答
+                value = self.last_exec_rowcount
+            else:
+                value = self._query_with_cache(query, formatted_query, cache_ttl, self._fetch_first_row)
             
-            if result:
-                # 存储查询结果到变量
-                self.variables[variable] = result[0] if len(result) == 1 else result
-                print(f"数据库查询结果存储到变量 '{variable}': {self.variables[variable]}")
+            # 存储查询结果到变量
+            self._store_result(variable, value)
+            if value is not None:
+                print(f"数据库查询结果存储到变量 {variable}: {value}")
             else:
-                self.variables[variable] = None
-                print(f"数据库查询无结果，变量 '{variable}' 设为 None")
+                print(f"数据库查询无结果，变量 {variable} 设为 None")
+            
+            return {"next_step": target}
             
+        except Exception as e:
+            print(f"数据库查询错误: {e}")
+            return {"next_step": target}
+    
+    def _execute_db_query_rows(self, query: str, variable, target: str, max_rows: int = None,
+                               cache_ttl: int = None) -> Dict[str, Any]:
+        """执行多行数据库查询，按列名把每行存成字典，最多保留 max_rows 行"""
+        if not self.db_conn and not self.db_pool:
+            print("错误：数据库未连接")
+            return {"next_step": target}
+        
+        if isinstance(variable, list):
+            print(f"数据库查询错误: 多行查询只能存入一个变量，而不是 {variable}")
+            return {"next_step": target}
+        
+        limit = max_rows if max_rows is not None else self.max_query_rows
+        try:
+            formatted_query = self._replace_variables(query)
+            rows = self._query_with_cache(query, formatted_query, cache_ttl,
+                                          lambda cursor: self._fetch_rows(cursor, limit), ('rows', limit))
+            self.variables[variable] = rows
+            print(f"数据库查询返回 {len(rows)} 行，存储到变量 '{variable}'")
             return {"next_step": target}
             
         except Exception as e:
             print(f"数据库查询错误: {e}")
             return {"next_step": target}
     
-    def _execute_db_exec(self, query: str) -> None:
-        """执行数据库更新动作"""
-        if not self.db_conn:
+    def _query_with_cache(self, query: str, formatted_query: str, cache_ttl: int, fetch, mode=None) -> Any:
+        """执行查询并用 fetch 从游标取结果；可缓存的查询先查缓存（cache_ttl 为 0 时不缓存）"""
+        use_cache = self.query_cache is not None and cache_ttl != 0 and is_cacheable(formatted_query)
+        if use_cache:
+            cache_key = self.query_cache.make_key(query, self.variables, mode)
+            hit, value = self.query_cache.get(cache_key)
+            if hit:
+                print(f"数据库查询命中缓存: {formatted_query}")
+                return value
+            tables = read_tables(formatted_query)
+            generation = self.query_cache.generation(tables)
+        
+        cursor = self._acquire_db_conn().cursor()
+        cursor.execute(formatted_query)
+        value = fetch(cursor)
+        
+        if use_cache:
+            self.query_cache.put(cache_key, value, tables, generation, cache_ttl)
+        return value
+    
+    @staticmethod
+    def _fetch_first_row(cursor: sqlite3.Cursor) -> Any:
+        """取第一行：单列取标量，多列取元组，无结果为 None"""
+        result = cursor.fetchone()
+        if not result:
+            return None
+        return result[0] if len(result) == 1 else result
+    
+    def _fetch_rows(self, cursor: sqlite3.Cursor, limit: int) -> List[Dict[str, Any]]:
+        """用 fetchmany 分批读取，达到上限即停止，不把整个结果集读入内存"""
+        columns = [description[0] for description in cursor.description]
+        rows: List[Dict[str, Any]] = []
+        while len(rows) < limit:
+            batch = cursor.fetchmany(min(self.QUERY_FETCH_BATCH, limit - len(rows)))
+            if not batch:
+                break
+            rows.extend(dict(zip(columns, row)) for row in batch)
+        if len(rows) == limit and cursor.fetchone() is not None:
+            print(f"查询结果超过 {limit} 行，只保留前 {limit} 行")
+        cursor.close()
+        return rows
+    
+    def _execute_db_exec(self, query: str, variable=None) -> Any:
+        """执行数据库更新动作，可把影响行数或 RETURNING 返回值存入变量；返回语句结果，失败返回 None"""
+        returning = re.search(r'\bRETURNING\b', query, re.IGNORECASE) is not None
+        if not self.db_conn and not self.db_pool and not self.write_batcher:
             print("错误：数据库未连接")
+            self._db_exec_failed(variable, returning)
             return None
         
         try:
             # 替换查询中的变量
             formatted_query = self._replace_variables(query)
-            cursor = self.db_conn.cursor()
-            cursor.execute(formatted_query)
-            self.db_conn.commit()
+            returning = re.search(r'\bRETURNING\b', formatted_query, re.IGNORECASE) is not None
+            if not SUPPORTS_RETURNING and returning:
+                print(f"数据库更新错误: SQLite {sqlite3.sqlite_version} 不支持 RETURNING（需要 3.35+）")
+                self._db_exec_failed(variable, returning)
+                return None
+            if self.write_batcher:
+                result = self.write_batcher.submit(formatted_query)
+            else:
+                cursor = self._acquire_db_conn().cursor()
+                cursor.execute(formatted_query)
+                result = statement_result(cursor)
+                self.db_conn.commit()
+            self.last_exec_result = result
+            self.last_exec_rowcount = result if isinstance(result, int) and not returning else None
             print(f"数据库更新成功: {formatted_query}")
+            if variable:
+                self._store_result(variable, result)
+                print(f"数据库更新结果存储到变量 {variable}: {result}")
+            
+            # 写入后使读取相关表的缓存失效
+            if self.query_cache is not None:
+                self.query_cache.invalidate_tables(write_tables(formatted_query))
+            return result
         except Exception as e:
             print(f"数据库更新错误: {e}")
+            self._db_exec_failed(variable, returning)
+        
+        return None
+    
+    def _db_exec_failed(self, variable, returning: bool):
+        """DBExec 失败按"没有影响任何行"处理，避免后续判断读到上一条语句的结果"""
+        self.last_exec_result = None
+        self.last_exec_rowcount = None if returning else 0
+        if variable:
+            self._store_result(variable, None if returning else 0)
+    
+    def _resolve_quantity(self, quantity) -> Optional[int]:
+        """解析数量：整数直接使用，字符串视为变量名；无效数量返回 None"""
+        value = self.variables.get(quantity) if isinstance(quantity, str) else quantity
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            return None
+        return value if value > 0 else None
+    
+    def _execute_reserve(self, sku: str, quantity, variable: str = None) -> None:
+        """执行库存预留动作，成功存 1，库存不足或数量无效存 0"""
+        amount = self._resolve_quantity(quantity)
+        if amount is None:
+            print(f"库存预留错误: 无效的数量 {quantity}")
+            reserved = False
+        else:
+            if self.inventory is not None and self.inventory.manages(sku):
+                reserved = self.inventory.reserve(sku, amount)
+            else:
+                # 没有库存引擎时使用带条件的原子更新
+                name = sku.replace("'", "''")
+                # 以本次语句的结果为准，更新失败返回 None，不能沿用上一条 DBExec 的结果
+                updated = self._execute_db_exec(
+                    f"UPDATE goods SET stock = stock - {amount} WHERE name='{name}' AND stock >= {amount}")
+                reserved = bool(updated)
+            print(f"库存预留 {sku} x{amount}: {'成功' if reserved else '失败'}")
+        
+        if variable:
+            self.variables[variable] = 1 if reserved else 0
+        return None
+    
+    def _execute_release(self, sku: str, quantity) -> None:
+        """执行库存归还动作"""
+        amount = self._resolve_quantity(quantity)
+        if amount is None:
+            print(f"库存归还错误: 无效的数量 {quantity}")
+            return None
+        if self.inventory is not None and self.inventory.manages(sku):
+            self.inventory.release(sku, amount)
+        else:
+            name = sku.replace("'", "''")
+            self._execute_db_exec(f"UPDATE goods SET stock = stock + {amount} WHERE name='{name}'")
+        print(f"库存归还 {sku} x{amount}")
+        return None
+    
+    def _execute_foreach(self, item: str, source: str, actions: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """对列表变量的每一行执行循环体；循环体内发生跳转时立即结束循环"""
+        rows = self.variables.get(source)
+        if not isinstance(rows, list):
+            print(f"ForEach 错误：变量 '{source}' 不是列表")
+            return None
         
+        for row in rows:
+            self.variables[item] = row
+            for action in actions:
+                if not self.is_running:
+                    return None
+                result = self._execute_action(action)
+                if result and "next_step" in result:
+                    return result
         return None
     
+    def _store_result(self, variable, value: Any):
+        """把查询结果存入变量；变量为列表时按列依次绑定，缺少的列设为 None"""
+        if isinstance(variable, list):
+            columns = value if isinstance(value, tuple) else (value,)
+            for index, name in enumerate(variable):
+                self.variables[name] = columns[index] if index < len(columns) else None
+        else:
+            self.variables[variable] = value
+    
     def _execute_if(self, condition: Dict[str, Any], target: str) -> Optional[Dict[str, Any]]:
         """执行条件判断动作"""
         left = condition['left']
@@ -326,18 +603,22 @@ class DSLInterpreter:
             self.current_step = default_target or "welcome"
             return
         
-        # 尝试精确匹配
-        for pattern, target in cases:
-            if user_input == pattern:
-                self.current_step = target
-                return
+        # 本地匹配：精确、规范化、关键词包含、同义词、n-gram 相似度
+        matcher = self.intent_matchers.get(self.current_step) or IntentMatcher(cases)
+        match = matcher.match(user_input)
+        if match.target:
+            self._count_intent(match.tier)
+            self.current_step = match.target
+            return
         
-        # 使用LLM进行意图识别
-        if self.llm_client:
-            candidate_intents = [pattern for pattern, _ in cases]
+        # 使用LLM进行意图识别，本地有歧义时只在命中的候选中选择；熔断期间按规则模式处理
+        if self._llm_available("intent"):
+            candidate_intents = match.candidates or [pattern for pattern, _ in cases]
+            self._count_intent("llm")
             
             try:
-                recognized_intent = self.llm_client.recognize_intent(user_input, candidate_intents)
+                recognized_intent = self.llm_client.recognize_intent(user_input, candidate_intents,
+                                                                     context=self._llm_context())
                 
                 # 匹配识别的意图
                 for pattern, target in cases:
@@ -346,14 +627,50 @@ class DSLInterpreter:
                         return
             except Exception as e:
                 print(f"意图识别失败: {e}")
+        elif match.candidates:
+            # 规则模式下有歧义时取匹配最长的候选
+            self._count_intent("longest")
+            self.current_step = matcher.targets[match.candidates[0]]
+            return
         
         # 使用默认跳转
+        self._count_intent("default")
         self.current_step = default_target or "fallback"
     
+    def _llm_available(self, operation: str = "reply") -> bool:
+        """LLM客户端已配置、处理该类调用（intent / reply）的后端未熔断，且本会话的用量未超出预算"""
+        if self.llm_client is None:
+            return False
+        # 路由后端的两端各自熔断，按即将发出的调用判断
+        available_for = getattr(self.llm_client, "available_for", None)
+        if not (available_for(operation) if available_for else getattr(self.llm_client, "available", True)):
+            return False
+        usage_tracker = getattr(self.llm_client, "usage_tracker", None)
+        return usage_tracker is None or not usage_tracker.over_budget(self.session_id)
+    
+    def _llm_context(self) -> Dict[str, Any]:
+        """传给LLM客户端的对话上下文"""
+        return {
+            "conversation_history": self.conversation_history,
+            "current_step": self._executing_step or self.current_step,
+            "script_module": self.script.get('module', ''),
+            "variables": self.variables,
+            "session_id": self.session_id
+        }
+    
+    def _count_intent(self, tier: str):
+        """按层级统计意图的确定方式"""
+        self.intent_stats[tier] = self.intent_stats.get(tier, 0) + 1
+    
     def _replace_variables(self, text: str) -> str:
-        """替换文本中的变量占位符"""
+        """替换文本中的变量占位符，{row.column} 取字典变量中的字段"""
         def replace_match(match):
-            var_name = match.group(1)
-            return str(self.variables.get(var_name, f"{{{var_name}}}"))
+            var_name, field = match.group(1), match.group(2)
+            value = self.variables.get(var_name)
+            if field is None:
+                return str(value) if var_name in self.variables else match.group(0)
+            if isinstance(value, dict) and field in value:
+                return str(value[field])
+            return match.group(0)
         
-        return re.sub(r'\{(\w+)\}', replace_match, text)
\ No newline at end of file
+        return re.sub(r'\{(\w+)(?:\.(\w+))?\}', replace_match, text)
\ No newline at end of file
@@ -0,0 +1,255 @@
+import os
+import json
+import sqlite3
+import threading
+from typing import Dict, Any, Optional, Iterable, List, Tuple, Callable, Set
+from urllib.parse import urlparse, parse_qs, unquote
+
+from db_pool import connect, is_uri
+
+# 热点商品默认交给库存引擎管理
+DEFAULT_HOT_SKUS = ("phone", "earphone", "laptop")
+# 刷新写回的表，供查询缓存失效
+FLUSHED_TABLES = frozenset({"goods"})
+
+
+def default_journal_path(db_path: str) -> str:
+    """由数据库文件名得到日志路径；SQLite URI 取其中的文件路径
+
+    内存数据库没有文件，进程重启后数据已丢失，按旧日志重放反而会写错库存，
+    因此需要调用方显式给出日志路径。
+    """
+    path = db_path
+    if is_uri(db_path):
+        parsed = urlparse(db_path)
+        params = parse_qs(parsed.query)
+        if params.get("vfs") == ["memdb"] or params.get("mode") == ["memory"]:
+            path = ":memory:"
+        else:
+            path = unquote(parsed.path)
+    if not path or path == ":memory:":
+        raise ValueError(f"内存数据库 {db_path} 需要显式指定库存日志路径 journal_path")
+    return path + ".inventory-journal"
+
+
+class InventoryEngine:
+    """进程内库存预留引擎
+
+    热点商品的库存计数保存在内存里，reserve/release 在一把锁内完成检查和扣减，
+    不再经过 goods 表的行锁。每次变更先追加到预写日志（journal），再由后台线程
+    定期把累计的增量写回 goods 表，并在同一事务里记下已应用的日志序号。
+    进程崩溃后重新启动时，日志中序号大于已应用序号的记录会被重放，变更不会丢失。
+
+    引擎运行期间，热点商品的库存只应通过引擎修改；goods 表中的数值最多落后一个刷新周期。
+    """
+
+    STATE_TABLE = "inventory_journal_state"
+
+    def __init__(self, db_path: str, skus: Optional[Iterable[str]] = DEFAULT_HOT_SKUS,
+                 journal_path: Optional[str] = None, flush_interval_ms: float = 50.0,
+                 fsync: bool = False, on_flush: Optional[Callable[[Set[str]], None]] = None):
+        """skus 为 None 时管理 goods 表中的全部商品；fsync 为 True 时每条日志都落盘
+
+        on_flush 在每次写回提交后以被修改的表名调用，如 query_cache.invalidate_tables，
+        使缓存的 goods 查询结果随写回失效。
+        """
+        self.db_path = db_path
+        self.journal_path = journal_path or default_journal_path(db_path)
+        self.on_flush = on_flush
+        self.flush_interval = flush_interval_ms / 1000
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self._stock: Dict[str, int] = {}
+        self._pending: Dict[str, int] = {}  # 尚未写回 goods 的增量
+        self._seq = 0
+        self._pending_seq = 0
+
+        # 监控指标
+        self._reserves = 0
+        self._rejected = 0
+        self._releases = 0
+        self._flushes = 0
+        self._flush_errors = 0
+
+        self._conn = connect(db_path, isolation_level=None)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.STATE_TABLE} "
+            "(id INTEGER PRIMARY KEY CHECK (id = 1), applied_seq INTEGER NOT NULL)"
+        )
+        self._applied_seq = self._load_applied_seq()
+        self._load_stock(skus)
+        self._replay_journal()
+
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        # 重放的记录先写回数据库，再开始接受新的变更
+        self.flush()
+        self._thread = threading.Thread(target=self._run, name="dsl-inventory-flush", daemon=True)
+        self._thread.start()
+
+    def _load_applied_seq(self) -> int:
+        row = self._conn.execute(f"SELECT applied_seq FROM {self.STATE_TABLE} WHERE id = 1").fetchone()
+        return row[0] if row else 0
+
+    def _load_stock(self, skus: Optional[Iterable[str]]):
+        """从 goods 表载入库存计数"""
+        if skus is None:
+            rows = self._conn.execute("SELECT name, stock FROM goods").fetchall()
+        else:
+            names = list(skus)
+            placeholders = ", ".join("?" for _ in names)
+            rows = self._conn.execute(
+                f"SELECT name, stock FROM goods WHERE name IN ({placeholders})", names
+            ).fetchall() if names else []
+        self._stock = {name: int(stock or 0) for name, stock in rows}
+
+    def _read_journal(self) -> List[Tuple[int, str, int]]:
+        """读取日志记录；崩溃时写了一半的最后一行会被忽略"""
+        if not os.path.exists(self.journal_path):
+            return []
+        records = []
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    records.append((int(record["seq"]), record["sku"], int(record["delta"])))
+                except (ValueError, KeyError, TypeError):
+                    break
+        return records
+
+    def _replay_journal(self):
+        """把尚未写回数据库的日志记录应用到内存计数和待刷新增量"""
+        self._seq = self._applied_seq
+        replayed = 0
+        for seq, sku, delta in self._read_journal():
+            if seq <= self._applied_seq:
+                continue
+            if sku in self._stock:
+                self._stock[sku] += delta
+            # 即使该商品已不再由引擎管理，也要把增量写回数据库
+            self._pending[sku] = self._pending.get(sku, 0) + delta
+            self._seq = seq
+            replayed += 1
+        self._pending_seq = self._seq
+        if replayed:
+            print(f"库存日志重放 {replayed} 条记录")
+
+    def manages(self, sku: str) -> bool:
+        """该商品是否由引擎管理"""
+        return sku in self._stock
+
+    def stock(self, sku: str) -> Optional[int]:
+        """当前库存；不由引擎管理的商品返回 None"""
+        with self._lock:
+            return self._stock.get(sku)
+
+    def reserve(self, sku: str, quantity: int) -> bool:
+        """原子地检查并扣减库存，库存不足时返回 False"""
+        if quantity <= 0:
+            raise ValueError("预留数量必须大于0")
+        with self._lock:
+            current = self._stock.get(sku)
+            if current is None:
+                raise KeyError(f"商品 {sku} 不由库存引擎管理")
+            if current < quantity:
+                self._rejected += 1
+                return False
+            self._apply(sku, -quantity)
+            self._reserves += 1
+            return True
+
+    def release(self, sku: str, quantity: int):
+        """归还之前预留的库存（如取消订单）"""
+        if quantity <= 0:
+            raise ValueError("归还数量必须大于0")
+        with self._lock:
+            if sku not in self._stock:
+                raise KeyError(f"商品 {sku} 不由库存引擎管理")
+            self._apply(sku, quantity)
+            self._releases += 1
+
+    def _apply(self, sku: str, delta: int):
+        """先写日志再改内存计数，调用方需持有 self._lock"""
+        seq = self._seq + 1
+        self._journal.write(json.dumps({"seq": seq, "sku": sku, "delta": delta}) + "\n")
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._seq = seq
+        self._stock[sku] += delta
+        self._pending[sku] = self._pending.get(sku, 0) + delta
+        self._pending_seq = seq
+
+    def flush(self) -> int:
+        """把累计的增量写回 goods 表，返回写回的商品数"""
+        with self._flush_lock:
+            with self._lock:
+                if self._pending_seq <= self._applied_seq:
+                    return 0
+                pending, self._pending = self._pending, {}
+                seq = self._pending_seq
+
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                self._conn.executemany(
+                    "UPDATE goods SET stock = stock + ? WHERE name = ?",
+                    [(delta, sku) for sku, delta in pending.items() if delta]
+                )
+                self._conn.execute(
+                    f"INSERT INTO {self.STATE_TABLE} (id, applied_seq) VALUES (1, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET applied_seq = excluded.applied_seq",
+                    (seq,)
+                )
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                if self._conn.in_transaction:
+                    self._conn.rollback()
+                # 写回失败：把增量放回去，下个周期重试
+                with self._lock:
+                    for sku, delta in pending.items():
+                        self._pending[sku] = self._pending.get(sku, 0) + delta
+                    self._flush_errors += 1
+                print(f"库存写回失败: {e}")
+                return 0
+
+            with self._lock:
+                self._applied_seq = seq
+                self._flushes += 1
+                # 日志已全部写回时截断，避免无限增长
+                if self._seq == seq:
+                    self._journal.seek(0)
+                    self._journal.truncate()
+            if self.on_flush is not None:
+                self.on_flush(set(FLUSHED_TABLES))
+            return len(pending)
+
+    def _run(self):
+        """后台刷新线程"""
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """库存引擎统计"""
+        with self._lock:
+            return {
+                "skus": len(self._stock),
+                "reserves": self._reserves,
+                "rejected": self._rejected,
+                "releases": self._releases,
+                "journal_seq": self._seq,
+                "applied_seq": self._applied_seq,
+                "flushes": self._flushes,
+                "flush_errors": self._flush_errors,
+            }
+
+    def close(self):
+        """停止刷新线程并把剩余增量写回数据库"""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+        self._journal.close()
+        self._conn.close()
@@ -0,0 +1,200 @@
+import os
+from typing import Any, Callable, Dict, List, Optional, Protocol, runtime_checkable
+
+# is_error_reply 与后端使用同一份 llm_client 模块，ErrorReply 的类型检查才一致
+from llm_client import ZhipuAIClient, DEFAULT_TIMEOUT, is_error_reply
+from intent_matcher import IntentMatcher
+
+# 本地 OpenAI 兼容服务（vLLM、llama.cpp server、Ollama 等）的默认地址和模型
+DEFAULT_OPENAI_BASE_URL = "http://127.0.0.1:8000/v1"
+DEFAULT_OPENAI_MODEL = "qwen2.5-7b-instruct"
+# 规则后端的固定回复，AIReply 步骤在没有模型时给出
+DEFAULT_RULE_REPLY = "抱歉，这个问题我暂时无法详细解答，建议您咨询人工客服或专业人员。"
+
+
+@runtime_checkable
+class LLMBackend(Protocol):
+    """解释器使用的LLM后端接口
+
+    ZhipuAIClient、SyncLLMClient、IntentBatcher 以及本模块的各后端都满足此接口。
+    context 是解释器传入的对话上下文（会话、模块、步骤、历史），后端可用于
+    生成回复和统计用量。
+    """
+
+    def recognize_intent(self, user_input: str, candidate_intents: List[str],
+                         context: Dict[str, Any] = None) -> str:
+        ...
+
+    def generate_reply(self, user_input: str, context: Dict[str, Any] = None) -> str:
+        ...
+
+    def stream_reply(self, user_input: str, context: Dict[str, Any] = None,
+                     on_delta: Optional[Callable[[str], None]] = None) -> str:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+class OpenAICompatibleClient(ZhipuAIClient):
+    """OpenAI 兼容的 chat/completions 服务客户端
+
+    请求、响应和流式格式与智谱AI相同，只是地址、模型名和鉴权不同。base_url 可写到
+    /v1 为止，自动补上 /chat/completions；本地服务通常不校验密钥，未设置时发送占位值。
+    """
+
+    def __init__(self, base_url: str = None, model: str = None, api_key: str = None, **kwargs):
+        base_url = (base_url or os.getenv("OPENAI_BASE_URL") or DEFAULT_OPENAI_BASE_URL).rstrip("/")
+        if not base_url.endswith("/chat/completions"):
+            base_url += "/chat/completions"
+        super().__init__(
+            api_key=api_key or os.getenv("OPENAI_API_KEY") or "EMPTY",
+            base_url=base_url,
+            model=model or os.getenv("OPENAI_MODEL") or DEFAULT_OPENAI_MODEL,
+            **kwargs
+        )
+
+
+class RuleBasedBackend:
+    """不调用任何模型的确定性后端
+
+    意图识别用本地匹配器（关键词、同义词、相似度）在候选意图中选择，有歧义时取
+    匹配最长的候选；回复按模块返回固定文本。用于离线运行、测试，或作为路由后端
+    中意图识别的零延迟实现。
+    """
+
+    available = True
+
+    def __init__(self, replies: Dict[str, str] = None, default_reply: str = DEFAULT_RULE_REPLY):
+        self.replies = {module.lower(): reply for module, reply in (replies or {}).items()}
+        self.default_reply = default_reply
+        self._matchers: Dict[tuple, IntentMatcher] = {}
+
+    def recognize_intent(self, user_input: str, candidate_intents: List[str],
+                         context: Dict[str, Any] = None) -> str:
+        """在候选意图中本地匹配，匹配不到返回 unknown"""
+        key = tuple(candidate_intents)
+        matcher = self._matchers.get(key)
+        if matcher is None:
+            matcher = self._matchers[key] = IntentMatcher([(intent, intent) for intent in candidate_intents])
+        match = matcher.match(user_input)
+        if match.target:
+            return match.target
+        return match.candidates[0] if match.candidates else "unknown"
+
+    def generate_reply(self, user_input: str, context: Dict[str, Any] = None) -> str:
+        """按模块返回固定回复"""
+        script_module = (context or {}).get("script_module") or ""
+        return self.replies.get(script_module.lower(), self.default_reply)
+
+    def stream_reply(self, user_input: str, context: Dict[str, Any] = None,
+                     on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """固定回复一次性输出"""
+        reply = self.generate_reply(user_input, context)
+        if on_delta:
+            on_delta(reply)
+        return reply
+
+    def complete(self, prompt: str, temperature: float = 0.1, priority: int = None,
+                 contexts: List[Dict[str, Any]] = None) -> str:
+        # 没有模型可以回答任意提示，批量意图识别据此逐条回退到 recognize_intent
+        return ""
+
+    def close(self):
+        pass
+
+
+class RoutingBackend:
+    """按调用类型分派到不同后端
+
+    意图识别（含批量提示 complete）交给 intent_backend，例如本地部署的低延迟模型；
+    回复生成和流式回复交给 reply_backend，例如托管的大模型。可用性按调用类型
+    分别判断（available_for）：一端熔断时只有该类调用改走规则模式。其余属性
+    （usage_tracker、resilience_stats 等）取自回复后端。
+    """
+
+    def __init__(self, intent_backend: LLMBackend, reply_backend: LLMBackend):
+        self.intent_backend = intent_backend
+        self.reply_backend = reply_backend
+
+    def __getattr__(self, name):
+        if name in ("intent_backend", "reply_backend"):
+            raise AttributeError(name)
+        return getattr(self.reply_backend, name)
+
+    @property
+    def available(self) -> bool:
+        """任一端可用（总体状态）；决定某次调用能否发出请用 available_for"""
+        return self.available_for("intent") or self.available_for("reply")
+
+    def available_for(self, operation: str) -> bool:
+        """某类调用的后端是否可用：intent 看意图后端，reply（含流式）看回复后端"""
+        backend = self.intent_backend if operation == "intent" else self.reply_backend
+        return getattr(backend, "available", True)
+
+    @property
+    def backends(self) -> List[Any]:
+        """两端的后端（同一实例只列一次）"""
+        if self.intent_backend is self.reply_backend:
+            return [self.intent_backend]
+        return [self.intent_backend, self.reply_backend]
+
+    def recognize_intent(self, user_input: str, candidate_intents: List[str],
+                         context: Dict[str, Any] = None) -> str:
+        return self.intent_backend.recognize_intent(user_input, candidate_intents, context=context)
+
+    def complete(self, prompt: str, temperature: float = 0.1, **kwargs) -> str:
+        return self.intent_backend.complete(prompt, temperature, **kwargs)
+
+    def generate_reply(self, user_input: str, context: Dict[str, Any] = None) -> str:
+        return self.reply_backend.generate_reply(user_input, context)
+
+    def stream_reply(self, user_input: str, context: Dict[str, Any] = None,
+                     on_delta: Optional[Callable[[str], None]] = None) -> str:
+        return self.reply_backend.stream_reply(user_input, context, on_delta)
+
+    def close(self):
+        for backend in self.backends:
+            backend.close()
+
+
+def create_backend(name: str, timeout: float = DEFAULT_TIMEOUT, base_url: str = None, model: str = None,
+                   api_key: str = None) -> LLMBackend:
+    """按名称创建后端：zhipu、openai（OpenAI 兼容服务）或 rules"""
+    if name == "zhipu":
+        return ZhipuAIClient(api_key=api_key, timeout=timeout, base_url=base_url, model=model)
+    if name == "openai":
+        return OpenAICompatibleClient(base_url=base_url, model=model, api_key=api_key, timeout=timeout)
+    if name == "rules":
+        return RuleBasedBackend()
+    raise ValueError(f"未知的LLM后端: {name}（可用 {', '.join(BACKEND_NAMES)}）")
+
+
+BACKEND_NAMES = ("zhipu", "openai", "rules")
+
+
+def build_backend(intent: str = None, reply: str = None, timeout: float = DEFAULT_TIMEOUT,
+                  options: Dict[str, Dict[str, Any]] = None) -> LLMBackend:
+    """按配置创建解释器使用的后端
+
+    intent / reply 为意图识别和回复生成使用的后端名称，未指定时读取环境变量
+    LLM_INTENT_BACKEND / LLM_REPLY_BACKEND，默认都是 zhipu。options 按后端名称
+    给出 base_url、model、api_key。两者相同时只创建一个后端，否则返回 RoutingBackend。
+    """
+    intent = intent or os.getenv("LLM_INTENT_BACKEND") or "zhipu"
+    reply = reply or os.getenv("LLM_REPLY_BACKEND") or "zhipu"
+    options = options or {}
+    reply_backend = create_backend(reply, timeout=timeout, **options.get(reply, {}))
+    if intent == reply:
+        return reply_backend
+    intent_backend = create_backend(intent, timeout=timeout, **options.get(intent, {}))
+    return RoutingBackend(intent_backend, reply_backend)
+
+
+def http_clients(backend: Any) -> List[ZhipuAIClient]:
+    """后端中实际发送HTTP请求的客户端，用于挂接缓存、容错、限流和用量统计"""
+    if isinstance(backend, RoutingBackend):
+        return [client for inner in backend.backends for client in http_clients(inner)]
+    if isinstance(backend, ZhipuAIClient):
+        return [backend]
+    return []
@@ -1,22 +1,199 @@
 import requests
 import json
 import os
-from typing import List, Dict, Any
+import textwrap
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+from intent_cache import IntentCache
+from reply_cache import ReplyCache
+from rate_limiter import (LLMRateLimiter, PRIORITY_INTENT, PRIORITY_REPLY, COMPLETION_ESTIMATES,
+                          estimate_messages_tokens, estimate_tokens, truncate_to_tokens)
+from llm_usage import UsageTracker
+# 与客户端使用同一份 resilience 模块，捕获 CircuitOpenError 时类型一致
+from resilience import AttemptRejected, CircuitBreaker, CircuitOpenError, ResilientCaller, RetryPolicy
 
 load_dotenv()
 
+# 每个客户端保持的长连接数上限
+DEFAULT_HTTP_POOL_SIZE = 10
+# 单次请求的超时时间（秒）
+DEFAULT_TIMEOUT = 30
+DEFAULT_BASE_URL = "https://open.bigmodel.cn/api/paas/v4/chat/completions"
+DEFAULT_MODEL = "glm-4"
+# 生成回复时对话历史的token预算（按 estimate_tokens 估计），超出时丢弃较早的消息
+DEFAULT_HISTORY_TOKEN_BUDGET = 1000
+# 用户输入的token上限，粘贴的长文本截断后再发送
+DEFAULT_MAX_INPUT_TOKENS = 800
+
+# 根据模块类型提供不同的系统提示
+SYSTEM_PROMPTS = {
+    "medical": """
+        你是智慧医院的专业客服助手，请提供专业、友好的医疗健康咨询服务。
+
+        回复要求：
+        1. 专业准确：提供准确的医疗信息和健康建议
+        2. 友好亲切：语气温和，体现人文关怀
+        3. 安全边界：只能提供健康建议和医疗科普，不能进行诊断或开处方
+        4. 及时转诊：涉及具体病症时建议咨询专业医生
+
+        注意：严格遵守医疗安全规范，不提供超出健康咨询范围的服务。
+    """,
+    "ecommerce": """
+        你是智慧商城的专业客服助手，请提供热情、专业的电商咨询服务。
+
+        回复要求：
+        1. 专业热情：准确介绍商品信息，热情服务客户
+        2. 解决问题：帮助处理订单、投诉、退款等问题
+        3. 促进转化：适当推荐相关商品，提升购物体验
+        4. 售后支持：妥善处理客户反馈和问题
+
+        注意：诚实守信，不夸大宣传，切实维护消费者权益。
+    """,
+    "default": """
+        你是专业的智能客服助手，请根据对话上下文提供准确、友好的服务。
+
+        通用要求：
+        1. 准确理解：准确把握用户需求和问题
+        2. 专业回复：基于知识提供准确信息
+        3. 友好耐心：保持友好态度，耐心解答
+        4. 解决问题：切实帮助用户解决实际问题
+    """
+}
+
+# 导入时整理一次系统消息，每次生成回复直接复用（调用方不应修改）
+_SYSTEM_MESSAGES = {
+    module: {"role": "system", "content": textwrap.dedent(prompt).strip()}
+    for module, prompt in SYSTEM_PROMPTS.items()
+}
+
+def iter_sse_data(lines: Iterable[str]) -> Iterator[str]:
+    """解析 server-sent events，逐个产出事件的 data 内容（多行 data 以换行连接）"""
+    data_lines: List[str] = []
+    for line in lines:
+        if not line:
+            # 空行表示一个事件结束
+            if data_lines:
+                yield "\n".join(data_lines)
+                data_lines = []
+            continue
+        if line.startswith(":"):
+            continue  # 注释/心跳
+        field, _, value = line.partition(":")
+        if field == "data":
+            data_lines.append(value[1:] if value.startswith(" ") else value)
+    if data_lines:
+        yield "\n".join(data_lines)
+
+def trim_history(history: List[Dict[str, str]], token_budget: int) -> List[Dict[str, str]]:
+    """从最近的消息往前取，总token数不超过 token_budget，保持原有顺序"""
+    kept = []
+    used = 0
+    for msg in reversed(history):
+        used += estimate_messages_tokens([msg])
+        if used > token_budget:
+            break
+        kept.append({"role": msg["role"], "content": msg["content"]})
+    kept.reverse()
+    return kept
+
+class ErrorReply(str):
+    """未配置、限流、熔断、网络或响应格式错误时返回的提示文本
+
+    仍是普通字符串，可直接显示给用户；调用方用 is_error_reply 区分，不必扫描文本——
+    模型的正常回答里也可能出现“失败”“错误”等字样。
+    """
+
+
+def is_error_reply(response: str) -> bool:
+    """_call_api / _stream_api 返回的是错误提示而不是模型输出"""
+    return isinstance(response, ErrorReply)
+
 class ZhipuAIClient:    
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, pool_size: int = DEFAULT_HTTP_POOL_SIZE,
+                 intent_cache: IntentCache = None, timeout: float = DEFAULT_TIMEOUT,
+                 resilience: ResilientCaller = None, reply_cache: ReplyCache = None, base_url: str = None,
+                 rate_limiter: LLMRateLimiter = None, history_token_budget: int = DEFAULT_HISTORY_TOKEN_BUDGET,
+                 max_input_tokens: int = DEFAULT_MAX_INPUT_TOKENS, usage_tracker: UsageTracker = None,
+                 model: str = None):
         self.api_key = api_key or os.getenv("ZHIPU_API_KEY")
-        self.base_url = "https://open.bigmodel.cn/api/paas/v4/chat/completions"
+        # 可指向兼容的服务，如压测用的本地替身服务（stub_llm_server.py）
+        self.base_url = base_url or os.getenv("ZHIPU_BASE_URL") or DEFAULT_BASE_URL
+        self.model = model or DEFAULT_MODEL
+        # 相同说法和候选意图的识别结果直接复用，不再调用API
+        self.intent_cache = intent_cache
+        # 允许缓存的问答步骤，相同问题直接返回之前生成的回复
+        self.reply_cache = reply_cache
+        # 所有会话共用的配额：按每分钟请求数和token数放行，意图识别优先
+        self.rate_limiter = rate_limiter
+        # 控制生成回复的请求大小：历史按token预算取最近的消息，过长的输入截断
+        self.history_token_budget = history_token_budget
+        self.max_input_tokens = max_input_tokens
+        # 按会话和步骤记录每次调用的耗时和token用量
+        self.usage_tracker = usage_tracker
+        self.timeout = timeout
+        # 重试、熔断和对冲请求，未设置时每次调用只发一次请求
+        self.resilience = resilience
+        
+        # 复用 TCP+TLS 连接的 HTTP 会话，多个会话线程可以共享同一个客户端
+        self.pool_size = pool_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+    
+    def warm_up(self, connections: int = 1) -> int:
+        """启动时预先建立到API服务器的连接，返回成功的请求数"""
+        if not self.api_key or connections < 1:
+            return 0
+        
+        def touch(_):
+            try:
+                # 只为建立连接，响应状态码无关紧要
+                self.session.head(self.base_url, timeout=5)
+                return True
+            except requests.exceptions.RequestException:
+                return False
+        
+        connections = min(connections, self.pool_size)
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            return sum(executor.map(touch, range(connections)))
+    
+    @property
+    def available(self) -> bool:
+        """熔断器打开时为 False，调用方应改用规则模式"""
+        return self.resilience is None or self.resilience.available
+    
+    def resilience_stats(self) -> Optional[Dict[str, Any]]:
+        """重试、对冲和熔断器指标"""
+        return self.resilience.stats() if self.resilience else None
+    
+    def close(self):
+        """关闭连接池"""
+        self.session.close()
+        if self.resilience:
+            self.resilience.close()
+    
+    def _send(self, attempt: Callable[[], str], idempotent: bool = True) -> str:
+        """发送请求，配置了容错策略时经其重试/对冲"""
+        if self.resilience is None:
+            return attempt()
+        return self.resilience.call(attempt, idempotent=idempotent)
         
-    def recognize_intent(self, user_input: str, candidate_intents: List[str]) -> str:
-        """意图识别"""
+    def recognize_intent(self, user_input: str, candidate_intents: List[str],
+                         context: Dict[str, Any] = None) -> str:
+        """意图识别；context 只用于用量统计（会话、模块、步骤）"""
 
         # 检查API密钥
         if not self.api_key:
-            return "AI功能未启用：请设置API_KEY环境变量"
+            return ErrorReply("AI功能未启用：请设置API_KEY环境变量")
+        
+        if self.intent_cache is not None:
+            cached = self.intent_cache.get(user_input, candidate_intents)
+            if cached is not None:
+                return cached
         
         prompt = f"""
             请严格分析用户输入的意图，并从以下候选意图中选择最匹配的一个：
@@ -39,10 +216,10 @@ class ZhipuAIClient:
             用户输入："今天天气" -> unknown
             """
         
-        response = self._call_api(prompt, temperature=0.1)
+        response = self._call_api(prompt, temperature=0.1, priority=PRIORITY_INTENT, context=context)
         
         # 如果返回的是错误消息，直接返回unknown
-        if "错误" in response or "失败" in response or "不可用" in response or "未启用" in response:
+        if is_error_reply(response):
             return "unknown"
 
         # 清理响应，确保只返回意图名称
@@ -50,69 +227,117 @@ class ZhipuAIClient:
         
         # 验证意图是否在候选列表中
         if intent in candidate_intents:
+            # unknown 可能来自临时故障，只缓存明确的识别结果
+            if self.intent_cache is not None:
+                self.intent_cache.put(user_input, candidate_intents, intent)
             return intent
         else:
             return "unknown"
     
-    def generate_reply(self, user_input: str, context: Dict[str, Any] = None) -> str:
-        """生成智能回复"""
-        script_module = context.get('script_module', '通用') if context else '通用'
-        
-        # 根据模块类型提供不同的系统提示
-        system_prompts = {
-            "medical": """
-                你是智慧医院的专业客服助手，请提供专业、友好的医疗健康咨询服务。
-
-                回复要求：
-                1. 专业准确：提供准确的医疗信息和健康建议
-                2. 友好亲切：语气温和，体现人文关怀
-                3. 安全边界：只能提供健康建议和医疗科普，不能进行诊断或开处方
-                4. 及时转诊：涉及具体病症时建议咨询专业医生
-
-                注意：严格遵守医疗安全规范，不提供超出健康咨询范围的服务。
-            """,
-            "ecommerce": """
-                你是智慧商城的专业客服助手，请提供热情、专业的电商咨询服务。
-
-                回复要求：
-                1. 专业热情：准确介绍商品信息，热情服务客户
-                2. 解决问题：帮助处理订单、投诉、退款等问题
-                3. 促进转化：适当推荐相关商品，提升购物体验
-                4. 售后支持：妥善处理客户反馈和问题
-
-                注意：诚实守信，不夸大宣传，切实维护消费者权益。
-            """,
-            "default": """
-                你是专业的智能客服助手，请根据对话上下文提供准确、友好的服务。
-
-                通用要求：
-                1. 准确理解：准确把握用户需求和问题
-                2. 专业回复：基于知识提供准确信息
-                3. 友好耐心：保持友好态度，耐心解答
-                4. 解决问题：切实帮助用户解决实际问题
-            """
-        }
-        
-        system_prompt = system_prompts.get(script_module.lower(), system_prompts["default"])
+    def complete(self, prompt: str, temperature: float = 0.1, priority: int = PRIORITY_REPLY,
+                 contexts: List[Dict[str, Any]] = None) -> str:
+        """发送单条提示并返回模型输出，失败时返回 ErrorReply（可用 is_error_reply 判断）；
+        contexts 为提示所代表的各会话上下文（如批量意图识别），用量分摊计入这些会话"""
+        return self._call_api(prompt, temperature=temperature, priority=priority, context=contexts)
+    
+    def _reply_messages(self, user_input: str, context: Dict[str, Any] = None,
+                        history: List[Dict[str, str]] = None) -> List[Dict[str, str]]:
+        """构造生成回复用的消息列表：系统提示、最近的对话历史（或指定的 history）和用户输入"""
+        script_module = (context.get('script_module') or 'default') if context else 'default'
+        system_message = _SYSTEM_MESSAGES.get(script_module.lower(), _SYSTEM_MESSAGES["default"])
         
-        messages = [{"role": "system", "content": system_prompt}]
+        if history is None:
+            history = list(context.get('conversation_history') or []) if context else []
+            if history and history[-1]['role'] == 'user' and history[-1]['content'] == user_input:
+                # 解释器的历史里最后一条就是本次输入，下面单独添加
+                history = history[:-1]
         
-        # 添加对话历史
-        if context and 'conversation_history' in context:
-            for msg in context['conversation_history'][-6:]:  # 最近3轮对话
-                messages.append({"role": msg['role'], "content": msg['content']})
+        messages = [system_message]
+        messages.extend(trim_history(history, self.history_token_budget))
+        messages.append({"role": "user", "content": truncate_to_tokens(user_input, self.max_input_tokens)})
+        return messages
+    
+    def generate_reply(self, user_input: str, context: Dict[str, Any] = None) -> str:
+        """生成智能回复"""
+        if self.reply_cache is None or not self.reply_cache.applies(context):
+            return self._call_api(self._reply_messages(user_input, context), temperature=0.7, context=context)
         
-        messages.append({"role": "user", "content": user_input})
+        key = self.reply_cache.make_key(user_input, context)
+        reply = self.reply_cache.get(key)
+        if reply is None:
+            # 只带缓存键里的历史窗口，回复不依赖键之外的对话内容
+            messages = self._reply_messages(user_input, context, self.reply_cache.history(context))
+            reply = self._call_api(messages, temperature=0.7, context=context)
+            if not is_error_reply(reply):
+                self.reply_cache.put(key, reply)
+        return reply
+    
+    def stream_reply(self, user_input: str, context: Dict[str, Any] = None,
+                     on_delta: Optional[Callable[[str], None]] = None) -> str:
+        """流式生成智能回复：每收到一段文本调用 on_delta，返回完整回复"""
+        if self.reply_cache is None or not self.reply_cache.applies(context):
+            return self._stream_api(self._reply_messages(user_input, context), temperature=0.7, on_delta=on_delta,
+                                    context=context)
         
-        return self._call_api(messages, temperature=0.7)
+        key = self.reply_cache.make_key(user_input, context)
+        reply = self.reply_cache.get(key)
+        if reply is not None:
+            if on_delta:
+                on_delta(reply)
+            return reply
+        messages = self._reply_messages(user_input, context, self.reply_cache.history(context))
+        # 中途断开的回复不完整，只缓存完整收到的
+        return self._stream_api(messages, temperature=0.7, on_delta=on_delta,
+                                on_complete=lambda text: self.reply_cache.put(key, text), context=context)
+    
+    def _admit(self, messages, priority: int):
+        """每次尝试（含重试和对冲）发出前经限流器申请；被拒绝时抛出 AttemptRejected，
+        调用方立即改走规则路径"""
+        if self.rate_limiter is None:
+            return
+        tokens = estimate_messages_tokens(messages) + COMPLETION_ESTIMATES.get(priority, 0)
+        if not self.rate_limiter.acquire(tokens, priority):
+            raise AttemptRejected("请求过多，已限流")
+    
+    def _raise_for_status(self, response):
+        """检查响应状态；服务端限流（429）时让限流器暂停放行"""
+        if response.status_code == 429 and self.rate_limiter is not None:
+            try:
+                retry_after = float(response.headers.get("Retry-After", 1))
+            except ValueError:
+                retry_after = 1.0
+            self.rate_limiter.backoff(retry_after)
+        response.raise_for_status()
+    
+    def _record_usage(self, kind: str, context: Optional[Dict[str, Any]], started: float, messages,
+                      reply: Optional[str], usage: Dict[str, int], ok: bool = True):
+        """记录一次调用的耗时和token用量；响应没有 usage 时按字符估计。
+        context 为列表时（批量请求）用量分摊到列表中的各会话"""
+        if self.usage_tracker is None:
+            return
+        latency = time.perf_counter() - started
+        estimated = False
+        if reply is None:
+            prompt_tokens, completion_tokens, ok = 0, 0, False
+        elif usage:
+            prompt_tokens, completion_tokens = usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+        else:
+            prompt_tokens, completion_tokens = estimate_messages_tokens(messages), estimate_tokens(reply)
+            estimated = True
+        if isinstance(context, list):
+            self.usage_tracker.record_shared(kind, context, latency, prompt_tokens, completion_tokens,
+                                             ok=ok, estimated=estimated)
+        else:
+            self.usage_tracker.record(kind, context, latency, prompt_tokens, completion_tokens,
+                                      ok=ok, estimated=estimated)
     
-    def _call_api(self, messages, temperature=0.1) -> str:
+    def _call_api(self, messages, temperature=0.1, priority=PRIORITY_REPLY, context=None) -> str:
         """调用智谱AI API"""
         if isinstance(messages, str):
             messages = [{"role": "user", "content": messages}]
         
         if not self.api_key:
-            return "AI功能未启用：请设置ZHIPU_API_KEY环境变量"
+            return ErrorReply("AI功能未启用：请设置ZHIPU_API_KEY环境变量")
         
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -121,28 +346,117 @@ class ZhipuAIClient:
         
         # 智谱AI的请求格式
         payload = {
-            "model": "glm-4",  # 使用GLM-4模型
+            "model": self.model,
             "messages": messages,
             "temperature": temperature,
             "max_tokens": 1024
         }
+        usage: Dict[str, int] = {}
         
-        try:
-            response = requests.post(
+        sent = []
+        
+        def attempt():
+            self._admit(messages, priority)
+            sent.append(True)
+            response = self.session.post(
                 self.base_url,
                 headers=headers,
                 json=payload,
-                timeout=30
+                timeout=self.timeout
             )
-            response.raise_for_status()
+            self._raise_for_status(response)
             
             result = response.json()
+            usage.update(result.get("usage") or {})
             # 智谱AI的响应格式
             return result["choices"][0]["message"]["content"].strip()
-            
+        
+        kind = "intent" if priority == PRIORITY_INTENT else "reply"
+        started = time.perf_counter()
+        reply = None
+        try:
+            reply = self._send(attempt)
+            return reply
+        except CircuitOpenError:
+            return ErrorReply("AI服务不可用：熔断中，请稍后再试")
+        except AttemptRejected:
+            return ErrorReply("AI服务暂时不可用：请求过多，已限流")
         except requests.exceptions.RequestException as e:
-            return f"网络错误：{e}"
+            return ErrorReply(f"网络错误：{e}")
         except KeyError:
-            return "API响应格式错误"
+            return ErrorReply("API响应格式错误")
+        except Exception as e:
+            return ErrorReply(f"AI服务暂时不可用：{e}")
+        finally:
+            # 熔断或限流拒绝时没有发出请求，不计用量
+            if sent:
+                self._record_usage(kind, context, started, messages, reply, usage)
+    
+    def _stream_api(self, messages, temperature=0.7, on_delta=None, on_complete=None, context=None) -> str:
+        """以流式方式调用智谱AI API，逐段转发增量文本；完整收到回复时调用 on_complete"""
+        if not self.api_key:
+            return ErrorReply("AI功能未启用：请设置ZHIPU_API_KEY环境变量")
+        
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream"
+        }
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": 1024,
+            "stream": True
+        }
+        
+        parts: List[str] = []
+        # 最后一个事件带有整次请求的 usage
+        usage: Dict[str, int] = {}
+        
+        def attempt():
+            self._admit(messages, PRIORITY_REPLY)
+            with self.session.post(self.base_url, headers=headers, json=payload, timeout=self.timeout,
+                                   stream=True) as response:
+                self._raise_for_status(response)
+                response.encoding = "utf-8"
+                for data in iter_sse_data(response.iter_lines(decode_unicode=True)):
+                    if data == "[DONE]":
+                        break
+                    try:
+                        event = json.loads(data)
+                        usage.update(event.get("usage") or {})
+                        delta = event["choices"][0].get("delta", {}).get("content")
+                    except (ValueError, KeyError, IndexError, AttributeError):
+                        continue
+                    if delta:
+                        parts.append(delta)
+                        if on_delta:
+                            on_delta(delta)
+        
+        started = time.perf_counter()
+        try:
+            # 已经转发出去的文本无法撤回，流式请求不重试也不对冲
+            self._send(attempt, idempotent=False)
+            self._record_usage("stream", context, started, messages, "".join(parts) if parts else None, usage)
+            if parts and on_complete:
+                on_complete("".join(parts).strip())
+        except CircuitOpenError:
+            return ErrorReply("AI服务不可用：熔断中，请稍后再试")
+        except AttemptRejected:
+            return ErrorReply("AI服务暂时不可用：请求过多，已限流")
+        except requests.exceptions.RequestException as e:
+            self._record_usage("stream", context, started, messages, "".join(parts) if parts else None, usage,
+                               ok=False)
+            # 已经输出的部分保留，只有什么都没收到时才返回错误信息
+            if not parts:
+                return ErrorReply(f"网络错误：{e}")
         except Exception as e:
-            return f"AI服务暂时不可用：{e}"
\ No newline at end of file
+            self._record_usage("stream", context, started, messages, "".join(parts) if parts else None, usage,
+                               ok=False)
+            if not parts:
+                return ErrorReply(f"AI服务暂时不可用：{e}")
+        
+        if not parts:
+            return ErrorReply("API响应格式错误")
+        return "".join(parts).strip()
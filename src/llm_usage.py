@@ -0,0 +1,167 @@
+import csv
+import json
+import time
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional
+
+
+class UsageRecord(NamedTuple):
+    """一次LLM调用的用量记录"""
+    timestamp: float
+    session_id: str
+    module: str
+    step: str
+    kind: str  # intent / reply / stream / complete
+    latency_ms: float
+    prompt_tokens: int
+    completion_tokens: int
+    ok: bool
+    estimated: bool  # 响应没有 usage 时按字符估计
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+class _Aggregate:
+    """一个维度（会话/步骤）的累计用量"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.latency_ms = 0.0
+        self.max_latency_ms = 0.0
+
+    def add(self, record: UsageRecord):
+        self.calls += 1
+        self.errors += 0 if record.ok else 1
+        self.prompt_tokens += record.prompt_tokens
+        self.completion_tokens += record.completion_tokens
+        self.latency_ms += record.latency_ms
+        self.max_latency_ms = max(self.max_latency_ms, record.latency_ms)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "avg_latency_ms": round(self.latency_ms / self.calls, 1) if self.calls else 0.0,
+            "max_latency_ms": round(self.max_latency_ms, 1),
+        }
+
+
+class UsageTracker:
+    """按会话和脚本步骤统计LLM调用的耗时与token用量
+
+    客户端每次调用后 record 一条记录，内存中按会话、步骤（模块.步骤名）累计，
+    最近的 max_records 条明细可导出为 CSV，汇总可导出为 JSON。设置
+    session_token_budget 后，会话用量超出预算时 over_budget 返回 True，
+    解释器据此对该会话改用规则模式。多个会话线程可共享一个实例。
+    """
+
+    def __init__(self, session_token_budget: Optional[int] = None, max_records: int = 10000):
+        self.session_token_budget = session_token_budget
+        self._records: Deque[UsageRecord] = deque(maxlen=max_records)
+        self._sessions: Dict[str, _Aggregate] = {}
+        self._steps: Dict[str, _Aggregate] = {}
+        self._total = _Aggregate()
+        self._lock = threading.Lock()
+
+    def record(self, kind: str, context: Optional[Dict[str, Any]], latency: float,
+               prompt_tokens: int, completion_tokens: int, ok: bool = True, estimated: bool = False) -> UsageRecord:
+        """记录一次调用；context 为解释器传给客户端的上下文，缺少的字段记为空"""
+        context = context or {}
+        record = UsageRecord(
+            timestamp=time.time(),
+            session_id=str(context.get("session_id") or ""),
+            module=str(context.get("script_module") or ""),
+            step=str(context.get("current_step") or ""),
+            kind=kind,
+            latency_ms=round(latency * 1000, 1),
+            prompt_tokens=int(prompt_tokens),
+            completion_tokens=int(completion_tokens),
+            ok=ok,
+            estimated=estimated,
+        )
+        step_key = f"{record.module}.{record.step}" if record.module else record.step or "-"
+        with self._lock:
+            self._records.append(record)
+            self._sessions.setdefault(record.session_id or "-", _Aggregate()).add(record)
+            self._steps.setdefault(step_key, _Aggregate()).add(record)
+            self._total.add(record)
+        return record
+
+    def record_shared(self, kind: str, contexts: List[Optional[Dict[str, Any]]], latency: float,
+                      prompt_tokens: int, completion_tokens: int, ok: bool = True,
+                      estimated: bool = False) -> List[UsageRecord]:
+        """记录多个会话共享的一次调用（如批量意图识别）：token 平均分摊到各上下文，
+        余数计入前面的上下文；每个会话都等待了整次调用，耗时不分摊"""
+        if not contexts:
+            return [self.record(kind, None, latency, prompt_tokens, completion_tokens, ok, estimated)]
+        count = len(contexts)
+        records = []
+        for index, context in enumerate(contexts):
+            records.append(self.record(
+                kind, context, latency,
+                prompt_tokens // count + (1 if index < prompt_tokens % count else 0),
+                completion_tokens // count + (1 if index < completion_tokens % count else 0),
+                ok, estimated
+            ))
+        return records
+
+    def session_tokens(self, session_id: str) -> int:
+        """会话累计使用的token数"""
+        with self._lock:
+            aggregate = self._sessions.get(session_id)
+            return aggregate.total_tokens if aggregate else 0
+
+    def over_budget(self, session_id: Optional[str]) -> bool:
+        """会话用量已超出预算（未设置预算或没有会话ID时总是 False）"""
+        if not self.session_token_budget or not session_id:
+            return False
+        return self.session_tokens(session_id) >= self.session_token_budget
+
+    def summary(self) -> Dict[str, Any]:
+        """总计以及按会话、按步骤的汇总"""
+        with self._lock:
+            return {
+                "total": self._total.to_dict(),
+                "by_step": {key: aggregate.to_dict() for key, aggregate in self._steps.items()},
+                "by_session": {key: aggregate.to_dict() for key, aggregate in self._sessions.items()},
+                "session_token_budget": self.session_token_budget,
+            }
+
+    def records(self) -> List[UsageRecord]:
+        """保留的明细记录（最早的在前）"""
+        with self._lock:
+            return list(self._records)
+
+    def export_csv(self, path: str):
+        """明细导出为 CSV"""
+        columns = list(UsageRecord._fields) + ["total_tokens"]
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            for record in self.records():
+                writer.writerow({**record._asdict(), "total_tokens": record.total_tokens})
+
+    def export_json(self, path: str):
+        """汇总导出为 JSON"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, ensure_ascii=False, indent=2)
+
+    def export(self, path: str):
+        """按扩展名导出：.csv 为明细，其余为 JSON 汇总"""
+        if path.lower().endswith(".csv"):
+            self.export_csv(path)
+        else:
+            self.export_json(path)
@@ -10,19 +10,73 @@ sys.path.insert(0, project_root)
 
 from src.dsl_parser import load_script_from_file
 from src.interpreter import DSLInterpreter
-from src.llm_client import ZhipuAIClient
+from src.llm_client import DEFAULT_TIMEOUT, CircuitBreaker, ResilientCaller, RetryPolicy
+from src.llm_backends import BACKEND_NAMES, build_backend, http_clients, is_error_reply
+from src.query_cache import QueryCache
+from src.intent_cache import IntentCache
+from src.reply_cache import ReplyCache
+from src.rate_limiter import LLMRateLimiter
+from src.llm_usage import UsageTracker
+from src.similarity_index import DEFAULT_SIMILARITY_THRESHOLD
+from src.write_batcher import WriteBatcher
+from src.inventory import InventoryEngine
+from src.query_audit import audit_script, format_report, has_problems
+from src.db_pool import is_uri, open_memory_db
 from database.init_db import init_db
 
 class DSLChatbot:
     """DSL智能客服主类"""
     
-    def __init__(self, script_path: str, use_ai: bool = True, db_path: str = None):
+    def __init__(self, script_path: str, use_ai: bool = True, db_path: str = None,
+                 query_cache: QueryCache = None, group_commit_window_ms: float = None,
+                 use_inventory: bool = False, audit_sql: bool = False, strict_sql: bool = False,
+                 intent_cache: IntentCache = None, reply_cache: ReplyCache = None,
+                 similarity_threshold: float = DEFAULT_SIMILARITY_THRESHOLD,
+                 stream_replies: bool = False, llm_timeout: float = DEFAULT_TIMEOUT,
+                 llm_retries: int = 2, llm_hedge: bool = False, llm_base_url: str = None,
+                 rate_limiter: LLMRateLimiter = None, usage_tracker: UsageTracker = None,
+                 usage_export: str = None, llm_intent_backend: str = None, llm_reply_backend: str = None,
+                 openai_base_url: str = None, openai_model: str = None):
         self.script_path = script_path
         self.use_ai = use_ai
         self.db_path = db_path
+        self.query_cache = query_cache
+        self.group_commit_window_ms = group_commit_window_ms
+        self.write_batcher = None
+        self.use_inventory = use_inventory
+        self.inventory = None
+        self.audit_sql = audit_sql or strict_sql
+        self.strict_sql = strict_sql
+        self.intent_cache = intent_cache
+        self.reply_cache = reply_cache
+        self.similarity_threshold = similarity_threshold
+        self.stream_replies = stream_replies
+        self.llm_timeout = llm_timeout
+        self.llm_retries = llm_retries
+        self.llm_hedge = llm_hedge
+        self.llm_base_url = llm_base_url
+        self.rate_limiter = rate_limiter
+        self.usage_tracker = usage_tracker
+        self.usage_export = usage_export
+        # 意图识别和回复生成可以使用不同的后端，如本地模型识别意图、托管模型生成回复
+        self.llm_intent_backend = llm_intent_backend
+        self.llm_reply_backend = llm_reply_backend
+        self.openai_base_url = openai_base_url
+        self.openai_model = openai_model
         self.llm_client = None
         self.interpreter = None
         
+    def _build_resilience(self) -> ResilientCaller:
+        """LLM调用的重试、熔断和对冲策略"""
+        def on_state_change(previous, state):
+            print(f"\n[AI服务熔断器: {previous} -> {state}]")
+        
+        return ResilientCaller(
+            retry=RetryPolicy(max_attempts=self.llm_retries + 1),
+            breaker=CircuitBreaker(on_state_change=on_state_change),
+            hedge=self.llm_hedge
+        )
+    
     def initialize(self):
         """初始化系统"""
         print("初始化DSL智能客服系统...")
@@ -40,14 +94,27 @@ class DSLChatbot:
         # 2. 初始化LLM客户端
         if self.use_ai:
             print("初始化AI服务...")
-            self.llm_client = ZhipuAIClient()
+            self.llm_client = build_backend(
+                self.llm_intent_backend, self.llm_reply_backend, timeout=self.llm_timeout,
+                options={
+                    "zhipu": {"base_url": self.llm_base_url},
+                    "openai": {"base_url": self.openai_base_url, "model": self.openai_model},
+                }
+            )
             # 测试AI连接
             try:
                 test_result = self.llm_client.recognize_intent("测试", ["测试"])
-                if "错误" in test_result or "未启用" in test_result:
+                if is_error_reply(test_result):
                     print("AI服务不可用，将使用规则模式")
                     self.llm_client = None
                 else:
+                    # 连接测试之后再挂上缓存，避免持久化的结果掩盖服务不可用；每个服务各有一个熔断器
+                    for client in http_clients(self.llm_client):
+                        client.intent_cache = self.intent_cache
+                        client.reply_cache = self.reply_cache
+                        client.resilience = self._build_resilience()
+                        client.rate_limiter = self.rate_limiter
+                        client.usage_tracker = self.usage_tracker
                     print("AI服务初始化成功")
             except Exception as e:
                 print(f"AI服务初始化失败: {e}")
@@ -59,10 +126,14 @@ class DSLChatbot:
         if self.db_path:
             print(f"初始化数据库: {self.db_path}")
             try:
-                # 确保数据库目录存在
-                db_dir = os.path.dirname(self.db_path)
-                if db_dir and not os.path.exists(db_dir):
-                    os.makedirs(db_dir)
+                if is_uri(self.db_path):
+                    # 内存数据库（file:/name?vfs=memdb）需要锚连接，否则初始化后即被释放
+                    open_memory_db(self.db_path)
+                else:
+                    # 确保数据库目录存在
+                    db_dir = os.path.dirname(self.db_path)
+                    if db_dir and not os.path.exists(db_dir):
+                        os.makedirs(db_dir)
                 
                 # 传递数据库路径给init_db
                 init_db(self.db_path)
@@ -71,13 +142,41 @@ class DSLChatbot:
                 print(f"数据库初始化失败: {e}")
                 self.db_path = None
         
+        # 加载时审查脚本中每条SQL的执行计划，严格模式下有问题则拒绝启动
+        if self.db_path and self.audit_sql:
+            findings = audit_script(script_ast, self.db_path)
+            print(format_report(findings))
+            if self.strict_sql and has_problems(findings):
+                print("SQL审查未通过，拒绝启动（去掉 --strict-sql 可忽略）")
+                return False
+        
+        # 启用组提交时，DBExec 交给专用写线程合并提交
+        if self.db_path and self.group_commit_window_ms is not None:
+            self.write_batcher = WriteBatcher(self.db_path, max_delay_ms=self.group_commit_window_ms)
+            print(f"组提交已启用，合并窗口 {self.group_commit_window_ms}ms")
+        
+        # 启用库存引擎时，热点商品的 Reserve/Release 走内存计数并异步写回数据库
+        if self.db_path and self.use_inventory:
+            try:
+                on_flush = self.query_cache.invalidate_tables if self.query_cache is not None else None
+                self.inventory = InventoryEngine(self.db_path, on_flush=on_flush)
+                print(f"库存引擎已启用，管理商品: {self.inventory.stats()['skus']} 个")
+            except Exception as e:
+                print(f"库存引擎启动失败，使用数据库更新: {e}")
+                self.inventory = None
+        
         # 4. 创建解释器
         try:
             self.interpreter = DSLInterpreter(
                 script_ast=script_ast,
                 llm_client=self.llm_client,
-                db_path=self.db_path
+                db_path=self.db_path,
+                query_cache=self.query_cache,
+                write_batcher=self.write_batcher,
+                inventory=self.inventory,
+                similarity_threshold=self.similarity_threshold
             )
+            self.interpreter.stream_replies = self.stream_replies
             print("解释器初始化成功")
         except Exception as e:
             print(f"解释器初始化失败: {e}")
@@ -103,6 +202,42 @@ class DSLChatbot:
         except Exception as e:
             print(f"\n系统运行出错: {e}")
         finally:
+            print(f"意图匹配统计: {self.interpreter.intent_stats}")
+            if self.llm_client is not None:
+                for client in http_clients(self.llm_client):
+                    print(f"AI调用统计: {client.resilience_stats()}")
+                if self.rate_limiter is not None:
+                    print(f"AI限流统计: {self.rate_limiter.stats()}")
+                self.llm_client.close()
+            if self.llm_client is not None and self.usage_tracker is not None:
+                summary = self.usage_tracker.summary()
+                print(f"AI用量统计: {summary['total']}")
+                for step, usage in summary["by_step"].items():
+                    print(f"   {step}: {usage}")
+                if self.usage_export:
+                    try:
+                        self.usage_tracker.export(self.usage_export)
+                        print(f"AI用量已导出: {self.usage_export}")
+                    except OSError as e:
+                        print(f"AI用量导出失败: {e}")
+            if self.query_cache is not None:
+                print(f"查询缓存统计: {self.query_cache.stats()}")
+            if self.reply_cache is not None:
+                print(f"回复缓存统计: {self.reply_cache.stats()}")
+                self.reply_cache.close()
+            if self.intent_cache is not None:
+                print(f"意图缓存统计: {self.intent_cache.stats()}")
+                if self.intent_cache.persist_path:
+                    try:
+                        self.intent_cache.save()
+                    except OSError as e:
+                        print(f"意图缓存保存失败: {e}")
+            if self.write_batcher is not None:
+                self.write_batcher.close()
+                print(f"组提交统计: {self.write_batcher.stats()}")
+            if self.inventory is not None:
+                self.inventory.close()
+                print(f"库存引擎统计: {self.inventory.stats()}")
             print("\n感谢使用DSL智能客服系统！")
 
 def get_script_path(module_type: str) -> str:
@@ -139,13 +274,163 @@ def main():
     )
     parser.add_argument(
         "--db-path",
-        help="数据库文件路径（电商模块需要）"
+        help="数据库文件路径（电商模块需要），也可以是 SQLite URI，如共享内存数据库 file:/shop?vfs=memdb"
     )
     parser.add_argument(
         "--no-ai",
         action="store_true",
         help="禁用AI功能，使用纯规则模式"
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="AI回复使用流式输出，边生成边显示"
+    )
+    parser.add_argument(
+        "--query-cache",
+        action="store_true",
+        help="启用DBQuery结果缓存（DBExec写表时自动失效）"
+    )
+    parser.add_argument(
+        "--query-cache-ttl",
+        type=float,
+        default=None,
+        help="查询缓存默认有效期（秒），默认不过期"
+    )
+    parser.add_argument(
+        "--reply-cache",
+        metavar="DB_FILE",
+        default=None,
+        help="启用AI回复缓存（SQLite文件），只用于允许列表中的问答步骤"
+    )
+    parser.add_argument(
+        "--reply-cache-ttl",
+        type=float,
+        default=7 * 24 * 3600,
+        help="回复缓存有效期（秒），默认7天"
+    )
+    parser.add_argument(
+        "--reply-cache-steps",
+        default=None,
+        help="允许缓存回复的步骤，逗号分隔（如 sciAI,regAI），默认使用模块的内置列表"
+    )
+    parser.add_argument(
+        "--intent-cache",
+        action="store_true",
+        help="启用意图识别结果缓存（相同说法不再调用AI）"
+    )
+    parser.add_argument(
+        "--intent-cache-ttl",
+        type=float,
+        default=3600,
+        help="意图缓存有效期（秒），默认3600"
+    )
+    parser.add_argument(
+        "--intent-cache-file",
+        default=None,
+        help="意图缓存持久化文件（JSON），启动时加载、退出时保存（包含 --intent-cache）"
+    )
+    parser.add_argument(
+        "--similarity-threshold",
+        type=float,
+        default=DEFAULT_SIMILARITY_THRESHOLD,
+        help=f"本地相似度匹配阈值，低于该值才调用AI识别意图，默认{DEFAULT_SIMILARITY_THRESHOLD}"
+    )
+    parser.add_argument(
+        "--no-similarity",
+        action="store_true",
+        help="关闭本地相似度匹配（仍保留关键词和同义词匹配）"
+    )
+    parser.add_argument(
+        "--llm-base-url",
+        default=None,
+        help="AI服务的 chat/completions 地址，默认智谱AI（也可用环境变量 ZHIPU_BASE_URL）；"
+             "压测时可指向 src/stub_llm_server.py 启动的本地替身服务"
+    )
+    parser.add_argument(
+        "--llm-intent-backend",
+        choices=BACKEND_NAMES,
+        default=None,
+        help="意图识别使用的后端：zhipu（默认）、openai（OpenAI兼容的本地服务）或 rules（本地规则）"
+    )
+    parser.add_argument(
+        "--llm-reply-backend",
+        choices=BACKEND_NAMES,
+        default=None,
+        help="AIReply 回复生成使用的后端，取值同上，默认 zhipu"
+    )
+    parser.add_argument(
+        "--openai-base-url",
+        default=None,
+        help="OpenAI兼容服务的地址（如 http://127.0.0.1:8000/v1），默认读取 OPENAI_BASE_URL"
+    )
+    parser.add_argument(
+        "--openai-model",
+        default=None,
+        help="OpenAI兼容服务的模型名，默认读取 OPENAI_MODEL"
+    )
+    parser.add_argument(
+        "--llm-timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help=f"单次AI请求的超时时间（秒），默认{DEFAULT_TIMEOUT}"
+    )
+    parser.add_argument(
+        "--llm-retries",
+        type=int,
+        default=2,
+        help="AI请求遇到网络错误、超时、429或5xx时的重试次数（指数退避），默认2"
+    )
+    parser.add_argument(
+        "--llm-rpm",
+        type=float,
+        default=None,
+        help="客户端限流：每分钟最多发出的AI请求数，超出时意图识别优先，等不及的请求直接走默认分支"
+    )
+    parser.add_argument(
+        "--llm-tpm",
+        type=float,
+        default=None,
+        help="客户端限流：每分钟最多使用的token数（按字符估计）"
+    )
+    parser.add_argument(
+        "--llm-session-budget",
+        type=int,
+        default=None,
+        help="每个会话最多使用的AI token数，超出后该会话改用规则模式"
+    )
+    parser.add_argument(
+        "--llm-usage-export",
+        default=None,
+        metavar="FILE",
+        help="退出时导出AI用量：.csv 为逐次调用明细，其余扩展名为按会话/步骤汇总的JSON"
+    )
+    parser.add_argument(
+        "--llm-hedge",
+        action="store_true",
+        help="AI请求超过近期p95耗时未返回时再发一个相同请求，取先返回的结果"
+    )
+    parser.add_argument(
+        "--group-commit-window-ms",
+        type=float,
+        default=None,
+        help="启用DBExec组提交并设置合并窗口（毫秒）"
+    )
+    parser.add_argument(
+        "--inventory",
+        action="store_true",
+        help="启用内存库存引擎（热点商品预留走内存计数，异步写回数据库）"
+    )
+    parser.add_argument(
+        "--audit-sql",
+        action="store_true",
+        help="启动时对脚本中的SQL运行 EXPLAIN QUERY PLAN 并输出报告"
+    )
+    parser.add_argument(
+        "--strict-sql",
+        action="store_true",
+        help="SQL审查发现全表扫描或临时B树时拒绝启动（包含 --audit-sql）"
+    )
     
     args = parser.parse_args()
     
@@ -167,7 +452,31 @@ def main():
         chatbot = DSLChatbot(
             script_path=script_path,
             use_ai=not args.no_ai,
-            db_path=db_path
+            db_path=db_path,
+            query_cache=QueryCache(default_ttl=args.query_cache_ttl) if args.query_cache else None,
+            group_commit_window_ms=args.group_commit_window_ms,
+            use_inventory=args.inventory,
+            audit_sql=args.audit_sql,
+            strict_sql=args.strict_sql,
+            intent_cache=IntentCache(ttl=args.intent_cache_ttl, persist_path=args.intent_cache_file)
+            if args.intent_cache or args.intent_cache_file else None,
+            reply_cache=ReplyCache(
+                args.reply_cache, ttl=args.reply_cache_ttl,
+                allowed_steps={args.module: args.reply_cache_steps.split(",")} if args.reply_cache_steps else None
+            ) if args.reply_cache else None,
+            similarity_threshold=None if args.no_similarity else args.similarity_threshold,
+            stream_replies=args.stream,
+            llm_timeout=args.llm_timeout,
+            llm_retries=args.llm_retries,
+            llm_hedge=args.llm_hedge,
+            llm_base_url=args.llm_base_url,
+            rate_limiter=LLMRateLimiter(args.llm_rpm, args.llm_tpm) if args.llm_rpm or args.llm_tpm else None,
+            usage_tracker=UsageTracker(session_token_budget=args.llm_session_budget),
+            usage_export=args.llm_usage_export,
+            llm_intent_backend=args.llm_intent_backend,
+            llm_reply_backend=args.llm_reply_backend,
+            openai_base_url=args.openai_base_url,
+            openai_model=args.openai_model
         )
         
         chatbot.run()
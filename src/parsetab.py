@@ -6,9 +6,9 @@ _tabversion = '3.10'
 
 _lr_method = 'LALR'
 
-_lr_signature = 'AIREPLY ARROW ASSIGN CASE COMPARE DBEXEC DBQUERY DEFAULT EXIT GOTO ID IF LISTEN LOCK MODULE NUMBER SPEAK STEP STRING UNLOCKscript : module_def stepsmodule_def : MODULE STRINGsteps : step steps\n             | stepstep : STEP ID actionsactions : action actions\n               | actionaction : speak_action\n              | listen_action\n              | case_action\n              | default_action\n              | goto_action\n              | aireply_action\n              | exit_action\n              | lock_action\n              | unlock_action\n              | dbquery_action\n              | dbexec_action\n              | if_action\n              | listen_assign_actionspeak_action : SPEAK STRINGlisten_action : LISTENlisten_assign_action : LISTEN ASSIGN IDcase_action : CASE STRING ARROW GOTO IDdefault_action : DEFAULT ARROW GOTO IDgoto_action : GOTO IDaireply_action : AIREPLYexit_action : EXITlock_action : LOCK STRINGunlock_action : UNLOCK STRINGdbquery_action : DBQUERY STRING ARROW GOTO ID IDdbexec_action : DBEXEC STRINGif_action : IF condition ARROW GOTO IDcondition : ID COMPARE NUMBER\n                 | ID COMPARE ID\n                 | ID COMPARE STRING'
+_lr_signature = 'AIREPLY ARROW ASSIGN CACHE CASE COMMA COMPARE DBEXEC DBQUERY DEFAULT ENDFOREACH EXIT FOREACH GOTO ID IF IN LISTEN LOCK MODULE NUMBER RELEASE RESERVE ROWS SPEAK STEP STRING SYNONYM UNLOCKscript : module_def stepsmodule_def : MODULE STRINGsteps : step steps\n             | stepstep : STEP ID actionsactions : action actions\n               | actionaction : speak_action\n              | listen_action\n              | case_action\n              | synonym_action\n              | default_action\n              | goto_action\n              | aireply_action\n              | exit_action\n              | lock_action\n              | unlock_action\n              | dbquery_action\n              | dbexec_action\n              | if_action\n              | foreach_action\n              | reserve_action\n              | release_action\n              | listen_assign_actionspeak_action : SPEAK STRINGlisten_action : LISTENlisten_assign_action : LISTEN ASSIGN IDcase_action : CASE STRING ARROW GOTO IDsynonym_action : SYNONYM STRING string_liststring_list : STRING string_list\n                   | STRINGdefault_action : DEFAULT ARROW GOTO IDgoto_action : GOTO IDaireply_action : AIREPLYexit_action : EXITlock_action : LOCK STRINGunlock_action : UNLOCK STRINGdbquery_action : DBQUERY STRING ARROW GOTO ID id_list\n                      | DBQUERY STRING ARROW GOTO ID id_list query_optionsquery_options : query_option\n                     | query_option query_optionsquery_option : CACHE NUMBER\n                    | ROWS\n                    | ROWS NUMBERdbexec_action : DBEXEC STRING\n                     | DBEXEC STRING ARROW ASSIGN id_listid_list : ID\n               | ID COMMA id_listforeach_action : FOREACH ID IN ID actions ENDFOREACHreserve_action : RESERVE STRING quantity\n                      | RESERVE STRING quantity ARROW ASSIGN IDrelease_action : RELEASE STRING quantityquantity : NUMBER\n                | IDif_action : IF condition ARROW GOTO IDcondition : ID COMPARE NUMBER\n                 | ID COMPARE ID\n                 | ID COMPARE STRING'
     
-_lr_action_items = {'MODULE':([0,],[3,]),'$end':([1,4,5,8,10,11,12,13,14,15,16,17,18,19,20,21,22,23,24,26,30,31,37,38,41,43,44,46,49,56,62,64,65,],[0,-1,-4,-3,-5,-7,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-22,-27,-28,-6,-21,-26,-29,-30,-32,-23,-25,-24,-33,-31,]),'STEP':([2,5,7,10,11,12,13,14,15,16,17,18,19,20,21,22,23,24,26,30,31,37,38,41,43,44,46,49,56,62,64,65,],[6,6,-2,-5,-7,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-22,-27,-28,-6,-21,-26,-29,-30,-32,-23,-25,-24,-33,-31,]),'STRING':([3,25,27,32,33,34,35,54,],[7,38,40,43,44,45,46,61,]),'ID':([6,28,36,39,51,54,55,57,58,63,],[9,41,48,49,56,59,62,63,64,65,]),'SPEAK':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,26,30,31,38,41,43,44,46,49,56,62,64,65,],[25,25,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-22,-27,-28,-21,-26,-29,-30,-32,-23,-25,-24,-33,-31,]),'LISTEN':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,26,30,31,38,41,43,44,46,49,56,62,64,65,],[26,26,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-22,-27,-28,-21,-26,-29,-30,-32,-23,-25,-24,-33,-31,]),'CASE':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,26,30,31,38,41,43,44,46,49,56,62,64,65,],[27,27,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-22,-27,-28,-21,-26,-29,-30,-32,-23,-25,-24,-33,-31,]),'DEFAULT':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,26,30,31,38,41,43,44,46,49,56,62,64,65,],[29,29,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-22,-27,-28,-21,-26,-29,-30,-32,-23,-25,-24,-33,-31,]),'GOTO':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,26,30,31,38,41,42,43,44,46,49,50,52,53,56,62,64,65,],[28,28,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-22,-27,-28,-21,-26,51,-29,-30,-32,-23,55,57,58,-25,-24,-33,-31,]),'AIREPLY':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,26,30,31,38,41,43,44,46,49,56,62,64,65,],[30,30,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-22,-27,-28,-21,-26,-29,-30,-32,-23,-25,-24,-33,-31,]),'EXIT':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,26,30,31,38,41,43,44,46,49,56,62,64,65,],[31,31,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-22,-27,-28,-21,-26,-29,-30,-32,-23,-25,-24,-33,-31,]),'LOCK':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,26,30,31,38,41,43,44,46,49,56,62,64,65,],[32,32,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-22,-27,-28,-21,-26,-29,-30,-32,-23,-25,-24,-33,-31,]),'UNLOCK':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,26,30,31,38,41,43,44,46,49,56,62,64,65,],[33,33,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-22,-27,-28,-21,-26,-29,-30,-32,-23,-25,-24,-33,-31,]),'DBQUERY':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,26,30,31,38,41,43,44,46,49,56,62,64,65,],[34,34,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-22,-27,-28,-21,-26,-29,-30,-32,-23,-25,-24,-33,-31,]),'DBEXEC':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,26,30,31,38,41,43,44,46,49,56,62,64,65,],[35,35,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-22,-27,-28,-21,-26,-29,-30,-32,-23,-25,-24,-33,-31,]),'IF':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,26,30,31,38,41,43,44,46,49,56,62,64,65,],[36,36,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-22,-27,-28,-21,-26,-29,-30,-32,-23,-25,-24,-33,-31,]),'ASSIGN':([26,],[39,]),'ARROW':([29,40,45,47,59,60,61,],[42,50,52,53,-35,-34,-36,]),'COMPARE':([48,],[54,]),'NUMBER':([54,],[60,]),}
+_lr_action_items = {'MODULE':([0,],[3,]),'$end':([1,4,5,8,10,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,30,35,36,45,46,49,52,53,55,61,63,64,71,72,73,74,76,77,86,88,89,90,93,95,96,97,98,100,101,102,103,104,],[0,-1,-4,-3,-5,-7,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-21,-22,-23,-24,-26,-34,-35,-6,-25,-33,-36,-37,-45,-27,-31,-29,-50,-54,-53,-52,-30,-32,-28,-46,-47,-55,-38,-49,-51,-39,-40,-43,-48,-41,-42,-44,]),'STEP':([2,5,7,10,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,30,35,36,45,46,49,52,53,55,61,63,64,71,72,73,74,76,77,86,88,89,90,93,95,96,97,98,100,101,102,103,104,],[6,6,-2,-5,-7,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-21,-22,-23,-24,-26,-34,-35,-6,-25,-33,-36,-37,-45,-27,-31,-29,-50,-54,-53,-52,-30,-32,-28,-46,-47,-55,-38,-49,-51,-39,-40,-43,-48,-41,-42,-44,]),'STRING':([3,29,31,33,37,38,39,40,43,44,50,63,69,],[7,46,48,50,52,53,54,55,59,60,63,63,83,]),'ID':([6,32,41,42,47,59,60,65,69,70,75,78,79,80,87,92,94,],[9,49,57,58,61,72,72,77,81,84,86,87,89,90,89,96,89,]),'SPEAK':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,30,35,36,46,49,52,53,55,61,63,64,71,72,73,74,76,77,84,86,88,89,90,93,95,96,97,98,100,101,102,103,104,],[29,29,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-21,-22,-23,-24,-26,-34,-35,-25,-33,-36,-37,-45,-27,-31,-29,-50,-54,-53,-52,-30,-32,29,-28,-46,-47,-55,-38,-49,-51,-39,-40,-43,-48,-41,-42,-44,]),'LISTEN':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,30,35,36,46,49,52,53,55,61,63,64,71,72,73,74,76,77,84,86,88,89,90,93,95,96,97,98,100,101,102,103,104,],[30,30,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-21,-22,-23,-24,-26,-34,-35,-25,-33,-36,-37,-45,-27,-31,-29,-50,-54,-53,-52,-30,-32,30,-28,-46,-47,-55,-38,-49,-51,-39,-40,-43,-48,-41,-42,-44,]),'CASE':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,30,35,36,46,49,52,53,55,61,63,64,71,72,73,74,76,77,84,86,88,89,90,93,95,96,97,98,100,101,102,103,104,],[31,31,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-21,-22,-23,-24,-26,-34,-35,-25,-33,-36,-37,-45,-27,-31,-29,-50,-54,-53,-52,-30,-32,31,-28,-46,-47,-55,-38,-49,-51,-39,-40,-43,-48,-41,-42,-44,]),'SYNONYM':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,30,35,36,46,49,52,53,55,61,63,64,71,72,73,74,76,77,84,86,88,89,90,93,95,96,97,98,100,101,102,103,104,],[33,33,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-21,-22,-23,-24,-26,-34,-35,-25,-33,-36,-37,-45,-27,-31,-29,-50,-54,-53,-52,-30,-32,33,-28,-46,-47,-55,-38,-49,-51,-39,-40,-43,-48,-41,-42,-44,]),'DEFAULT':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,30,35,36,46,49,52,53,55,61,63,64,71,72,73,74,76,77,84,86,88,89,90,93,95,96,97,98,100,101,102,103,104,],[34,34,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-21,-22,-23,-24,-26,-34,-35,-25,-33,-36,-37,-45,-27,-31,-29,-50,-54,-53,-52,-30,-32,34,-28,-46,-47,-55,-38,-49,-51,-39,-40,-43,-48,-41,-42,-44,]),'GOTO':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,30,35,36,46,49,51,52,53,55,61,62,63,64,66,68,71,72,73,74,76,77,84,86,88,89,90,93,95,96,97,98,100,101,102,103,104,],[32,32,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-21,-22,-23,-24,-26,-34,-35,-25,-33,65,-36,-37,-45,-27,75,-31,-29,78,80,-50,-54,-53,-52,-30,-32,32,-28,-46,-47,-55,-38,-49,-51,-39,-40,-43,-48,-41,-42,-44,]),'AIREPLY':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,30,35,36,46,49,52,53,55,61,63,64,71,72,73,74,76,77,84,86,88,89,90,93,95,96,97,98,100,101,102,103,104,],[35,35,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-21,-22,-23,-24,-26,-34,-35,-25,-33,-36,-37,-45,-27,-31,-29,-50,-54,-53,-52,-30,-32,35,-28,-46,-47,-55,-38,-49,-51,-39,-40,-43,-48,-41,-42,-44,]),'EXIT':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,30,35,36,46,49,52,53,55,61,63,64,71,72,73,74,76,77,84,86,88,89,90,93,95,96,97,98,100,101,102,103,104,],[36,36,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-21,-22,-23,-24,-26,-34,-35,-25,-33,-36,-37,-45,-27,-31,-29,-50,-54,-53,-52,-30,-32,36,-28,-46,-47,-55,-38,-49,-51,-39,-40,-43,-48,-41,-42,-44,]),'LOCK':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,30,35,36,46,49,52,53,55,61,63,64,71,72,73,74,76,77,84,86,88,89,90,93,95,96,97,98,100,101,102,103,104,],[37,37,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-21,-22,-23,-24,-26,-34,-35,-25,-33,-36,-37,-45,-27,-31,-29,-50,-54,-53,-52,-30,-32,37,-28,-46,-47,-55,-38,-49,-51,-39,-40,-43,-48,-41,-42,-44,]),'UNLOCK':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,30,35,36,46,49,52,53,55,61,63,64,71,72,73,74,76,77,84,86,88,89,90,93,95,96,97,98,100,101,102,103,104,],[38,38,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-21,-22,-23,-24,-26,-34,-35,-25,-33,-36,-37,-45,-27,-31,-29,-50,-54,-53,-52,-30,-32,38,-28,-46,-47,-55,-38,-49,-51,-39,-40,-43,-48,-41,-42,-44,]),'DBQUERY':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,30,35,36,46,49,52,53,55,61,63,64,71,72,73,74,76,77,84,86,88,89,90,93,95,96,97,98,100,101,102,103,104,],[39,39,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-21,-22,-23,-24,-26,-34,-35,-25,-33,-36,-37,-45,-27,-31,-29,-50,-54,-53,-52,-30,-32,39,-28,-46,-47,-55,-38,-49,-51,-39,-40,-43,-48,-41,-42,-44,]),'DBEXEC':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,30,35,36,46,49,52,53,55,61,63,64,71,72,73,74,76,77,84,86,88,89,90,93,95,96,97,98,100,101,102,103,104,],[40,40,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-21,-22,-23,-24,-26,-34,-35,-25,-33,-36,-37,-45,-27,-31,-29,-50,-54,-53,-52,-30,-32,40,-28,-46,-47,-55,-38,-49,-51,-39,-40,-43,-48,-41,-42,-44,]),'IF':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,30,35,36,46,49,52,53,55,61,63,64,71,72,73,74,76,77,84,86,88,89,90,93,95,96,97,98,100,101,102,103,104,],[41,41,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-21,-22,-23,-24,-26,-34,-35,-25,-33,-36,-37,-45,-27,-31,-29,-50,-54,-53,-52,-30,-32,41,-28,-46,-47,-55,-38,-49,-51,-39,-40,-43,-48,-41,-42,-44,]),'FOREACH':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,30,35,36,46,49,52,53,55,61,63,64,71,72,73,74,76,77,84,86,88,89,90,93,95,96,97,98,100,101,102,103,104,],[42,42,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-21,-22,-23,-24,-26,-34,-35,-25,-33,-36,-37,-45,-27,-31,-29,-50,-54,-53,-52,-30,-32,42,-28,-46,-47,-55,-38,-49,-51,-39,-40,-43,-48,-41,-42,-44,]),'RESERVE':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,30,35,36,46,49,52,53,55,61,63,64,71,72,73,74,76,77,84,86,88,89,90,93,95,96,97,98,100,101,102,103,104,],[43,43,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-21,-22,-23,-24,-26,-34,-35,-25,-33,-36,-37,-45,-27,-31,-29,-50,-54,-53,-52,-30,-32,43,-28,-46,-47,-55,-38,-49,-51,-39,-40,-43,-48,-41,-42,-44,]),'RELEASE':([9,11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,30,35,36,46,49,52,53,55,61,63,64,71,72,73,74,76,77,84,86,88,89,90,93,95,96,97,98,100,101,102,103,104,],[44,44,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-21,-22,-23,-24,-26,-34,-35,-25,-33,-36,-37,-45,-27,-31,-29,-50,-54,-53,-52,-30,-32,44,-28,-46,-47,-55,-38,-49,-51,-39,-40,-43,-48,-41,-42,-44,]),'ENDFOREACH':([11,12,13,14,15,16,17,18,19,20,21,22,23,24,25,26,27,28,30,35,36,45,46,49,52,53,55,61,63,64,71,72,73,74,76,77,86,88,89,90,91,93,95,96,97,98,100,101,102,103,104,],[-7,-8,-9,-10,-11,-12,-13,-14,-15,-16,-17,-18,-19,-20,-21,-22,-23,-24,-26,-34,-35,-6,-25,-33,-36,-37,-45,-27,-31,-29,-50,-54,-53,-52,-30,-32,-28,-46,-47,-55,95,-38,-49,-51,-39,-40,-43,-48,-41,-42,-44,]),'ASSIGN':([30,67,85,],[47,79,92,]),'ARROW':([34,48,54,55,56,71,72,73,81,82,83,],[51,62,66,67,68,85,-54,-53,-57,-56,-58,]),'COMPARE':([57,],[69,]),'IN':([58,],[70,]),'NUMBER':([59,60,69,99,100,],[73,73,82,103,104,]),'CACHE':([89,93,98,100,101,103,104,],[-47,99,99,-43,-48,-42,-44,]),'ROWS':([89,93,98,100,101,103,104,],[-47,100,100,-43,-48,-42,-44,]),'COMMA':([89,],[94,]),}
 
 _lr_action = {}
 for _k, _v in _lr_action_items.items():
@@ -17,7 +17,7 @@ for _k, _v in _lr_action_items.items():
       _lr_action[_x][_k] = _y
 del _lr_action_items
 
-_lr_goto_items = {'script':([0,],[1,]),'module_def':([0,],[2,]),'steps':([2,5,],[4,8,]),'step':([2,5,],[5,5,]),'actions':([9,11,],[10,37,]),'action':([9,11,],[11,11,]),'speak_action':([9,11,],[12,12,]),'listen_action':([9,11,],[13,13,]),'case_action':([9,11,],[14,14,]),'default_action':([9,11,],[15,15,]),'goto_action':([9,11,],[16,16,]),'aireply_action':([9,11,],[17,17,]),'exit_action':([9,11,],[18,18,]),'lock_action':([9,11,],[19,19,]),'unlock_action':([9,11,],[20,20,]),'dbquery_action':([9,11,],[21,21,]),'dbexec_action':([9,11,],[22,22,]),'if_action':([9,11,],[23,23,]),'listen_assign_action':([9,11,],[24,24,]),'condition':([36,],[47,]),}
+_lr_goto_items = {'script':([0,],[1,]),'module_def':([0,],[2,]),'steps':([2,5,],[4,8,]),'step':([2,5,],[5,5,]),'actions':([9,11,84,],[10,45,91,]),'action':([9,11,84,],[11,11,11,]),'speak_action':([9,11,84,],[12,12,12,]),'listen_action':([9,11,84,],[13,13,13,]),'case_action':([9,11,84,],[14,14,14,]),'synonym_action':([9,11,84,],[15,15,15,]),'default_action':([9,11,84,],[16,16,16,]),'goto_action':([9,11,84,],[17,17,17,]),'aireply_action':([9,11,84,],[18,18,18,]),'exit_action':([9,11,84,],[19,19,19,]),'lock_action':([9,11,84,],[20,20,20,]),'unlock_action':([9,11,84,],[21,21,21,]),'dbquery_action':([9,11,84,],[22,22,22,]),'dbexec_action':([9,11,84,],[23,23,23,]),'if_action':([9,11,84,],[24,24,24,]),'foreach_action':([9,11,84,],[25,25,25,]),'reserve_action':([9,11,84,],[26,26,26,]),'release_action':([9,11,84,],[27,27,27,]),'listen_assign_action':([9,11,84,],[28,28,28,]),'condition':([41,],[56,]),'string_list':([50,63,],[64,76,]),'quantity':([59,60,],[71,74,]),'id_list':([79,87,94,],[88,93,101,]),'query_options':([93,98,],[97,102,]),'query_option':([93,98,],[98,98,]),}
 
 _lr_goto = {}
 for _k, _v in _lr_goto_items.items():
@@ -27,40 +27,62 @@ for _k, _v in _lr_goto_items.items():
 del _lr_goto_items
 _lr_productions = [
   ("S' -> script","S'",1,None,None,None),
-  ('script -> module_def steps','script',2,'p_script','dsl_parser.py',67),
-  ('module_def -> MODULE STRING','module_def',2,'p_module_def','dsl_parser.py',74),
-  ('steps -> step steps','steps',2,'p_steps','dsl_parser.py',78),
-  ('steps -> step','steps',1,'p_steps','dsl_parser.py',79),
-  ('step -> STEP ID actions','step',3,'p_step','dsl_parser.py',87),
-  ('actions -> action actions','actions',2,'p_actions','dsl_parser.py',94),
-  ('actions -> action','actions',1,'p_actions','dsl_parser.py',95),
-  ('action -> speak_action','action',1,'p_action','dsl_parser.py',102),
-  ('action -> listen_action','action',1,'p_action','dsl_parser.py',103),
-  ('action -> case_action','action',1,'p_action','dsl_parser.py',104),
-  ('action -> default_action','action',1,'p_action','dsl_parser.py',105),
-  ('action -> goto_action','action',1,'p_action','dsl_parser.py',106),
-  ('action -> aireply_action','action',1,'p_action','dsl_parser.py',107),
-  ('action -> exit_action','action',1,'p_action','dsl_parser.py',108),
-  ('action -> lock_action','action',1,'p_action','dsl_parser.py',109),
-  ('action -> unlock_action','action',1,'p_action','dsl_parser.py',110),
-  ('action -> dbquery_action','action',1,'p_action','dsl_parser.py',111),
-  ('action -> dbexec_action','action',1,'p_action','dsl_parser.py',112),
-  ('action -> if_action','action',1,'p_action','dsl_parser.py',113),
-  ('action -> listen_assign_action','action',1,'p_action','dsl_parser.py',114),
-  ('speak_action -> SPEAK STRING','speak_action',2,'p_speak_action','dsl_parser.py',118),
-  ('listen_action -> LISTEN','listen_action',1,'p_listen_action','dsl_parser.py',122),
-  ('listen_assign_action -> LISTEN ASSIGN ID','listen_assign_action',3,'p_listen_assign_action','dsl_parser.py',126),
-  ('case_action -> CASE STRING ARROW GOTO ID','case_action',5,'p_case_action','dsl_parser.py',130),
-  ('default_action -> DEFAULT ARROW GOTO ID','default_action',4,'p_default_action','dsl_parser.py',134),
-  ('goto_action -> GOTO ID','goto_action',2,'p_goto_action','dsl_parser.py',138),
-  ('aireply_action -> AIREPLY','aireply_action',1,'p_aireply_action','dsl_parser.py',142),
-  ('exit_action -> EXIT','exit_action',1,'p_exit_action','dsl_parser.py',146),
-  ('lock_action -> LOCK STRING','lock_action',2,'p_lock_action','dsl_parser.py',150),
-  ('unlock_action -> UNLOCK STRING','unlock_action',2,'p_unlock_action','dsl_parser.py',154),
-  ('dbquery_action -> DBQUERY STRING ARROW GOTO ID ID','dbquery_action',6,'p_dbquery_action','dsl_parser.py',158),
-  ('dbexec_action -> DBEXEC STRING','dbexec_action',2,'p_dbexec_action','dsl_parser.py',162),
-  ('if_action -> IF condition ARROW GOTO ID','if_action',5,'p_if_action','dsl_parser.py',166),
-  ('condition -> ID COMPARE NUMBER','condition',3,'p_condition','dsl_parser.py',170),
-  ('condition -> ID COMPARE ID','condition',3,'p_condition','dsl_parser.py',171),
-  ('condition -> ID COMPARE STRING','condition',3,'p_condition','dsl_parser.py',172),
+  ('script -> module_def steps','script',2,'p_script','dsl_parser.py',77),
+  ('module_def -> MODULE STRING','module_def',2,'p_module_def','dsl_parser.py',84),
+  ('steps -> step steps','steps',2,'p_steps','dsl_parser.py',88),
+  ('steps -> step','steps',1,'p_steps','dsl_parser.py',89),
+  ('step -> STEP ID actions','step',3,'p_step','dsl_parser.py',97),
+  ('actions -> action actions','actions',2,'p_actions','dsl_parser.py',104),
+  ('actions -> action','actions',1,'p_actions','dsl_parser.py',105),
+  ('action -> speak_action','action',1,'p_action','dsl_parser.py',112),
+  ('action -> listen_action','action',1,'p_action','dsl_parser.py',113),
+  ('action -> case_action','action',1,'p_action','dsl_parser.py',114),
+  ('action -> synonym_action','action',1,'p_action','dsl_parser.py',115),
+  ('action -> default_action','action',1,'p_action','dsl_parser.py',116),
+  ('action -> goto_action','action',1,'p_action','dsl_parser.py',117),
+  ('action -> aireply_action','action',1,'p_action','dsl_parser.py',118),
+  ('action -> exit_action','action',1,'p_action','dsl_parser.py',119),
+  ('action -> lock_action','action',1,'p_action','dsl_parser.py',120),
+  ('action -> unlock_action','action',1,'p_action','dsl_parser.py',121),
+  ('action -> dbquery_action','action',1,'p_action','dsl_parser.py',122),
+  ('action -> dbexec_action','action',1,'p_action','dsl_parser.py',123),
+  ('action -> if_action','action',1,'p_action','dsl_parser.py',124),
+  ('action -> foreach_action','action',1,'p_action','dsl_parser.py',125),
+  ('action -> reserve_action','action',1,'p_action','dsl_parser.py',126),
+  ('action -> release_action','action',1,'p_action','dsl_parser.py',127),
+  ('action -> listen_assign_action','action',1,'p_action','dsl_parser.py',128),
+  ('speak_action -> SPEAK STRING','speak_action',2,'p_speak_action','dsl_parser.py',132),
+  ('listen_action -> LISTEN','listen_action',1,'p_listen_action','dsl_parser.py',136),
+  ('listen_assign_action -> LISTEN ASSIGN ID','listen_assign_action',3,'p_listen_assign_action','dsl_parser.py',140),
+  ('case_action -> CASE STRING ARROW GOTO ID','case_action',5,'p_case_action','dsl_parser.py',144),
+  ('synonym_action -> SYNONYM STRING string_list','synonym_action',3,'p_synonym_action','dsl_parser.py',148),
+  ('string_list -> STRING string_list','string_list',2,'p_string_list','dsl_parser.py',153),
+  ('string_list -> STRING','string_list',1,'p_string_list','dsl_parser.py',154),
+  ('default_action -> DEFAULT ARROW GOTO ID','default_action',4,'p_default_action','dsl_parser.py',161),
+  ('goto_action -> GOTO ID','goto_action',2,'p_goto_action','dsl_parser.py',165),
+  ('aireply_action -> AIREPLY','aireply_action',1,'p_aireply_action','dsl_parser.py',169),
+  ('exit_action -> EXIT','exit_action',1,'p_exit_action','dsl_parser.py',173),
+  ('lock_action -> LOCK STRING','lock_action',2,'p_lock_action','dsl_parser.py',177),
+  ('unlock_action -> UNLOCK STRING','unlock_action',2,'p_unlock_action','dsl_parser.py',181),
+  ('dbquery_action -> DBQUERY STRING ARROW GOTO ID id_list','dbquery_action',6,'p_dbquery_action','dsl_parser.py',185),
+  ('dbquery_action -> DBQUERY STRING ARROW GOTO ID id_list query_options','dbquery_action',7,'p_dbquery_action','dsl_parser.py',186),
+  ('query_options -> query_option','query_options',1,'p_query_options','dsl_parser.py',192),
+  ('query_options -> query_option query_options','query_options',2,'p_query_options','dsl_parser.py',193),
+  ('query_option -> CACHE NUMBER','query_option',2,'p_query_option','dsl_parser.py',199),
+  ('query_option -> ROWS','query_option',1,'p_query_option','dsl_parser.py',200),
+  ('query_option -> ROWS NUMBER','query_option',2,'p_query_option','dsl_parser.py',201),
+  ('dbexec_action -> DBEXEC STRING','dbexec_action',2,'p_dbexec_action','dsl_parser.py',212),
+  ('dbexec_action -> DBEXEC STRING ARROW ASSIGN id_list','dbexec_action',5,'p_dbexec_action','dsl_parser.py',213),
+  ('id_list -> ID','id_list',1,'p_id_list','dsl_parser.py',220),
+  ('id_list -> ID COMMA id_list','id_list',3,'p_id_list','dsl_parser.py',221),
+  ('foreach_action -> FOREACH ID IN ID actions ENDFOREACH','foreach_action',6,'p_foreach_action','dsl_parser.py',230),
+  ('reserve_action -> RESERVE STRING quantity','reserve_action',3,'p_reserve_action','dsl_parser.py',234),
+  ('reserve_action -> RESERVE STRING quantity ARROW ASSIGN ID','reserve_action',6,'p_reserve_action','dsl_parser.py',235),
+  ('release_action -> RELEASE STRING quantity','release_action',3,'p_release_action','dsl_parser.py',242),
+  ('quantity -> NUMBER','quantity',1,'p_quantity','dsl_parser.py',246),
+  ('quantity -> ID','quantity',1,'p_quantity','dsl_parser.py',247),
+  ('if_action -> IF condition ARROW GOTO ID','if_action',5,'p_if_action','dsl_parser.py',252),
+  ('condition -> ID COMPARE NUMBER','condition',3,'p_condition','dsl_parser.py',256),
+  ('condition -> ID COMPARE ID','condition',3,'p_condition','dsl_parser.py',257),
+  ('condition -> ID COMPARE STRING','condition',3,'p_condition','dsl_parser.py',258),
 ]
@@ -0,0 +1,141 @@
+import re
+import sqlite3
+from typing import Dict, Any, List, Iterator, Tuple
+
+from db_pool import is_uri
+
+# 脚本中的变量占位符，带引号的写法整体替换为一个参数
+_PLACEHOLDER = re.compile(r"""'\{\w+(?:\.\w+)?\}'|"\{\w+(?:\.\w+)?\}"|\{\w+(?:\.\w+)?\}""")
+# 在 SQL 中写上这个注释表示全表扫描是有意为之（如小表的完整列表）
+ALLOW_SCAN_MARKER = "audit:allow-scan"
+
+_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(.*)$")
+_TEMP_BTREE = re.compile(r"^USE TEMP B-TREE FOR (.+)$")
+_WHERE = re.compile(r"\bWHERE\b(.*?)(?:\bGROUP\s+BY\b|\bORDER\s+BY\b|\bLIMIT\b|\bRETURNING\b|$)",
+                    re.IGNORECASE | re.DOTALL)
+_ORDER_BY = re.compile(r"\bORDER\s+BY\b(.*?)(?:\bLIMIT\b|$)", re.IGNORECASE | re.DOTALL)
+_COMPARED_COLUMN = re.compile(r"(\w+)\s*(?:=|==|<=|>=|<|>|\bIN\b|\bLIKE\b|\bBETWEEN\b)", re.IGNORECASE)
+
+DB_ACTION_TYPES = ("DBQuery", "DBExec")
+
+
+def iter_db_actions(script_ast: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """遍历脚本中的全部数据库动作（包括 ForEach 循环体内的），产出 (步骤名, 动作)"""
+    def walk(step_name, actions):
+        for action in actions:
+            if action.get('type') in DB_ACTION_TYPES:
+                yield step_name, action
+            elif action.get('type') == 'ForEach':
+                yield from walk(step_name, action.get('actions', []))
+
+    for step_name, step in script_ast.get('steps', {}).items():
+        yield from walk(step_name, step.get('actions', []))
+
+
+def prepare_sql(sql: str) -> Tuple[str, int]:
+    """把变量占位符替换为 ? 参数，返回 (SQL, 参数个数)"""
+    prepared, count = _PLACEHOLDER.subn("?", sql)
+    return prepared, count
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _columns_in(clause_pattern: re.Pattern, sql: str, known: List[str]) -> List[str]:
+    """从 WHERE / ORDER BY 子句中找出属于该表的列，保持出现顺序"""
+    match = clause_pattern.search(sql)
+    if not match:
+        return []
+    clause = match.group(1)
+    if clause_pattern is _ORDER_BY:
+        candidates = re.findall(r"(\w+)(?:\s+(?:ASC|DESC))?\s*(?:,|$)", clause.strip(), re.IGNORECASE)
+    else:
+        candidates = _COMPARED_COLUMN.findall(clause)
+    lowered = {column.lower(): column for column in known}
+    columns = []
+    for candidate in candidates:
+        column = lowered.get(candidate.lower())
+        if column and column not in columns:
+            columns.append(column)
+    return columns
+
+
+def _suggest_index(table: str, columns: List[str]) -> str:
+    return f"CREATE INDEX IF NOT EXISTS idx_{table}_{'_'.join(columns)} ON {table} ({', '.join(columns)})"
+
+
+def audit_sql(conn: sqlite3.Connection, sql: str) -> Dict[str, Any]:
+    """对一条 SQL 运行 EXPLAIN QUERY PLAN，返回执行计划、问题和索引建议"""
+    prepared, param_count = prepare_sql(sql)
+    result: Dict[str, Any] = {"sql": sql, "plan": [], "issues": [], "suggestions": [], "error": None}
+    try:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {prepared}", [None] * param_count).fetchall()
+    except sqlite3.Error as e:
+        result["error"] = str(e)
+        return result
+
+    allow_scan = ALLOW_SCAN_MARKER in sql
+    for row in rows:
+        detail = row[-1]
+        result["plan"].append(detail)
+
+        scan = _SCAN.match(detail)
+        if scan and not allow_scan:
+            table = scan.group(1)
+            result["issues"].append(f"全表扫描: {detail}")
+            columns = _columns_in(_WHERE, prepared, _table_columns(conn, table))
+            if columns:
+                result["suggestions"].append(_suggest_index(table, columns))
+
+        temp_btree = _TEMP_BTREE.match(detail)
+        if temp_btree:
+            result["issues"].append(f"临时B树排序: {detail}")
+            if temp_btree.group(1).startswith("ORDER BY"):
+                for table in re.findall(r"\bFROM\s+(\w+)", prepared, re.IGNORECASE)[:1]:
+                    columns = _columns_in(_ORDER_BY, prepared, _table_columns(conn, table))
+                    if columns:
+                        result["suggestions"].append(_suggest_index(table, columns))
+    return result
+
+
+def audit_script(script_ast: Dict[str, Any], db_path: str) -> List[Dict[str, Any]]:
+    """审查脚本中每条 DBQuery/DBExec 的执行计划"""
+    conn = sqlite3.connect(db_path, uri=is_uri(db_path))
+    try:
+        findings = []
+        for step_name, action in iter_db_actions(script_ast):
+            finding = audit_sql(conn, action['query'])
+            finding["step"] = step_name
+            finding["type"] = action['type']
+            findings.append(finding)
+        return findings
+    finally:
+        conn.close()
+
+
+def has_problems(findings: List[Dict[str, Any]]) -> bool:
+    """是否存在全表扫描、临时B树或无法解析的语句"""
+    return any(finding["issues"] or finding["error"] for finding in findings)
+
+
+def format_report(findings: List[Dict[str, Any]]) -> str:
+    """生成文本报告"""
+    lines = [f"SQL执行计划审查: {len(findings)} 条数据库动作"]
+    for finding in findings:
+        if finding["error"]:
+            status = "错误"
+        elif finding["issues"]:
+            status = "警告"
+        else:
+            status = "正常"
+        lines.append(f"[{status}] 步骤 {finding['step']} {finding['type']}: {finding['sql']}")
+        if finding["error"]:
+            lines.append(f"    无法分析: {finding['error']}")
+        for issue in finding["issues"]:
+            lines.append(f"    {issue}")
+        for suggestion in finding["suggestions"]:
+            lines.append(f"    建议: {suggestion}")
+    problems = sum(1 for finding in findings if finding["issues"] or finding["error"])
+    lines.append(f"共 {problems} 条需要关注")
+    return "\n".join(lines)
@@ -0,0 +1,140 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Set
+
+# 结果依赖连接状态或当前时间的查询不能缓存
+_NON_DETERMINISTIC = re.compile(
+    r"\b(changes|total_changes|last_insert_rowid|random|randomblob)\s*\(|'now'|\bcurrent_(date|time|timestamp)\b",
+    re.IGNORECASE
+)
+_READ_TABLES = re.compile(r'\b(?:FROM|JOIN)\s+["`\[]?(\w+)', re.IGNORECASE)
+_WRITE_TABLES = re.compile(
+    r'^\s*(?:(?:INSERT|REPLACE)(?:\s+OR\s+\w+)?\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+["`\[]?(\w+)',
+    re.IGNORECASE
+)
+_PLACEHOLDER = re.compile(r'\{(\w+)(?:\.\w+)?\}')
+
+
+def normalize_sql(sql: str) -> str:
+    """规范化SQL：合并空白、去掉结尾分号"""
+    return " ".join(sql.split()).rstrip(";").strip()
+
+
+def read_tables(sql: str) -> Set[str]:
+    """提取查询读取的表名"""
+    return {name.lower() for name in _READ_TABLES.findall(sql)}
+
+
+def write_tables(sql: str) -> Optional[Set[str]]:
+    """提取写语句修改的表名；无法识别（如DDL）时返回None表示影响全部表"""
+    match = _WRITE_TABLES.match(sql)
+    if not match:
+        return None
+    return {match.group(1).lower()}
+
+
+def is_cacheable(sql: str) -> bool:
+    """只缓存读取了具体表、且结果确定的 SELECT 查询"""
+    head = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+    if head not in ("SELECT", "WITH"):
+        return False
+    if _NON_DETERMINISTIC.search(sql):
+        return False
+    return bool(read_tables(sql))
+
+
+class QueryCache:
+    """DBQuery 结果缓存
+
+    键为规范化后的SQL模板加变量参数。每张表维护一个写入代数，DBExec 写表时
+    代数加一并删除读取该表的缓存项；查询开始前记下代数，写回时代数已变化则放弃写回，
+    避免并发写入后把旧结果放进缓存。
+    """
+
+    def __init__(self, default_ttl: Optional[float] = None, max_entries: int = 1024):
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._global_generation = 0
+        self._lock = threading.Lock()
+
+        # 命中率统计
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(query: str, variables: Dict[str, Any], mode: Any = None) -> tuple:
+        """由SQL模板和其中引用的变量值构造缓存键；mode 区分单行/多行等取数方式"""
+        names = sorted(set(_PLACEHOLDER.findall(query)))
+        params = tuple((name, str(variables.get(name))) for name in names)
+        return (normalize_sql(query), params, mode)
+
+    def generation(self, tables: Set[str]) -> tuple:
+        """查询开始前记录相关表的写入代数"""
+        with self._lock:
+            return (self._global_generation,) + tuple(
+                self._generations.get(table, 0) for table in sorted(tables)
+            )
+
+    def get(self, key: tuple) -> Tuple[bool, Any]:
+        """查找缓存，返回 (是否命中, 值)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, _, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key: tuple, value: Any, tables: Set[str], generation: tuple, ttl: Optional[float] = None):
+        """写入缓存；相关表在查询期间被修改过则丢弃"""
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            current = (self._global_generation,) + tuple(
+                self._generations.get(table, 0) for table in sorted(tables)
+            )
+            if current != generation:
+                return
+            self._entries[key] = (value, frozenset(tables), expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate_tables(self, tables: Optional[Set[str]]):
+        """写表后删除所有读取这些表的缓存项；tables 为 None 时清空全部"""
+        with self._lock:
+            if tables is None:
+                self._global_generation += 1
+                self.invalidations += len(self._entries)
+                self._entries.clear()
+                return
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            stale = [key for key, (_, entry_tables, _) in self._entries.items() if entry_tables & tables]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+            }
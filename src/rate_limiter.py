@@ -0,0 +1,162 @@
+import re
+import time
+import heapq
+import itertools
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+# 请求优先级，数值小的先放行：意图识别决定对话往哪走，用户在等；回复生成可以稍后
+PRIORITY_INTENT = 0
+PRIORITY_REPLY = 1
+_PRIORITY_NAMES = {PRIORITY_INTENT: "intent", PRIORITY_REPLY: "reply"}
+
+# 每类请求预计的输出token数，计入每分钟token用量
+COMPLETION_ESTIMATES = {PRIORITY_INTENT: 16, PRIORITY_REPLY: 400}
+
+# 每条消息的格式开销（角色标记等）
+_MESSAGE_OVERHEAD = 4
+_CJK = re.compile(r"[　-〿㐀-䶿一-鿿＀-￯]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计文本的token数：中文字符按一字一个，其余字符按四个一个"""
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int, marker: str = "……（内容过长，已截断）") -> str:
+    """按同样的估计把文本截到 max_tokens 以内（保留开头），超出时在末尾加上 marker"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    # 以四分之一token为单位计数，留一个token给非中文字符的向上取整
+    budget = max(max_tokens - estimate_tokens(marker) - 1, 0) * 4
+    used = 0
+    for i, char in enumerate(text):
+        used += 4 if _CJK.match(char) else 1
+        if used > budget:
+            return text[:i] + marker
+    return text
+
+
+def estimate_messages_tokens(messages: Iterable[Dict[str, str]]) -> int:
+    """估计消息列表的token数，含每条消息的格式开销"""
+    return sum(estimate_tokens(msg.get("content", "")) + _MESSAGE_OVERHEAD for msg in messages)
+
+
+class TokenBucket:
+    """令牌桶：按每分钟 rate_per_minute 的速度补充，最多攒 capacity 个"""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        if rate_per_minute <= 0:
+            raise ValueError("速率必须大于0")
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """还要等多久才够 amount 个令牌（调用前先 refill）"""
+        # 超过桶容量的请求等到桶满即放行，否则永远不会放行
+        deficit = min(amount, self.capacity) - self.tokens
+        return max(0.0, deficit / self.rate)
+
+    def take(self, amount: float):
+        self.tokens -= min(amount, self.capacity)
+
+
+class LLMRateLimiter:
+    """发往LLM的请求的客户端限流
+
+    按每分钟请求数和估计的每分钟token数两个令牌桶放行；等待的请求按优先级排队，
+    意图识别先于回复生成。预计等待超过该优先级的 max_wait 时立即拒绝（shed），
+    调用方改走规则/Default 路径，而不是让用户干等。服务端返回 429 时调用
+    backoff() 暂停放行。
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 max_wait: Dict[int, float] = None, max_queue: int = 64):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_wait = {PRIORITY_INTENT: 2.0, PRIORITY_REPLY: 5.0, **(max_wait or {})}
+        self.max_queue = max_queue
+        self._paused_until = 0.0
+        self._waiters: List[tuple] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+
+        # 统计
+        self.granted = {priority: 0 for priority in _PRIORITY_NAMES}
+        self.shed = {priority: 0 for priority in _PRIORITY_NAMES}
+        self.total_wait = 0.0
+        self.backoffs = 0
+
+    def _wait_time(self, tokens: float, now: float) -> float:
+        """按当前令牌数，还要等多久才能放行"""
+        wait = max(0.0, self._paused_until - now)
+        if self.request_bucket is not None:
+            self.request_bucket.refill(now)
+            wait = max(wait, self.request_bucket.wait_time(1))
+        if self.token_bucket is not None:
+            self.token_bucket.refill(now)
+            wait = max(wait, self.token_bucket.wait_time(tokens))
+        return wait
+
+    def acquire(self, tokens: float = 0, priority: int = PRIORITY_REPLY) -> bool:
+        """申请发送一个估计 tokens 个token的请求；返回 False 表示被拒绝，不应发送"""
+        max_wait = self.max_wait.get(priority, 0.0)
+        start = time.monotonic()
+        deadline = start + max_wait
+        with self._condition:
+            if len(self._waiters) >= self.max_queue:
+                self.shed[priority] += 1
+                return False
+            entry = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._wait_time(tokens, now)
+                    is_head = self._waiters[0] == entry
+                    if is_head and wait == 0:
+                        break
+                    # 令牌不够或排在更高优先级的请求后面，到期前等不到就放弃
+                    if now + wait > deadline or now >= deadline:
+                        self.shed[priority] += 1
+                        return False
+                    # 队首等令牌补充，其余的等队首放行后被唤醒
+                    self._condition.wait(timeout=max(wait if is_head else deadline - now, 0.005))
+                if self.request_bucket is not None:
+                    self.request_bucket.take(1)
+                if self.token_bucket is not None:
+                    self.token_bucket.take(tokens)
+                self.granted[priority] += 1
+                self.total_wait += time.monotonic() - start
+                return True
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+    def backoff(self, seconds: float):
+        """服务端限流（429）时暂停放行 seconds 秒"""
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self.backoffs += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """放行、拒绝和排队统计"""
+        with self._condition:
+            granted = sum(self.granted.values())
+            return {
+                "granted": {_PRIORITY_NAMES[p]: count for p, count in self.granted.items()},
+                "shed": {_PRIORITY_NAMES[p]: count for p, count in self.shed.items()},
+                "avg_wait_ms": round(self.total_wait / granted * 1000, 1) if granted else 0.0,
+                "queued": len(self._waiters),
+                "backoffs": self.backoffs,
+            }
@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from db_pool import connect
+from intent_cache import normalize_input
+
+# 默认只缓存这些与上下文无关的自由问答步骤
+DEFAULT_REPLY_CACHE_STEPS = {
+    "medical": ("sciAI", "regAI"),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reply_cache (
+    module TEXT NOT NULL,
+    question TEXT NOT NULL,
+    history_hash TEXT NOT NULL,
+    reply TEXT NOT NULL,
+    expires_at REAL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (module, question, history_hash)
+)
+"""
+
+
+class ReplyCache:
+    """generate_reply 结果的持久化缓存（SQLite）
+
+    键为模块、规范化后的问题和问题之前 history_window 条对话历史的哈希。只对
+    allowed_steps 中列出的步骤生效，这些步骤的回复只应取决于问题本身；命中缓存的
+    步骤生成回复时也只带键里的那几条历史，不会把其他用户对话中的个人信息带进缓存。
+    超过 max_entries 时淘汰最久未使用的项。
+    """
+
+    def __init__(self, db_path: str, allowed_steps: Dict[str, Iterable[str]] = None,
+                 ttl: Optional[float] = 7 * 24 * 3600, max_entries: int = 5000, history_window: int = 1):
+        self.db_path = db_path
+        steps = DEFAULT_REPLY_CACHE_STEPS if allowed_steps is None else allowed_steps
+        self.allowed_steps = {module.lower(): set(names) for module, names in steps.items()}
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.history_window = history_window
+        self._lock = threading.Lock()
+
+        # 命中率统计
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        directory = os.path.dirname(db_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._conn = connect(db_path)
+        with self._conn:
+            self._conn.execute(_SCHEMA)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_reply_cache_last_used ON reply_cache(last_used)")
+
+    def applies(self, context: Optional[Dict[str, Any]]) -> bool:
+        """当前步骤是否在允许缓存的列表中"""
+        if not context:
+            return False
+        module = (context.get("script_module") or "").lower()
+        return context.get("current_step") in self.allowed_steps.get(module, ())
+
+    def history(self, context: Dict[str, Any]) -> List[Dict[str, str]]:
+        """问题之前的 history_window 条对话历史"""
+        messages = list(context.get("conversation_history") or [])
+        if messages and messages[-1]["role"] == "user":
+            # 最后一条是问题本身
+            messages = messages[:-1]
+        return messages[-self.history_window:] if self.history_window > 0 else []
+
+    def make_key(self, user_input: str, context: Dict[str, Any]) -> Tuple[str, str, str]:
+        """由模块、规范化问题和历史窗口哈希构造缓存键"""
+        window = [(msg["role"], msg["content"]) for msg in self.history(context)]
+        history_hash = hashlib.sha256(json.dumps(window, ensure_ascii=False).encode("utf-8")).hexdigest()
+        return ((context.get("script_module") or "").lower(), normalize_input(user_input), history_hash)
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[str]:
+        """查找缓存的回复，未命中或已过期返回None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT reply, expires_at FROM reply_cache WHERE module = ? AND question = ? AND history_hash = ?",
+                key
+            ).fetchone()
+            if row is not None and (row[1] is None or row[1] > now):
+                with self._conn:
+                    self._conn.execute(
+                        "UPDATE reply_cache SET last_used = ? WHERE module = ? AND question = ? AND history_hash = ?",
+                        (now, *key)
+                    )
+                self.hits += 1
+                return row[0]
+            if row is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "DELETE FROM reply_cache WHERE module = ? AND question = ? AND history_hash = ?", key
+                    )
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, key: Tuple[str, str, str], reply: str):
+        """写入回复，超过容量时淘汰最久未使用的项"""
+        now = time.time()
+        expires_at = now + self.ttl if self.ttl is not None else None
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO reply_cache (module, question, history_hash, reply, expires_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, reply, expires_at, now)
+            )
+            # 顺带清掉已过期的项
+            expired = self._conn.execute(
+                "DELETE FROM reply_cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+            ).rowcount
+            self.expirations += expired
+            overflow = self._conn.execute("SELECT COUNT(*) FROM reply_cache").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM reply_cache WHERE rowid IN "
+                    "(SELECT rowid FROM reply_cache ORDER BY last_used LIMIT ?)",
+                    (overflow,)
+                )
+                self.evictions += overflow
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM reply_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM reply_cache").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,280 @@
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterator, Optional
+
+import requests
+
+# 熔断器状态
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+_STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开时拒绝调用"""
+
+
+class AttemptRejected(Exception):
+    """尝试在发出请求之前被拒绝（如客户端限流），不重试，也不算作服务失败"""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """网络错误、超时、429 和 5xx 可以重试，其余（如 401、400）重试也不会成功"""
+    if isinstance(exc, requests.exceptions.HTTPError):
+        status = exc.response.status_code if exc.response is not None else None
+        return status is None or status == 429 or status >= 500
+    return isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+class RetryPolicy:
+    """指数退避重试策略：第 n 次重试前等待 base_delay * 2^(n-1)，不超过 max_delay，附加随机抖动"""
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 2.0,
+                 jitter: float = 0.1):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delays(self) -> Iterator[float]:
+        """依次产出每次重试前的等待时间"""
+        for retry in range(self.max_attempts - 1):
+            delay = min(self.max_delay, self.base_delay * (2 ** retry))
+            yield delay + random.uniform(0, self.jitter * delay)
+
+
+class CircuitBreaker:
+    """熔断器
+
+    连续失败 failure_threshold 次后打开，打开期间直接拒绝调用；经过 reset_timeout 秒
+    进入半开状态放行一个试探请求，成功则关闭，失败则重新打开。
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 on_state_change: Callable[[str, str], None] = None):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.on_state_change = on_state_change
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+        self.opened = 0
+        self.rejected = 0
+
+    def _set_state(self, state: str):
+        previous, self._state = self._state, state
+        if previous != state and self.on_state_change:
+            self.on_state_change(previous, state)
+
+    @property
+    def state(self) -> str:
+        """当前状态，打开超过 reset_timeout 后视为半开"""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._set_state(HALF_OPEN)
+            return self._state
+
+    def allow(self) -> bool:
+        """是否放行一次调用；半开状态只放行一个试探请求"""
+        state = self.state
+        with self._lock:
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            self._set_state(CLOSED)
+
+    def release_probe(self):
+        """放行的调用没有真正发出（如被限流拒绝）：归还半开试探名额，不计成功也不计失败"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._probing = False
+                if self._state != OPEN:
+                    self.opened += 1
+                self._opened_at = time.monotonic()
+                self._set_state(OPEN)
+
+    def stats(self) -> Dict[str, Any]:
+        """熔断器指标：state_code 0=关闭 1=半开 2=打开"""
+        state = self.state
+        with self._lock:
+            return {
+                "state": state,
+                "state_code": _STATE_CODES[state],
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+            }
+
+
+class LatencyTracker:
+    """最近若干次成功调用的耗时，用于估计分位数"""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        with self._lock:
+            if not self._samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class ResilientCaller:
+    """LLM调用的容错包装：熔断 -> 重试 -> 对冲
+
+    idempotent 的调用按 retry 策略重试可重试的错误；启用 hedge 时，单次尝试超过
+    近期 p95 耗时仍未返回，就再发一个相同请求，取先成功的结果。熔断器按整次调用
+    （含重试）的成败计数，打开时直接抛出 CircuitOpenError。
+    """
+
+    def __init__(self, retry: RetryPolicy = None, breaker: CircuitBreaker = None, hedge: bool = False,
+                 hedge_quantile: float = 0.95, hedge_min_samples: int = 20,
+                 initial_hedge_delay: float = 2.0, min_hedge_delay: float = 0.05, hedge_workers: int = 8):
+        self.retry = retry or RetryPolicy(max_attempts=1)
+        self.breaker = breaker
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.initial_hedge_delay = initial_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.latencies = LatencyTracker()
+        self._executor = ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix="llm-hedge") if hedge else None
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.failures = 0
+
+    @property
+    def available(self) -> bool:
+        """熔断器未打开（关闭或可以试探）"""
+        return self.breaker is None or self.breaker.state != OPEN
+
+    def hedge_delay(self) -> float:
+        """发出对冲请求前的等待时间：样本足够时取耗时分位数，否则用初始值"""
+        if self.latencies.count() < self.hedge_min_samples:
+            return self.initial_hedge_delay
+        return max(self.min_hedge_delay, self.latencies.percentile(self.hedge_quantile))
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _timed(self, func: Callable[[], Any]) -> Any:
+        start = time.monotonic()
+        result = func()
+        self.latencies.record(time.monotonic() - start)
+        return result
+
+    def _attempt(self, func: Callable[[], Any], idempotent: bool) -> Any:
+        if not (self.hedge and idempotent):
+            return self._timed(func)
+
+        first = self._executor.submit(self._timed, func)
+        try:
+            return first.result(timeout=self.hedge_delay())
+        except FutureTimeout:
+            pass
+        self._count("hedged")
+        second = self._executor.submit(self._timed, func)
+        done, pending = wait([first, second], return_when=FIRST_COMPLETED)
+        for future in (first, second):
+            if future in done and future.exception() is None:
+                if future is second:
+                    self._count("hedge_wins")
+                return future.result()
+        # 先完成的失败了，等另一个
+        for future in pending:
+            result = future.result()
+            if future is second:
+                self._count("hedge_wins")
+            return result
+        return first.result()
+
+    def call(self, func: Callable[[], Any], idempotent: bool = True) -> Any:
+        """执行一次调用，失败时抛出最后一次尝试的异常"""
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpenError("LLM服务熔断中")
+        self._count("calls")
+
+        delays = self.retry.delays() if idempotent else iter(())
+        retrying = False
+        while True:
+            try:
+                result = self._attempt(func, idempotent)
+            except AttemptRejected:
+                # 本次没有发出请求；重试被拒绝时，整次调用按上一次尝试的失败计
+                if retrying:
+                    self._count("failures")
+                    if self.breaker is not None:
+                        self.breaker.record_failure()
+                elif self.breaker is not None:
+                    # 首次尝试就被拒绝：半开时 allow 占用的试探名额必须归还，否则熔断器一直半开
+                    self.breaker.release_probe()
+                raise
+            except Exception as e:
+                delay = next(delays, None) if is_retryable(e) else None
+                if delay is None:
+                    self._count("failures")
+                    if self.breaker is not None:
+                        self.breaker.record_failure()
+                    raise
+                self._count("retries")
+                retrying = True
+                time.sleep(delay)
+                continue
+            if self.breaker is not None:
+                self.breaker.record_success()
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        """调用、重试、对冲和熔断器指标"""
+        p95 = self.latencies.percentile(0.95)
+        stats = {
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+        if self.breaker is not None:
+            stats["breaker"] = self.breaker.stats()
+        return stats
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,98 @@
+import re
+import math
+from typing import Dict, Iterable, List, Tuple
+
+from intent_cache import normalize_input
+
+# NumPy 可选：安装时用矩阵乘法一次算出全部相似度，否则逐行计算稀疏点积
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_NGRAM_RANGE = (1, 2)
+_SEGMENTS = re.compile(r"[0-9a-z]+|[^0-9a-z]+")
+# 低于该相似度时不在本地做决定，交给LLM（由 tests/eval_intent_similarity.py 评估选定）
+DEFAULT_SIMILARITY_THRESHOLD = 0.55
+
+
+def char_ngrams(text: str, ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE) -> Dict[str, int]:
+    """规范化文本后统计字符 n-gram 出现次数；字母数字串整体作为一项，"email" 不会与 "ai" 相似"""
+    counts: Dict[str, int] = {}
+    low, high = ngram_range
+    for segment in _SEGMENTS.findall(normalize_input(text)):
+        if segment.isascii():
+            counts[segment] = counts.get(segment, 0) + 1
+            continue
+        for n in range(low, high + 1):
+            for i in range(len(segment) - n + 1):
+                gram = segment[i:i + n]
+                counts[gram] = counts.get(gram, 0) + 1
+    return counts
+
+
+class SimilarityIndex:
+    """Case 模式的字符 n-gram TF-IDF 索引
+
+    构建时把每个模式及其示例说法（同义词）各作为一篇文档，得到 L2 归一化的
+    TF-IDF 矩阵；查询时把输入转换为同一空间的向量，一次算出与全部文档的余弦
+    相似度，按模式取最大值。输入中索引没有的 n-gram 按最低权重计入向量长度，
+    无关的长句得分较低，而 "挂个号" 这类插入了个别字的说法仍能命中。
+    """
+
+    def __init__(self, documents: Iterable[Tuple[str, str]],
+                 ngram_range: Tuple[int, int] = DEFAULT_NGRAM_RANGE, use_numpy: bool = True):
+        self.ngram_range = ngram_range
+        self.use_numpy = use_numpy and np is not None
+
+        self.labels: List[str] = []
+        doc_counts: List[Dict[str, int]] = []
+        for label, text in documents:
+            counts = char_ngrams(text, ngram_range)
+            if counts:
+                self.labels.append(label)
+                doc_counts.append(counts)
+
+        document_frequency: Dict[str, int] = {}
+        for counts in doc_counts:
+            for gram in counts:
+                document_frequency[gram] = document_frequency.get(gram, 0) + 1
+        total = len(doc_counts)
+        self.vocabulary = {gram: i for i, gram in enumerate(sorted(document_frequency))}
+        self.idf = {gram: math.log((1 + total) / (1 + df)) + 1 for gram, df in document_frequency.items()}
+        # 索引外的 n-gram 取最低权重（相当于出现在全部文档中）
+        self.unseen_idf = 1.0
+
+        self._rows = [self._weigh(counts) for counts in doc_counts]
+        if self.use_numpy:
+            self._matrix = np.zeros((len(self._rows), len(self.vocabulary)), dtype=np.float32)
+            for i, row in enumerate(self._rows):
+                for gram, weight in row.items():
+                    self._matrix[i, self.vocabulary[gram]] = weight
+
+    def _weigh(self, counts: Dict[str, int]) -> Dict[str, float]:
+        """TF-IDF 加权并做 L2 归一化"""
+        weights = {gram: count * self.idf.get(gram, self.unseen_idf) for gram, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        return {gram: weight / norm for gram, weight in weights.items()} if norm else {}
+
+    def _document_scores(self, text: str) -> List[float]:
+        query = self._weigh(char_ngrams(text, self.ngram_range))
+        if not query or not self._rows:
+            return [0.0] * len(self._rows)
+        if self.use_numpy:
+            vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+            for gram, weight in query.items():
+                index = self.vocabulary.get(gram)
+                if index is not None:
+                    vector[index] = weight
+            return (self._matrix @ vector).tolist()
+        return [sum(weight * row.get(gram, 0.0) for gram, weight in query.items()) for row in self._rows]
+
+    def scores(self, text: str) -> List[Tuple[str, float]]:
+        """输入与每个模式的相似度（取该模式各文档的最大值），从高到低排列"""
+        best: Dict[str, float] = {}
+        for label, score in zip(self.labels, self._document_scores(text)):
+            if score > best.get(label, -1.0):
+                best[label] = score
+        return sorted(best.items(), key=lambda item: -item[1])
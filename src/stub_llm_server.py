@@ -0,0 +1,302 @@
+"""本地替身LLM服务
+
+实现与智谱AI chat/completions 相同的请求和响应格式（含 stream=true 的 SSE），
+用于离线压测 ZhipuAIClient：可配置延迟分布、错误率、限流和流式输出速度。
+意图识别提示按候选意图是否出现在用户输入中作答，批量提示返回 JSON 数组，
+其余请求返回固定的回复文本。GET /stats 返回请求统计。
+
+用法: python src/stub_llm_server.py [--port 8900] [--latency lognormal:0.8,0.5]
+      [--error-rate 0.05] [--rate-limit 20] [--token-delay 0.03]
+然后: python src/main.py medical --llm-base-url http://127.0.0.1:8900/api/paas/v4/chat/completions
+（服务只检查有没有 Bearer 鉴权头，ZHIPU_API_KEY 设为任意值即可）
+或作为 OpenAI 兼容的本地服务: python src/main.py medical --llm-intent-backend openai
+      --openai-base-url http://127.0.0.1:8900/v1
+"""
+import re
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Any, Dict, List, Optional
+
+CHAT_COMPLETIONS_PATH = "/api/paas/v4/chat/completions"
+# 同一服务也按 OpenAI 兼容的路径应答，用于测试 OpenAICompatibleClient
+OPENAI_CHAT_COMPLETIONS_PATH = "/v1/chat/completions"
+DEFAULT_REPLY = "您好，根据您的描述，建议注意休息、清淡饮食，如症状持续请及时到医院就诊。"
+
+_INTENT_CANDIDATES = re.compile(r"候选意图列表：(.*)")
+_INTENT_INPUT = re.compile(r'用户输入："(.*)"\s*\n')
+_BATCH_REQUESTS = re.compile(r"请求列表（JSON）：\s*(\[.*?\])\s*\n\s*分析要求", re.DOTALL)
+
+
+class LatencyModel:
+    """响应延迟分布
+
+    规格字符串：fixed:秒、uniform:最小,最大、lognormal:中位数,sigma（长尾），
+    例如 "lognormal:0.8,0.5" 表示中位数 0.8 秒、有明显长尾的延迟。
+    """
+
+    def __init__(self, spec: str = "fixed:0"):
+        kind, _, params = spec.partition(":")
+        try:
+            values = [float(value) for value in params.split(",") if value.strip()]
+        except ValueError:
+            raise ValueError(f"无效的延迟参数: {spec}")
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2}
+        if kind not in expected or len(values) != expected[kind]:
+            raise ValueError(f"无效的延迟分布: {spec}（可用 fixed:秒、uniform:最小,最大、lognormal:中位数,sigma）")
+        self.spec = spec
+        self.kind = kind
+        self.values = values
+
+    def sample(self) -> float:
+        """取一个延迟（秒）"""
+        if self.kind == "fixed":
+            return self.values[0]
+        if self.kind == "uniform":
+            return random.uniform(*self.values)
+        median, sigma = self.values
+        return random.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+
+class RateLimiter:
+    """每秒请求数的令牌桶，超出时返回 429"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+def answer_prompt(prompt: str) -> str:
+    """按提示类型生成回答：意图识别、批量意图识别或普通回复"""
+    batch = _BATCH_REQUESTS.search(prompt)
+    if batch:
+        try:
+            items = json.loads(batch.group(1))
+            return json.dumps([_pick_intent(item["input"], item["candidates"]) for item in items], ensure_ascii=False)
+        except (ValueError, KeyError, TypeError):
+            return "[]"
+    candidates = _INTENT_CANDIDATES.search(prompt)
+    user_input = _INTENT_INPUT.search(prompt)
+    if candidates and user_input:
+        return _pick_intent(user_input.group(1), [c.strip() for c in candidates.group(1).split(",")])
+    return DEFAULT_REPLY
+
+
+def _pick_intent(user_input: str, candidates: List[str]) -> str:
+    """取输入中出现的最长候选意图"""
+    hits = [candidate for candidate in candidates if candidate and candidate.lower() in user_input.lower()]
+    return max(hits, key=len) if hits else "unknown"
+
+
+class StubLLMHandler(BaseHTTPRequestHandler):
+    """chat/completions 请求处理"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        # 客户端预热连接时发送 HEAD
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/stats":
+            self.send_json(404, {"error": {"code": "404", "message": "Not Found"}})
+            return
+        self.send_json(200, self.server.stats())
+
+    def do_POST(self):
+        server: StubLLMServer = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path.rstrip("/") not in (CHAT_COMPLETIONS_PATH, OPENAI_CHAT_COMPLETIONS_PATH):
+            self.send_json(404, {"error": {"code": "404", "message": "Not Found"}})
+            return
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            server.count("unauthorized")
+            self.send_json(401, {"error": {"code": "1001", "message": "缺少鉴权信息"}})
+            return
+        try:
+            payload = json.loads(body)
+            messages = payload["messages"]
+        except (ValueError, KeyError, TypeError):
+            server.count("bad_requests")
+            self.send_json(400, {"error": {"code": "1210", "message": "请求参数错误"}})
+            return
+
+        if server.rate_limiter and not server.rate_limiter.try_acquire():
+            server.count("rate_limited")
+            self.send_json(429, {"error": {"code": "1302", "message": "请求频率超过限制"}}, {"Retry-After": "1"})
+            return
+
+        server.enter()
+        try:
+            time.sleep(server.latency.sample())
+            if random.random() < server.error_rate:
+                server.count("errors")
+                self.send_json(server.error_status, {"error": {"code": "500", "message": "服务内部错误（注入）"}})
+                return
+            content = answer_prompt(messages[-1].get("content", "") if messages else "")
+            if payload.get("stream"):
+                self.send_stream(content, server.usage(messages, content))
+            else:
+                self.send_json(200, {
+                    "id": f"stub-{time.time_ns()}",
+                    "model": payload.get("model", "glm-4"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": server.usage(messages, content),
+                })
+            server.count("ok")
+        finally:
+            server.leave()
+
+    def send_json(self, status: int, data: Dict[str, Any], headers: Dict[str, str] = None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_stream(self, content: str, usage: Dict[str, int]):
+        """按 token_delay 的间隔逐段发送 SSE，每段 chunk_chars 个字符；最后一个事件带 usage"""
+        server: StubLLMServer = self.server
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i in range(0, len(content), server.chunk_chars):
+            if i:
+                time.sleep(server.token_delay)
+            event = {"choices": [{"index": 0, "delta": {"content": content[i:i + server.chunk_chars]}}]}
+            self.write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+        final = {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+        self.write_chunk(f"data: {json.dumps(final)}\n\n".encode("utf-8"))
+        self.write_chunk(b"data: [DONE]\n\n")
+        self.write_chunk(b"")
+
+    def write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class StubLLMServer(ThreadingHTTPServer):
+    """替身LLM服务，构造后即在后台线程开始监听"""
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: str = "fixed:0",
+                 error_rate: float = 0.0, error_status: int = 503, rate_limit: Optional[float] = None,
+                 token_delay: float = 0.02, chunk_chars: int = 2, verbose: bool = False):
+        super().__init__((host, port), StubLLMHandler)
+        self.latency = LatencyModel(latency)
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.rate_limiter = RateLimiter(rate_limit) if rate_limit else None
+        self.token_delay = token_delay
+        self.chunk_chars = max(1, chunk_chars)
+        self.verbose = verbose
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._active = 0
+        self._peak = 0
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-llm-server", daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{CHAT_COMPLETIONS_PATH}"
+
+    @property
+    def openai_base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def count(self, name: str):
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + 1
+
+    def enter(self):
+        with self._lock:
+            self._active += 1
+            self._peak = max(self._peak, self._active)
+
+    def leave(self):
+        with self._lock:
+            self._active -= 1
+
+    @staticmethod
+    def usage(messages: List[Dict[str, str]], content: str) -> Dict[str, int]:
+        """粗略的token用量（按字符数估计）"""
+        prompt_tokens = sum(len(msg.get("content", "")) for msg in messages)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": len(content),
+                "total_tokens": prompt_tokens + len(content)}
+
+    def stats(self) -> Dict[str, Any]:
+        """请求统计：各结果的次数、当前和最大并发"""
+        with self._lock:
+            return {**self._counts, "active": self._active, "peak_active": self._peak}
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="本地替身LLM服务（智谱AI chat/completions 格式）")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址")
+    parser.add_argument("--port", type=int, default=8900, help="监听端口")
+    parser.add_argument("--latency", default="lognormal:0.8,0.5",
+                        help="延迟分布：fixed:秒、uniform:最小,最大、lognormal:中位数,sigma")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="注入错误的比例（0~1）")
+    parser.add_argument("--error-status", type=int, default=503, help="注入错误的HTTP状态码")
+    parser.add_argument("--rate-limit", type=float, default=None, help="每秒请求数上限，超出返回429")
+    parser.add_argument("--token-delay", type=float, default=0.03, help="流式输出每段之间的间隔（秒）")
+    parser.add_argument("--chunk-chars", type=int, default=2, help="流式输出每段的字符数")
+    parser.add_argument("--verbose", action="store_true", help="打印每个请求")
+    args = parser.parse_args()
+
+    try:
+        server = StubLLMServer(args.host, args.port, latency=args.latency, error_rate=args.error_rate,
+                               error_status=args.error_status, rate_limit=args.rate_limit,
+                               token_delay=args.token_delay, chunk_chars=args.chunk_chars, verbose=args.verbose)
+    except ValueError as e:
+        print(f"参数错误: {e}")
+        return
+    print(f"替身LLM服务已启动: {server.url}")
+    print(f"延迟: {args.latency}, 错误率: {args.error_rate}, 限流: {args.rate_limit or '无'}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"\n请求统计: {server.stats()}")
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
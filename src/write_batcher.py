@@ -0,0 +1,141 @@
+import sqlite3
+import threading
+import queue
+import time
+from concurrent.futures import Future
+from typing import Dict, Any, Optional, List, Tuple
+
+from db_pool import connect, statement_result
+
+
+class WriteBatcher:
+    """DBExec 组提交（group commit）
+
+    各会话把写语句交给专用的写线程，写线程在一个小的时间窗口或数量上限内
+    收集多条语句，放进同一个事务执行并一次提交，再把各自的结果（影响行数或
+    RETURNING 返回值）交还给提交者。
+    每条语句包在 SAVEPOINT 里，单条失败只回滚它自己，不影响同批的其他语句。
+    """
+
+    def __init__(self, db_path: str, max_batch: int = 64, max_delay_ms: float = 5.0):
+        if max_batch < 1:
+            raise ValueError("批大小必须大于0")
+        self.db_path = db_path
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self._queue: "queue.Queue[Optional[Tuple[str, Future]]]" = queue.Queue()
+        self._closed = False
+        self._lock = threading.Lock()
+        # 关闭检查和入队在同一把锁下完成，关闭信号之后不会再有语句入队
+        self._submit_lock = threading.Lock()
+
+        # 监控指标
+        self._batches = 0
+        self._statements = 0
+        self._max_batch_seen = 0
+        self._failures = 0
+
+        # 写线程使用自己的连接，以自动提交模式打开，由写线程显式管理事务
+        self._conn = connect(db_path, isolation_level=None)
+        self._thread = threading.Thread(target=self._run, name="dsl-write-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, sql: str, timeout: Optional[float] = None) -> Any:
+        """提交一条写语句并等待其所在批次提交，返回影响行数或 RETURNING 返回值"""
+        return self.submit_async(sql).result(timeout)
+
+    def submit_async(self, sql: str) -> Future:
+        """提交一条写语句，返回可等待的 Future"""
+        future: Future = Future()
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("写合并器已关闭")
+            self._queue.put((sql, future))
+        return future
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        """阻塞等待第一条语句，然后在时间窗口内尽量多收集"""
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # 关闭信号：处理完当前批次后退出
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        """写线程主循环"""
+        while True:
+            batch = self._collect()
+            if not batch:
+                break
+            self._execute_batch(batch)
+        self._conn.close()
+
+    def _execute_batch(self, batch: List[Tuple[str, Future]]):
+        """在一个事务里执行一批语句"""
+        results: List[Tuple[Future, Any, Optional[BaseException]]] = []
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for sql, future in batch:
+                cursor.execute("SAVEPOINT dsl_write")
+                try:
+                    cursor.execute(sql)
+                    results.append((future, statement_result(cursor), None))
+                    cursor.execute("RELEASE dsl_write")
+                except sqlite3.Error as e:
+                    cursor.execute("ROLLBACK TO dsl_write")
+                    cursor.execute("RELEASE dsl_write")
+                    results.append((future, None, e))
+            cursor.execute("COMMIT")
+        except Exception as e:
+            # 事务本身失败（如提交失败），整批都报告错误
+            if self._conn.in_transaction:
+                self._conn.rollback()
+            with self._lock:
+                self._failures += 1
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        with self._lock:
+            self._batches += 1
+            self._statements += len(batch)
+            self._max_batch_seen = max(self._max_batch_seen, len(batch))
+        for future, value, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(value)
+
+    def stats(self) -> Dict[str, Any]:
+        """组提交统计"""
+        with self._lock:
+            return {
+                "batches": self._batches,
+                "statements": self._statements,
+                "avg_batch_size": round(self._statements / self._batches, 2) if self._batches else 0.0,
+                "max_batch_size": self._max_batch_seen,
+                "failed_batches": self._failures,
+                "pending": self._queue.qsize(),
+            }
+
+    def close(self, timeout: Optional[float] = None):
+        """处理完已提交的语句后停止写线程"""
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join(timeout)
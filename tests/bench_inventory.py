@@ -0,0 +1,124 @@
+"""库存预留基准测试
+
+按 test_concurrency.py 的购买场景（购买 -> 手机 -> 数量 -> 退出）运行电商脚本，
+把并发买家扩大到 1000 个，对比两种路径：
+  - 数据库路径：Reserve 回退为 goods 表上的条件 UPDATE（原有购买方式）
+  - 库存引擎：Reserve 走 InventoryEngine 的内存计数，异步写回 goods 表
+
+用法: python tests/bench_inventory.py [--buyers 1000] [--stock 500] [--quantity 1]
+"""
+import os
+import sys
+import time
+import argparse
+import sqlite3
+import tempfile
+import threading
+import contextlib
+from typing import Dict, Any, List
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, src_dir)
+
+from dsl_parser import load_script_from_file
+from interpreter import DSLInterpreter
+from inventory import InventoryEngine
+
+class TimedInterpreter(DSLInterpreter):
+    """记录每次库存预留耗时的解释器"""
+
+    def __init__(self, *args, inputs: List[str], latencies: List[float], **kwargs):
+        super().__init__(*args, **kwargs)
+        self._inputs = iter(inputs)
+        self._latencies = latencies
+        self.reserved = False
+        self.input_function = lambda prompt=None: next(self._inputs, "退出")
+
+    def _execute_reserve(self, sku, quantity, variable=None):
+        start = time.perf_counter()
+        result = super()._execute_reserve(sku, quantity, variable)
+        self._latencies.append(time.perf_counter() - start)
+        self.reserved = bool(self.variables.get(variable))
+        return result
+
+def create_database(db_path: str, stock: int):
+    """创建与 init_db 相同结构的测试数据库"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE goods (name TEXT PRIMARY KEY, stock INTEGER)")
+    conn.executemany("INSERT INTO goods VALUES (?, ?)", [("phone", stock), ("earphone", 20), ("laptop", 5)])
+    conn.execute("CREATE TABLE orders (id TEXT PRIMARY KEY, status TEXT)")
+    conn.commit()
+    conn.close()
+
+def percentile(values: List[float], ratio: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))] if ordered else 0.0
+
+def run_scenario(name: str, buyers: int, stock: int, quantity: int, use_engine: bool) -> Dict[str, Any]:
+    """运行一种路径的并发购买场景"""
+    db_path = os.path.join(tempfile.mkdtemp(prefix="dsl_bench_"), "bench.db")
+    create_database(db_path, stock)
+    script_ast = load_script_from_file(os.path.join(project_root, "scripts", "ecommerce.txt"))
+    engine = InventoryEngine(db_path) if use_engine else None
+
+    latencies: List[float] = []
+    interpreters = []
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        for _ in range(buyers):
+            interpreters.append(TimedInterpreter(
+                script_ast, None, db_path, inventory=engine,
+                inputs=["购买", "手机", str(quantity), "退出"], latencies=latencies
+            ))
+        threads = [threading.Thread(target=interpreter.run) for interpreter in interpreters]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        if engine is not None:
+            engine.close()
+
+    conn = sqlite3.connect(db_path)
+    final_stock = conn.execute("SELECT stock FROM goods WHERE name='phone'").fetchone()[0]
+    conn.close()
+
+    successes = sum(1 for interpreter in interpreters if interpreter.reserved)
+    return {
+        "name": name,
+        "elapsed_s": round(elapsed, 3),
+        "buyers_per_s": round(buyers / elapsed, 1),
+        "reserve_p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "reserve_p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "successes": successes,
+        "final_stock": final_stock,
+        "consistent": final_stock == stock - successes * quantity and successes == min(buyers, stock // quantity),
+    }
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="库存预留基准测试")
+    parser.add_argument("--buyers", type=int, default=1000, help="并发买家数")
+    parser.add_argument("--stock", type=int, default=500, help="手机初始库存")
+    parser.add_argument("--quantity", type=int, default=1, help="每个买家购买数量")
+    args = parser.parse_args()
+
+    print(f"并发买家: {args.buyers}, 初始库存: {args.stock}, 每人购买: {args.quantity}")
+    results = [
+        run_scenario("数据库条件更新", args.buyers, args.stock, args.quantity, use_engine=False),
+        run_scenario("内存库存引擎", args.buyers, args.stock, args.quantity, use_engine=True),
+    ]
+    for result in results:
+        print(f"\n{result['name']}:")
+        for key, value in result.items():
+            if key != "name":
+                print(f"   {key}: {value}")
+
+    return all(result["consistent"] for result in results)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
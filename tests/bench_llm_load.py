@@ -0,0 +1,150 @@
+"""多用户AI调用基准测试（离线）
+
+启动本地替身LLM服务（src/stub_llm_server.py），让多个医疗脚本会话并发走
+“自由提问”路径：每轮先说一句本地匹配不到的闲聊（一次AI意图识别，识别为
+unknown 后经 fallback 回到欢迎步骤），再经 科普 -> 自由提问 进入 sciAI 提问（一次 AIReply）。
+对比三种客户端用法：
+  - 每会话一个客户端：各自的连接池，没有并发上限
+  - 共享客户端：一个连接池，SyncLLMClient 限制在途请求数并合并相同的意图识别
+  - 共享客户端 + 意图微批处理：同一时间窗口内的意图识别合并为一次请求
+
+用法: python tests/bench_llm_load.py [--sessions 50] [--turns 3]
+      [--latency lognormal:0.3,0.5] [--error-rate 0.0] [--rate-limit 0]
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+import contextlib
+from typing import Dict, Any, List
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, src_dir)
+
+from dsl_parser import load_script_from_file
+from interpreter import DSLInterpreter
+from llm_client import ZhipuAIClient
+from async_llm_client import SyncLLMClient
+from intent_batcher import IntentBatcher
+from resilience import ResilientCaller, RetryPolicy
+from stub_llm_server import StubLLMServer
+
+# 本地匹配不到、需要AI识别意图的闲聊
+CHATTER = ["今天天气怎么样", "你们医院停车方便吗", "食堂几点开门", "你是机器人吗", "周末有人上班吗"]
+QUESTIONS = ["我这两天老是咳嗽", "孩子晚上睡不好", "血压有点高怎么办", "最近总是头晕", "胃不舒服吃什么好"]
+
+class TimedInterpreter(DSLInterpreter):
+    """按预设输入运行，记录每轮（用户输入到AI回复结束）的耗时"""
+
+    def __init__(self, *args, inputs: List[str], latencies: List[float], **kwargs):
+        super().__init__(*args, **kwargs)
+        self._inputs = iter(inputs)
+        self._latencies = latencies
+        self._turn_start = None
+        self.input_function = self._next_input
+
+    def _next_input(self, prompt=None):
+        self._turn_start = time.perf_counter()
+        return next(self._inputs, "退出")
+
+    def _execute_ai_reply(self):
+        result = super()._execute_ai_reply()
+        if self._turn_start is not None:
+            self._latencies.append(time.perf_counter() - self._turn_start)
+        return result
+
+def percentile(values: List[float], ratio: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * ratio))] if ordered else 0.0
+
+def make_inputs(session: int, turns: int) -> List[str]:
+    """每轮：欢迎步骤说一句需要AI识别的闲聊，再进入 sciAI 提问"""
+    inputs = []
+    for turn in range(turns):
+        inputs += [CHATTER[(session + turn) % len(CHATTER)], "科普", "自由提问",
+                   QUESTIONS[(session + turn) % len(QUESTIONS)]]
+    return inputs
+
+def run_scenario(name: str, server: StubLLMServer, sessions: int, turns: int, mode: str) -> Dict[str, Any]:
+    """运行一种客户端用法"""
+    script_ast = load_script_from_file(os.path.join(project_root, "scripts", "medical.txt"))
+
+    def new_client():
+        return ZhipuAIClient(api_key="bench_key", base_url=server.url,
+                             resilience=ResilientCaller(retry=RetryPolicy(base_delay=0.05)))
+
+    shared = None
+    if mode != "per_session":
+        shared = SyncLLMClient(new_client())
+        if mode == "batched":
+            shared = IntentBatcher(shared, max_delay_ms=10)
+    clients = [shared or new_client() for _ in range(sessions)]
+
+    latencies: List[float] = []
+    before = server.stats()
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        interpreters = [
+            TimedInterpreter(script_ast, clients[i], inputs=make_inputs(i, turns), latencies=latencies)
+            for i in range(sessions)
+        ]
+        threads = [threading.Thread(target=interpreter.run) for interpreter in interpreters]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    after = server.stats()
+
+    for client in {id(client): client for client in clients}.values():
+        client.close()
+
+    return {
+        "name": name,
+        "elapsed_s": round(elapsed, 3),
+        "turns_per_s": round(len(latencies) / elapsed, 1),
+        "turn_p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "turn_p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+        "llm_requests": after.get("ok", 0) - before.get("ok", 0),
+        "server_errors": after.get("errors", 0) - before.get("errors", 0),
+        "rate_limited": after.get("rate_limited", 0) - before.get("rate_limited", 0),
+        "completed_turns": len(latencies),
+    }
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="多用户AI调用基准测试（离线）")
+    parser.add_argument("--sessions", type=int, default=50, help="并发会话数")
+    parser.add_argument("--turns", type=int, default=3, help="每个会话的提问轮数")
+    parser.add_argument("--latency", default="lognormal:0.3,0.5", help="替身服务的延迟分布")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="替身服务注入错误的比例")
+    parser.add_argument("--rate-limit", type=float, default=0, help="替身服务每秒请求数上限，0为不限")
+    args = parser.parse_args()
+
+    server = StubLLMServer(latency=args.latency, error_rate=args.error_rate,
+                           rate_limit=args.rate_limit or None, token_delay=0.01)
+    print(f"并发会话: {args.sessions}, 每会话轮数: {args.turns}, 延迟: {args.latency}, "
+          f"错误率: {args.error_rate}, 限流: {args.rate_limit or '无'}")
+    results = [
+        run_scenario("每会话一个客户端", server, args.sessions, args.turns, "per_session"),
+        run_scenario("共享客户端", server, args.sessions, args.turns, "shared"),
+        run_scenario("共享客户端+意图微批处理", server, args.sessions, args.turns, "batched"),
+    ]
+    server.stop()
+
+    for result in results:
+        print(f"\n{result['name']}:")
+        for key, value in result.items():
+            if key != "name":
+                print(f"   {key}: {value}")
+
+    expected = args.sessions * args.turns
+    return all(result["completed_turns"] == expected for result in results)
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,142 @@
+"""本地意图匹配离线评估
+
+在标注语料上比较不同相似度阈值下本地匹配器的表现：
+  - 本地决定率：不需要调用LLM的轮次比例
+  - 本地准确率：本地直接给出目标的轮次中，目标正确的比例
+  - 误判数：本地给出了错误目标（LLM无法再纠正）的轮次
+  - 单次匹配延迟：p50 / p99（微秒）
+阈值 "关闭" 表示只用精确、规范化、关键词和同义词匹配。
+
+用法: python tests/eval_intent_similarity.py [--thresholds 0.4 0.5 0.6] [--repeat 50] [--pure-python]
+"""
+import os
+import sys
+import time
+import argparse
+import contextlib
+import io
+from typing import Dict, Any, List, Optional
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, src_dir)
+sys.path.insert(0, current_dir)
+
+import similarity_index
+from dsl_parser import load_script_from_file
+from intent_matcher import build_matchers
+from test_intent_matcher import REPLAY_CORPUS
+
+# 关键词和同义词覆盖不到的说法，以及应当交给LLM/Default的无关输入
+PARAPHRASE_CORPUS = [
+    ("medical", "welcome", "挂个号", "挂号"),
+    ("medical", "welcome", "帮我挂个专家号", "挂号"),
+    ("medical", "welcome", "想做个检查", "体检"),
+    ("medical", "welcome", "身体检查一下", "体检"),
+    ("medical", "welcome", "我想了解点医学常识", "科普"),
+    ("medical", "welcome", "退个款", None),
+    ("medical", "welcome", "帮我查下快递", None),
+    ("medical", "welcome", "你是谁", None),
+    ("medical", "regDept", "挂内科的号", "内科"),
+    ("medical", "regDept", "外伤", "外科"),
+    ("medical", "regDept", "小朋友看病", "儿科"),
+    ("medical", "regDept", "随便", None),
+    ("medical", "scienceIntro", "睡不着怎么办", "睡眠"),
+    ("medical", "scienceIntro", "吃什么好", "饮食"),
+    ("medical", "scienceIntro", "想自己提问", "自由提问"),
+    ("medical", "scienceIntro", "运动健康吧", "运动"),
+    ("ecommerce", "welcome", "退个款", "退款"),
+    ("ecommerce", "welcome", "东西坏了我要投个诉", "投诉"),
+    ("ecommerce", "welcome", "找客服人员", "客服"),
+    ("ecommerce", "welcome", "看看库存情况", "库存"),
+    ("ecommerce", "welcome", "下个单", "下单"),
+    ("ecommerce", "welcome", "钱能退吗", "退款"),
+    ("ecommerce", "welcome", "怎么开发票", None),
+    ("ecommerce", "welcome", "你好", None),
+    ("ecommerce", "buyStart", "买个笔记本", "电脑"),
+    ("ecommerce", "buyStart", "手提电脑", "电脑"),
+    ("ecommerce", "buyStart", "蓝牙耳机", "耳机"),
+    ("ecommerce", "buyStart", "新款手机", "手机"),
+    ("ecommerce", "buyStart", "充电宝", None),
+]
+
+LABELED_CORPUS = REPLAY_CORPUS + PARAPHRASE_CORPUS
+
+def load_scripts():
+    return {
+        module: load_script_from_file(os.path.join(project_root, "scripts", f"{module}.txt"))
+        for module in ("medical", "ecommerce")
+    }
+
+def expected_target(script, step, pattern) -> Optional[str]:
+    """标注的模式对应的跳转目标；None 表示应走 Default"""
+    if pattern is None:
+        return None
+    for action in script['steps'][step]['actions']:
+        if action['type'] == "Case" and action['pattern'] == pattern:
+            return action['target']
+    return None
+
+def evaluate(scripts, threshold: Optional[float], repeat: int) -> Dict[str, Any]:
+    """在标注语料上评估一个阈值"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        matchers = {module: build_matchers(script, threshold) for module, script in scripts.items()}
+
+    local = correct = wrong = 0
+    latencies: List[float] = []
+    wrong_cases = []
+    for module, step, user_input, pattern in LABELED_CORPUS:
+        matcher = matchers[module][step]
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = matcher.match(user_input)
+            latencies.append(time.perf_counter() - start)
+        if result.target is None:
+            continue
+        local += 1
+        if result.target == expected_target(scripts[module], step, pattern):
+            correct += 1
+        else:
+            wrong += 1
+            wrong_cases.append((user_input, result.tier, result.target))
+
+    latencies.sort()
+    total = len(LABELED_CORPUS)
+    return {
+        "threshold": "关闭" if threshold is None else threshold,
+        "local_rate": round(local / total, 3),
+        "local_accuracy": round(correct / local, 3) if local else 0.0,
+        "wrong": wrong,
+        "wrong_cases": wrong_cases,
+        "llm_calls": total - local,
+        "p50_us": round(latencies[len(latencies) // 2] * 1e6, 1),
+        "p99_us": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1e6, 1),
+    }
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="本地意图匹配离线评估")
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.4, 0.5, 0.55, 0.6, 0.7],
+                        help="要比较的相似度阈值")
+    parser.add_argument("--repeat", type=int, default=50, help="每条输入重复匹配的次数（用于测延迟）")
+    parser.add_argument("--pure-python", action="store_true", help="不使用NumPy计算相似度")
+    args = parser.parse_args()
+
+    if args.pure_python:
+        similarity_index.np = None
+    backend = "NumPy" if similarity_index.np is not None else "纯Python"
+    scripts = load_scripts()
+    print(f"标注语料: {len(LABELED_CORPUS)} 条, 相似度计算: {backend}")
+
+    for threshold in [None] + args.thresholds:
+        result = evaluate(scripts, threshold, args.repeat)
+        print(f"阈值 {result['threshold']}: 本地决定率 {result['local_rate']}, "
+              f"本地准确率 {result['local_accuracy']}, 误判 {result['wrong']}, "
+              f"LLM调用 {result['llm_calls']}, p50 {result['p50_us']}us, p99 {result['p99_us']}us")
+        for user_input, tier, target in result["wrong_cases"]:
+            print(f"    误判: \"{user_input}\" -> {target}（{tier}）")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, src_dir)
+
+from async_llm_client import AsyncLLMClient, SyncLLMClient
+from intent_cache import IntentCache
+
+class SlowLLMClient:
+    """模拟慢速API的同步客户端，记录上游调用次数和最大并发数"""
+
+    def __init__(self, delay=0.1):
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self.intent_cache = None
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def _enter(self):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def _exit(self):
+        with self._lock:
+            self.active -= 1
+
+    def recognize_intent(self, user_input, candidate_intents, context=None):
+        self._enter()
+        try:
+            time.sleep(self.delay)
+            if user_input == "boom":
+                raise RuntimeError("上游错误")
+            for intent in candidate_intents:
+                if intent in user_input:
+                    return intent
+            return "unknown"
+        finally:
+            self._exit()
+
+    def generate_reply(self, user_input, context=None):
+        self._enter()
+        try:
+            time.sleep(self.delay)
+            return f"回复：{user_input}"
+        finally:
+            self._exit()
+
+    def close(self):
+        self.closed = True
+
+def run_threads(count, target):
+    """同时启动 count 个线程执行 target(i)，返回按序号排列的结果"""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = target(i)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+class TestAsyncLLMClient:
+    """异步LLM客户端测试类"""
+
+    def __init__(self):
+        self.test_results = {}
+
+    def test_single_flight(self):
+        """测试同时到达的相同意图识别只调用一次上游（规范化后相同的输入也合并）"""
+        print("\n测试请求合并")
+
+        upstream = SlowLLMClient(delay=0.3)
+        client = SyncLLMClient(upstream, max_in_flight=4)
+        inputs = ["我想挂号", "我想挂号！", " 我想挂号"]
+        results = run_threads(30, lambda i: client.recognize_intent(inputs[i % 3], ["挂号", "体检"]))
+        stats = client.stats()
+        client.close()
+
+        passed = results == ["挂号"] * 30 and upstream.calls == 1 and stats["coalesced"] == 29 and upstream.closed
+        self.test_results["single_flight"] = {"upstream_calls": upstream.calls, "stats": stats, "passed": passed}
+        print(f"   30个并发请求，上游调用: {upstream.calls}")
+        return passed
+
+    def test_in_flight_limit(self):
+        """测试不同请求的在途数量受上限约束，全部请求都能完成"""
+        print("\n测试并发上限")
+
+        upstream = SlowLLMClient(delay=0.05)
+        client = SyncLLMClient(upstream, max_in_flight=4)
+        results = run_threads(32, lambda i: client.recognize_intent(f"买{i}号商品", ["买", "退款"]))
+        replies = run_threads(8, lambda i: client.generate_reply(f"问题{i}"))
+        stats = client.stats()
+        client.close()
+
+        passed = (results == ["买"] * 32 and replies == [f"回复：问题{i}" for i in range(8)]
+                  and upstream.calls == 40 and upstream.peak <= 4 and stats["peak_in_flight"] <= 4)
+        self.test_results["in_flight_limit"] = {"peak": upstream.peak, "stats": stats, "passed": passed}
+        print(f"   上游最大并发: {upstream.peak}")
+        return passed
+
+    def test_asyncio_api(self):
+        """测试在事件循环中直接使用异步接口，缓存命中不占用上游"""
+        print("\n测试asyncio接口")
+
+        upstream = SlowLLMClient(delay=0.1)
+        upstream.intent_cache = IntentCache()
+        upstream.intent_cache.put("我要退款", ["买", "退款"], "退款")
+        client = AsyncLLMClient(upstream, max_in_flight=2)
+
+        async def scenario():
+            same = [client.recognize_intent("我要买手机", ["买", "退款"]) for _ in range(10)]
+            distinct = [client.recognize_intent(f"买{i}", ["买", "退款"]) for i in range(3)]
+            cached = [client.recognize_intent("我要退款", ["退款", "买"])]
+            return await asyncio.gather(*same, *distinct, *cached)
+
+        results = asyncio.run(scenario())
+        stats = client.stats()
+        client.close()
+
+        passed = results == ["买"] * 13 + ["退款"] and upstream.calls == 4 and upstream.peak <= 2
+        self.test_results["asyncio_api"] = {"upstream_calls": upstream.calls, "stats": stats, "passed": passed}
+        return passed
+
+    def test_error_propagation(self):
+        """测试上游异常传给所有合并的调用方，之后的请求重新调用上游"""
+        print("\n测试异常传播")
+
+        upstream = SlowLLMClient(delay=0.2)
+        client = SyncLLMClient(upstream, max_in_flight=2)
+        results = run_threads(5, lambda i: client.recognize_intent("boom", ["挂号"]))
+        calls_after_burst = upstream.calls
+        try:
+            client.recognize_intent("boom", ["挂号"])
+            retried = False
+        except RuntimeError:
+            retried = upstream.calls == calls_after_burst + 1
+        client.close()
+
+        passed = all(isinstance(result, RuntimeError) for result in results) and calls_after_burst == 1 and retried
+        self.test_results["error_propagation"] = {"upstream_calls": upstream.calls, "passed": passed}
+        return passed
+
+    def run_all_tests(self):
+        """运行所有测试"""
+        print("开始异步LLM客户端测试")
+
+        test_methods = [method for method in dir(self) if method.startswith('test_') and callable(getattr(self, method))]
+
+        for test_method in test_methods:
+            try:
+                passed = getattr(self, test_method)()
+                status = "通过" if passed else "失败"
+                print(f"   {status}: {test_method}")
+            except Exception as e:
+                print(f"   错误: {test_method} - {e}")
+                self.test_results[test_method] = {"error": str(e), "passed": False}
+
+        return self.test_results
+
+def main():
+    """主函数"""
+    tester = TestAsyncLLMClient()
+    test_results = tester.run_all_tests()
+
+    passed_count = sum(1 for result in test_results.values() if result.get("passed", False))
+    total_count = len(test_results)
+
+    print(f"\n测试总结:")
+    print(f"   总测试数: {total_count}")
+    print(f"   通过数: {passed_count}")
+    print(f"   失败数: {total_count - passed_count}")
+
+    return passed_count == total_count
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
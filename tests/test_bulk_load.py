@@ -0,0 +1,126 @@
+import os
+import sys
+import json
+import sqlite3
+import tempfile
+import io
+import contextlib
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+sys.path.insert(0, project_root)
+
+from database.bulk_load import bulk_load, read_records, synthetic_records, benchmark_lookups, TABLE_COLUMNS
+
+class TestBulkLoad:
+    """批量导入测试类"""
+
+    def __init__(self):
+        self.test_results = {}
+        self.temp_dir = tempfile.mkdtemp(prefix="dsl_bulk_")
+
+    def test_csv_and_jsonl_import(self):
+        """测试CSV和JSONL导入、坏行跳过、导入后重建已有索引并恢复WAL"""
+        print("\n测试文件导入")
+
+        goods_path = os.path.join(self.temp_dir, "goods.csv")
+        with open(goods_path, "w", encoding="utf-8") as f:
+            f.write("name,stock\nphone,99\nwatch,7\nbroken,\n")
+        orders_path = os.path.join(self.temp_dir, "orders.jsonl")
+        with open(orders_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"id": "2001", "status": "ordered"}) + "\n")
+            f.write(json.dumps({"id": "2002", "status": "shipped"}) + "\n")
+            f.write("{not json\n")
+
+        db_path = os.path.join(self.temp_dir, "files.db")
+        # 运维已有的二级索引在导入后保留
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE orders (id TEXT PRIMARY KEY, status TEXT)")
+        conn.execute("CREATE INDEX idx_orders_status ON orders (status)")
+        conn.close()
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = bulk_load(db_path, {
+                "goods": read_records(goods_path, TABLE_COLUMNS["goods"]),
+                "orders": read_records(orders_path, TABLE_COLUMNS["orders"]),
+            }, chunk_size=1)
+
+        conn = sqlite3.connect(db_path)
+        phone = conn.execute("SELECT stock FROM goods WHERE name='phone'").fetchone()[0]
+        orders = conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index' AND sql IS NOT NULL")}
+        journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        conn.close()
+
+        summary = {result["table"]: (result["rows"], result["skipped"]) for result in results}
+        passed = (summary == {"goods": (2, 1), "orders": (2, 1)} and int(phone) == 99 and orders == 5 and
+                  indexes == {"idx_orders_status"} and journal_mode == "wal")
+        self.test_results["csv_and_jsonl_import"] = {
+            "summary": summary,
+            "indexes": sorted(indexes),
+            "journal_mode": journal_mode,
+            "passed": passed
+        }
+        return passed
+
+    def test_generated_load_and_lookup(self):
+        """测试生成数据导入和DBQuery查询基准"""
+        print("\n测试生成数据导入")
+
+        db_path = os.path.join(self.temp_dir, "generated.db")
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = bulk_load(db_path, {
+                "goods": synthetic_records("goods", 20000),
+                "orders": synthetic_records("orders", 20000),
+            }, truncate=True)
+        lookups = benchmark_lookups(db_path, samples=50)
+
+        conn = sqlite3.connect(db_path)
+        goods = conn.execute("SELECT COUNT(*) FROM goods").fetchone()[0]
+        conn.close()
+        passed = (goods == 20000 and all(result["rows_per_s"] > 0 for result in results) and
+                  lookups["goods"]["samples"] == 50 and lookups["orders"]["samples"] == 50)
+        self.test_results["generated_load_and_lookup"] = {
+            "results": results,
+            "lookups": lookups,
+            "passed": passed
+        }
+        print(f"   导入: {results}")
+        print(f"   查询: {lookups}")
+        return passed
+
+    def run_all_tests(self):
+        """运行所有测试"""
+        print("开始批量导入测试")
+
+        test_methods = [method for method in dir(self) if method.startswith('test_') and callable(getattr(self, method))]
+
+        for test_method in test_methods:
+            try:
+                passed = getattr(self, test_method)()
+                status = "通过" if passed else "失败"
+                print(f"   {status}: {test_method}")
+            except Exception as e:
+                print(f"   错误: {test_method} - {e}")
+                self.test_results[test_method] = {"error": str(e), "passed": False}
+
+        return self.test_results
+
+def main():
+    """主函数"""
+    tester = TestBulkLoad()
+    test_results = tester.run_all_tests()
+
+    passed_count = sum(1 for result in test_results.values() if result.get("passed", False))
+    total_count = len(test_results)
+
+    print(f"\n测试总结:")
+    print(f"   总测试数: {total_count}")
+    print(f"   通过数: {passed_count}")
+    print(f"   失败数: {total_count - passed_count}")
+
+    return passed_count == total_count
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
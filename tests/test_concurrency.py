@@ -24,103 +24,14 @@ from src.dsl_parser import load_script_from_file
 from src.interpreter import DSLInterpreter
 from src.llm_client import ZhipuAIClient
 from database.init_db import init_db
+from db_pool import open_memory_db, close_memory_db, snapshot_db, restore_db
 
 class ThreadSafeDSLInterpreter(DSLInterpreter):
     """线程安全的DSL解释器"""
     
     def __init__(self, script_ast: Dict[str, Any], llm_client: ZhipuAIClient = None, db_path: str = None):
-        # 不立即连接数据库，在运行线程中连接
-        self.script = script_ast
-        self.llm_client = llm_client
-        self.current_step = "welcome"
-        self.conversation_history: List[Dict[str, str]] = []
-        self.variables: Dict[str, Any] = {}
-        self.locks: Dict[str, bool] = {}
-        self.is_running = True
-        self.input_function = input
-
-        # 存储数据库路径，在运行时连接
-        self.db_path = db_path
-        self.db_conn = None
-    
-    def run(self):
-        """运行解释器 - 在线程中连接数据库"""
-        # 在线程中连接数据库
-        if self.db_path and not self.db_conn:
-            try:
-                self.db_conn = sqlite3.connect(self.db_path)
-                print(f"数据库连接成功: {self.db_path}")
-            except Exception as e:
-                print(f"数据库连接失败: {e}")
-        
-        module_name = self.script.get('module', '通用机器人')
-        print(f"\n {module_name} 已启动")
-        print("输入 '退出' 结束对话")
-        print("=" * 50)
-        
-        while self.is_running and self.current_step:
-            self._execute_current_step()
-    
-    def _execute_db_query(self, query: str, variable: str, target: str) -> Dict[str, Any]:
-        """重写数据库查询动作，确保在线程中连接"""
-        if not self.db_conn:
-            # 如果还没有连接，尝试连接
-            if self.db_path:
-                try:
-                    self.db_conn = sqlite3.connect(self.db_path)
-                except Exception as e:
-                    print(f"数据库连接失败: {e}")
-                    return {"next_step": target}
-            else:
-                print("错误：数据库未连接")
-                return {"next_step": target}
-        
-        try:
-            # 替换查询中的变量
-            formatted_query = self._replace_variables(query)
-            cursor = self.db_conn.cursor()
-            cursor.execute(formatted_query)
-            result = cursor.fetchone()
-            
-            if result:
-                # 存储查询结果到变量
-                self.variables[variable] = result[0] if len(result) == 1 else result
-                print(f"数据库查询结果存储到变量 '{variable}': {self.variables[variable]}")
-            else:
-                self.variables[variable] = None
-                print(f"数据库查询无结果，变量 '{variable}' 设为 None")
-            
-            return {"next_step": target}
-            
-        except Exception as e:
-            print(f"数据库查询错误: {e}")
-            return {"next_step": target}
-    
-    def _execute_db_exec(self, query: str) -> None:
-        """重写数据库更新动作，确保在线程中连接"""
-        if not self.db_conn:
-            # 如果还没有连接，尝试连接
-            if self.db_path:
-                try:
-                    self.db_conn = sqlite3.connect(self.db_path)
-                except Exception as e:
-                    print(f"数据库连接失败: {e}")
-                    return None
-            else:
-                print("错误：数据库未连接")
-                return None
-        
-        try:
-            # 替换查询中的变量
-            formatted_query = self._replace_variables(query)
-            cursor = self.db_conn.cursor()
-            cursor.execute(formatted_query)
-            self.db_conn.commit()
-            print(f"数据库更新成功: {formatted_query}")
-        except Exception as e:
-            print(f"数据库更新错误: {e}")
-        
-        return None
+        # 数据库连接由共享连接池按步骤借出，可直接在会话线程中使用
+        super().__init__(script_ast, llm_client, db_path)
     
     def _execute_if(self, condition: Dict[str, Any], target: str) -> Optional[Dict[str, Any]]:
         """重写条件判断动作，修复类型比较问题"""
@@ -176,14 +87,6 @@ class ThreadSafeDSLInterpreter(DSLInterpreter):
             return {"next_step": target}
         
         return None
-    
-    def __del__(self):
-        """清理资源"""
-        if self.db_conn:
-            try:
-                self.db_conn.close()
-            except:
-                pass
 
 class ConcurrentPurchaseTester:
     """修复后的并发购买测试类"""
@@ -192,33 +95,48 @@ class ConcurrentPurchaseTester:
         self.test_results = {}
         self.output_dir = os.path.join(project_root, "test_results")
         os.makedirs(self.output_dir, exist_ok=True)
+        self.fixture = self.build_fixture()
         
-    def setup_test_database(self, db_path: str):
-        """设置测试数据库"""
+    def build_fixture(self) -> bytes:
+        """在内存数据库中建好表和初始库存，保存为快照供各场景恢复"""
+        uri = open_memory_db("concurrency_fixture")
+        try:
+            init_db(uri)
+            
+            conn = sqlite3.connect(uri, uri=True)
+            cursor = conn.cursor()
+            
+            # 重置商品库存
+            cursor.execute("DELETE FROM goods")
+            cursor.execute("INSERT INTO goods (name, stock) VALUES ('phone', 10)")
+            cursor.execute("INSERT INTO goods (name, stock) VALUES ('earphone', 20)")
+            cursor.execute("INSERT INTO goods (name, stock) VALUES ('laptop', 5)")
+            
+            conn.commit()
+            conn.close()
+            return snapshot_db(uri)
+        finally:
+            close_memory_db(uri)
+    
+    def setup_test_database(self, name: str) -> str:
+        """设置测试数据库：每个场景使用独立的命名内存数据库，从快照恢复初始数据"""
         print("设置测试数据库...")
         
-        # 确保数据库目录存在
-        db_dir = os.path.dirname(db_path)
-        if db_dir and not os.path.exists(db_dir):
-            os.makedirs(db_dir)
-            
-        # 初始化数据库
-        init_db(db_path)
+        db_path = open_memory_db(name)
+        restore_db(db_path, self.fixture)
         
-        # 设置初始库存
-        conn = sqlite3.connect(db_path)
+        print(f"数据库设置完成，手机库存初始化为10，路径: {db_path}")
+        return db_path
+    
+    def read_phone_stock(self, db_path: str) -> int:
+        """读取手机库存并释放该场景的内存数据库"""
+        conn = sqlite3.connect(db_path, uri=True)
         cursor = conn.cursor()
-        
-        # 重置商品库存
-        cursor.execute("DELETE FROM goods")
-        cursor.execute("INSERT INTO goods (name, stock) VALUES ('phone', 10)")
-        cursor.execute("INSERT INTO goods (name, stock) VALUES ('earphone', 20)")
-        cursor.execute("INSERT INTO goods (name, stock) VALUES ('laptop', 5)")
-        
-        conn.commit()
+        cursor.execute("SELECT stock FROM goods WHERE name='phone'")
+        final_stock = cursor.fetchone()[0]
         conn.close()
-        
-        print(f"数据库设置完成，手机库存初始化为10，路径: {db_path}")
+        close_memory_db(db_path)
+        return final_stock
     
     class TestUserSession:
         """测试用户会话"""
@@ -233,6 +151,8 @@ class ConcurrentPurchaseTester:
             self.purchase_failed_message = None
             self.final_stock = None
             self.conversation_history = []
+            # 下单结果（成功或失败）播报后置位，供需要固定顺序的场景等待
+            self.purchase_done = threading.Event()
             
         def add_input(self, user_input: str):
             """添加用户输入"""
@@ -268,8 +188,10 @@ class ConcurrentPurchaseTester:
                 # 检查购买结果
                 if "下单成功" in formatted_message:
                     self.purchase_successful = True
+                    self.purchase_done.set()
                 elif "购买失败" in formatted_message or "库存不足" in formatted_message:
                     self.purchase_failed_message = formatted_message
+                    self.purchase_done.set()
                 elif "当前剩余" in formatted_message:
                     # 提取库存信息
                     import re
@@ -298,8 +220,7 @@ class ConcurrentPurchaseTester:
         print("="*60)
         
         # 设置测试数据库
-        db_path = os.path.join(project_root, "database", "test_concurrent_fixed_1.db")
-        self.setup_test_database(db_path)
+        db_path = self.setup_test_database("test_concurrent_fixed_1")
         
         # 加载脚本
         script_path = os.path.join(project_root, "scripts", "ecommerce.txt")
@@ -331,7 +252,7 @@ class ConcurrentPurchaseTester:
             thread.start()
         
         # 等待所有线程启动
-        time.sleep(3)
+        time.sleep(0.5)
         
         # 同时触发所有用户购买流程
         print("同时触发所有用户购买手机...")
@@ -339,17 +260,14 @@ class ConcurrentPurchaseTester:
             user_sessions[user_id].add_input("购买")
             user_sessions[user_id].add_input("手机")
             user_sessions[user_id].add_input("10")  # 每个用户都买10台
+            user_sessions[user_id].add_input("退出")
         
         # 等待所有会话完成
         for thread in threads:
             thread.join(timeout=45)  # 45秒超时
         
         # 收集结果
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT stock FROM goods WHERE name='phone'")
-        final_stock = cursor.fetchone()[0]
-        conn.close()
+        final_stock = self.read_phone_stock(db_path)
         
         # 分析结果
         success_count = 0
@@ -396,12 +314,11 @@ class ConcurrentPurchaseTester:
         """测试场景2: 混合购买数量"""
         print("\n" + "="*60)
         print("测试场景2: 混合购买数量 (用户1:5台, 用户2:6台, 用户3:3台)")
-        print("期望: 用户1和用户3成功，用户2失败")
+        print("期望: 按用户1、用户2、用户3的顺序下单时，用户1和用户3成功，用户2失败")
         print("="*60)
         
         # 设置测试数据库
-        db_path = os.path.join(project_root, "database", "test_concurrent_fixed_2.db")
-        self.setup_test_database(db_path)
+        db_path = self.setup_test_database("test_concurrent_fixed_2")
         
         # 加载脚本
         script_path = os.path.join(project_root, "scripts", "ecommerce.txt")
@@ -433,7 +350,7 @@ class ConcurrentPurchaseTester:
             thread.start()
         
         # 等待所有线程启动
-        time.sleep(3)
+        time.sleep(0.5)
         
         # 设置不同的购买数量
         purchase_quantities = {
@@ -442,22 +359,23 @@ class ConcurrentPurchaseTester:
             "User3": "3"
         }
         
-        print("触发用户购买手机...")
+        # 期望结果取决于下单顺序：等上一个用户的下单结果出来再触发下一个，
+        # 而不是靠线程调度碰运气（谁先抢到库存由场景1覆盖）
+        print("按顺序触发用户购买手机...")
         for user_id, quantity in purchase_quantities.items():
             user_sessions[user_id].add_input("购买")
             user_sessions[user_id].add_input("手机")
             user_sessions[user_id].add_input(quantity)
+            if not user_sessions[user_id].purchase_done.wait(timeout=15):
+                print(f"{user_id}: 等待下单结果超时")
+            user_sessions[user_id].add_input("退出")
         
         # 等待所有会话完成
         for thread in threads:
             thread.join(timeout=45)
         
         # 收集结果
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT stock FROM goods WHERE name='phone'")
-        final_stock = cursor.fetchone()[0]
-        conn.close()
+        final_stock = self.read_phone_stock(db_path)
         
         # 分析结果
         success_users = []
@@ -509,8 +427,7 @@ class ConcurrentPurchaseTester:
         print("="*60)
         
         # 设置测试数据库，库存设为10
-        db_path = os.path.join(project_root, "database", "test_concurrent_fixed_3.db")
-        self.setup_test_database(db_path)
+        db_path = self.setup_test_database("test_concurrent_fixed_3")
         
         # 加载脚本
         script_path = os.path.join(project_root, "scripts", "ecommerce.txt")
@@ -542,24 +459,21 @@ class ConcurrentPurchaseTester:
             thread.start()
         
         # 等待所有线程启动
-        time.sleep(3)
+        time.sleep(0.5)
         
         print("触发用户购买手机...")
         for user_id in user_sessions.keys():
             user_sessions[user_id].add_input("购买")
             user_sessions[user_id].add_input("手机")
             user_sessions[user_id].add_input("5")  # 每个用户买5台
+            user_sessions[user_id].add_input("退出")
         
         # 等待所有会话完成
         for thread in threads:
             thread.join(timeout=45)
         
         # 收集结果
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute("SELECT stock FROM goods WHERE name='phone'")
-        final_stock = cursor.fetchone()[0]
-        conn.close()
+        final_stock = self.read_phone_stock(db_path)
         
         # 分析结果
         success_users = []
@@ -0,0 +1,301 @@
+import os
+import sys
+import sqlite3
+import tempfile
+import threading
+import time
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, src_dir)
+
+from db_pool import ConnectionPool, PoolTimeoutError, get_pool, open_memory_db, close_memory_db, snapshot_db, restore_db
+
+class TestConnectionPool:
+    """SQLite连接池测试类"""
+
+    def __init__(self):
+        self.test_results = {}
+        self.temp_dir = tempfile.mkdtemp(prefix="dsl_pool_")
+
+    def create_db(self, name: str) -> str:
+        """创建带goods表的测试数据库"""
+        db_path = os.path.join(self.temp_dir, name)
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE goods (name TEXT PRIMARY KEY, stock INTEGER)")
+        conn.execute("INSERT INTO goods VALUES ('phone', 1000)")
+        conn.commit()
+        conn.close()
+        return db_path
+
+    def test_pragmas(self):
+        """测试连接初始化参数"""
+        print("\n测试连接初始化参数")
+
+        pool = ConnectionPool(self.create_db("pragmas.db"), size=2, busy_timeout_ms=3000)
+        with pool.connection() as conn:
+            journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            synchronous = conn.execute("PRAGMA synchronous").fetchone()[0]
+            busy_timeout = conn.execute("PRAGMA busy_timeout").fetchone()[0]
+        pool.close()
+
+        passed = journal_mode == "wal" and synchronous == 1 and busy_timeout == 3000
+        self.test_results["pragmas"] = {
+            "journal_mode": journal_mode,
+            "synchronous": synchronous,
+            "busy_timeout": busy_timeout,
+            "passed": passed
+        }
+        print(f"   journal_mode={journal_mode}, synchronous={synchronous}, busy_timeout={busy_timeout}")
+        return passed
+
+    def test_reentrant_checkout(self):
+        """测试同一线程重复借出得到同一连接"""
+        print("\n测试可重入借出")
+
+        pool = ConnectionPool(self.create_db("reentrant.db"), size=1)
+        first = pool.acquire()
+        second = pool.acquire(timeout=0.1)
+        same = first is second
+        pool.release(second)
+        in_use_after_inner = pool.stats()["in_use"]
+        pool.release(first)
+        stats = pool.stats()
+        pool.close()
+
+        passed = same and in_use_after_inner == 1 and stats["in_use"] == 0 and stats["idle"] == 1
+        self.test_results["reentrant_checkout"] = {"stats": stats, "passed": passed}
+        return passed
+
+    def test_release_from_other_thread(self):
+        """测试其他线程不能归还连接"""
+        print("\n测试线程归属检查")
+
+        pool = ConnectionPool(self.create_db("affinity.db"), size=1)
+        conn = pool.acquire()
+        errors = []
+
+        def release_elsewhere():
+            try:
+                pool.release(conn)
+            except RuntimeError as e:
+                errors.append(str(e))
+
+        thread = threading.Thread(target=release_elsewhere)
+        thread.start()
+        thread.join()
+        pool.release(conn)
+        pool.close()
+
+        passed = len(errors) == 1
+        self.test_results["release_from_other_thread"] = {"errors": errors, "passed": passed}
+        return passed
+
+    def test_bounded_wait_metrics(self):
+        """测试连接耗尽时等待并记录等待时间"""
+        print("\n测试有界等待与监控指标")
+
+        pool = ConnectionPool(self.create_db("bounded.db"), size=1)
+        holder_ready = threading.Event()
+
+        def hold_connection():
+            with pool.connection():
+                holder_ready.set()
+                time.sleep(0.2)
+
+        holder = threading.Thread(target=hold_connection)
+        holder.start()
+        holder_ready.wait()
+
+        with pool.connection():
+            pass
+        holder.join()
+
+        # 再次耗尽后，超时应抛出 PoolTimeoutError
+        timed_out = False
+        blocker = threading.Thread(target=hold_connection)
+        holder_ready.clear()
+        blocker.start()
+        holder_ready.wait()
+        try:
+            pool.acquire(timeout=0.01)
+        except PoolTimeoutError:
+            timed_out = True
+        blocker.join()
+
+        stats = pool.stats()
+        pool.close()
+
+        passed = (stats["created"] == 1 and stats["waits"] == 1 and
+                  stats["max_wait_ms"] >= 100 and stats["timeouts"] == 1 and timed_out)
+        self.test_results["bounded_wait_metrics"] = {"stats": stats, "passed": passed}
+        print(f"   指标: {stats}")
+        return passed
+
+    def test_concurrent_writers(self):
+        """测试多线程并发写入不出现 database is locked"""
+        print("\n测试并发写入")
+
+        pool = ConnectionPool(self.create_db("writers.db"), size=4)
+        errors = []
+
+        def buy_many():
+            for _ in range(50):
+                try:
+                    with pool.connection() as conn:
+                        conn.execute("UPDATE goods SET stock = stock - 1 WHERE name='phone' AND stock >= 1")
+                        conn.commit()
+                        conn.execute("SELECT stock FROM goods WHERE name='phone'").fetchone()
+                except sqlite3.Error as e:
+                    errors.append(str(e))
+
+        threads = [threading.Thread(target=buy_many) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        with pool.connection() as conn:
+            final_stock = conn.execute("SELECT stock FROM goods WHERE name='phone'").fetchone()[0]
+        stats = pool.stats()
+        pool.close()
+
+        passed = not errors and final_stock == 600 and stats["created"] <= 4
+        self.test_results["concurrent_writers"] = {
+            "errors": errors[:5],
+            "final_stock": final_stock,
+            "stats": stats,
+            "passed": passed
+        }
+        print(f"   最终库存: {final_stock}, 错误数: {len(errors)}")
+        return passed
+
+    def test_memory_database(self):
+        """测试命名内存数据库在连接池各连接间共享，并能从快照恢复"""
+        print("\n测试共享内存数据库")
+
+        uri = open_memory_db("pool_memory_test")
+        anchor = sqlite3.connect(uri, uri=True)
+        anchor.execute("CREATE TABLE goods (name TEXT PRIMARY KEY, stock INTEGER)")
+        anchor.execute("INSERT INTO goods VALUES ('phone', 10)")
+        anchor.commit()
+        anchor.close()
+        snapshot = snapshot_db(uri)
+
+        pool = get_pool(uri, size=2)
+        with pool.connection() as conn:
+            conn.execute("UPDATE goods SET stock = 0 WHERE name='phone'")
+            conn.commit()
+        seen = []
+
+        def reader():
+            with pool.connection() as conn:
+                seen.append(conn.execute("SELECT stock FROM goods WHERE name='phone'").fetchone()[0])
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        thread.join()
+
+        restore_db(uri, snapshot)
+        with pool.connection() as conn:
+            restored = conn.execute("SELECT stock FROM goods WHERE name='phone'").fetchone()[0]
+        close_memory_db(uri)
+
+        # 关闭后同名数据库重新打开是空的
+        reopened = open_memory_db("pool_memory_test")
+        check = sqlite3.connect(reopened, uri=True)
+        tables = check.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0]
+        check.close()
+        close_memory_db(reopened)
+
+        passed = seen == [0] and restored == 10 and tables == 0
+        self.test_results["memory_database"] = {
+            "seen": seen,
+            "restored": restored,
+            "tables_after_close": tables,
+            "passed": passed
+        }
+        return passed
+
+    def test_interpreter_releases_before_listen(self):
+        """测试解释器在数据库动作之后、等待用户输入之前就归还连接"""
+        print("\n测试等待输入时不占用连接")
+
+        from interpreter import DSLInterpreter
+
+        db_path = self.create_db("listen.db")
+        script = {"module": "shop", "steps": {
+            "welcome": {"actions": [
+                {"type": "DBExec", "query": "UPDATE goods SET stock = stock - 1 WHERE name='phone'"},
+                {"type": "ListenAssign", "variable": "quantity"},
+                {"type": "Exit"}
+            ]}
+        }}
+        pool = get_pool(db_path, size=1)
+        interpreter = DSLInterpreter(script, None, db_path)
+        seen = {}
+
+        def fake_input(prompt):
+            # 池里只有一个连接：等待输入时另一个线程应当能借到它
+            seen["in_use"] = pool.stats()["in_use"]
+            acquired = []
+
+            def other_user():
+                try:
+                    with pool.connection(timeout=0.5):
+                        acquired.append(True)
+                except PoolTimeoutError:
+                    acquired.append(False)
+
+            thread = threading.Thread(target=other_user)
+            thread.start()
+            thread.join()
+            seen["other_acquired"] = acquired == [True]
+            return "2"
+
+        interpreter.input_function = fake_input
+        interpreter.run()
+        pool.close()
+
+        passed = seen.get("in_use") == 0 and seen.get("other_acquired") is True
+        self.test_results["interpreter_releases_before_listen"] = {"seen": seen, "passed": passed}
+        print(f"   等待输入时: {seen}")
+        return passed
+
+    def run_all_tests(self):
+        """运行所有测试"""
+        print("开始连接池测试")
+
+        test_methods = [method for method in dir(self) if method.startswith('test_') and callable(getattr(self, method))]
+
+        for test_method in test_methods:
+            try:
+                passed = getattr(self, test_method)()
+                status = "通过" if passed else "失败"
+                print(f"   {status}: {test_method}")
+            except Exception as e:
+                print(f"   错误: {test_method} - {e}")
+                self.test_results[test_method] = {"error": str(e), "passed": False}
+
+        return self.test_results
+
+def main():
+    """主函数"""
+    tester = TestConnectionPool()
+    test_results = tester.run_all_tests()
+
+    passed_count = sum(1 for result in test_results.values() if result.get("passed", False))
+    total_count = len(test_results)
+
+    print(f"\n测试总结:")
+    print(f"   总测试数: {total_count}")
+    print(f"   通过数: {passed_count}")
+    print(f"   失败数: {total_count - passed_count}")
+
+    return passed_count == total_count
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
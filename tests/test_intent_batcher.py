@@ -0,0 +1,232 @@
+import os
+import sys
+import json
+import time
+import threading
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, src_dir)
+
+from intent_batcher import IntentBatcher, parse_intent_array
+from intent_cache import IntentCache
+from llm_client import ErrorReply, ZhipuAIClient
+from llm_usage import UsageTracker
+from stub_llm_server import StubLLMServer
+
+class BatchLLMClient:
+    """模拟模型的替身：批量提示按候选包含关系回答，可切换为返回乱码或错误"""
+
+    def __init__(self, delay=0.05, mode="json"):
+        self.delay = delay
+        self.mode = mode
+        self.prompts = []
+        self.single_calls = []
+        self.intent_cache = None
+        self.closed = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def answer(user_input, candidates):
+        for intent in candidates:
+            if intent in user_input:
+                return intent
+        return "unknown"
+
+    def complete(self, prompt, temperature=0.1, priority=None, contexts=None):
+        time.sleep(self.delay)
+        start = prompt.index("请求列表（JSON）：") + len("请求列表（JSON）：")
+        items = json.loads(prompt[start:prompt.index("分析要求")])
+        with self._lock:
+            self.prompts.append(items)
+        if self.mode == "garbage":
+            return "好的，以下是识别结果：挂号、体检"
+        if self.mode == "error":
+            return ErrorReply("网络错误：Connection refused")
+        intents = [self.answer(item["input"], item["candidates"]) for item in items]
+        return "```json\n" + json.dumps(intents, ensure_ascii=False) + "\n```"
+
+    def recognize_intent(self, user_input, candidate_intents, context=None):
+        time.sleep(self.delay)
+        with self._lock:
+            self.single_calls.append(user_input)
+        return self.answer(user_input, candidate_intents)
+
+    def generate_reply(self, user_input, context=None):
+        return "模拟回复"
+
+    def close(self):
+        self.closed = True
+
+def run_threads(count, target):
+    """同时启动 count 个线程执行 target(i)，返回按序号排列的结果"""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = target(i)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+CANDIDATES = ["挂号", "体检", "科普"]
+INPUTS = [f"{i}号用户想{CANDIDATES[i % 3]}" for i in range(24)]
+
+class TestIntentBatcher:
+    """意图识别微批处理测试类"""
+
+    def __init__(self):
+        self.test_results = {}
+
+    def test_batching(self):
+        """测试并发的意图识别合并成少量批量请求，结果分发给各调用方"""
+        print("\n测试微批处理")
+
+        upstream = BatchLLMClient(delay=0.05)
+        upstream.intent_cache = IntentCache()
+        batcher = IntentBatcher(upstream, max_batch=16, max_delay_ms=20)
+        results = run_threads(24, lambda i: batcher.recognize_intent(INPUTS[i], CANDIDATES))
+        # 结果已写入缓存，再次识别不经过批处理
+        cached = batcher.recognize_intent(INPUTS[0], list(reversed(CANDIDATES)))
+        stats = batcher.stats()
+        batcher.close()
+
+        expected = [CANDIDATES[i % 3] for i in range(24)]
+        passed = (results == expected and cached == "挂号" and len(upstream.prompts) <= 3
+                  and not upstream.single_calls and stats["requests"] == 24
+                  and stats["max_batch_size"] <= 16 and upstream.closed)
+        self.test_results["batching"] = {"llm_requests": len(upstream.prompts), "stats": stats, "passed": passed}
+        print(f"   24个并发识别，LLM请求: {len(upstream.prompts)}")
+        return passed
+
+    def test_duplicates_in_batch(self):
+        """测试批内规范化后相同的请求只占一个位置"""
+        print("\n测试批内去重")
+
+        upstream = BatchLLMClient(delay=0.05)
+        batcher = IntentBatcher(upstream, max_delay_ms=50)
+        inputs = ["我想挂号", "我想挂号！", "我要体检", " 我要体检"]
+        results = run_threads(4, lambda i: batcher.recognize_intent(inputs[i], CANDIDATES))
+        batcher.close()
+
+        passed = (results == ["挂号", "挂号", "体检", "体检"]
+                  and [len(items) for items in upstream.prompts] == [2])
+        self.test_results["duplicates_in_batch"] = {"prompts": upstream.prompts, "passed": passed}
+        return passed
+
+    def test_fallback(self):
+        """测试批量返回无法解析时逐条识别"""
+        print("\n测试解析失败回退")
+
+        upstream = BatchLLMClient(delay=0.05, mode="garbage")
+        batcher = IntentBatcher(upstream, max_delay_ms=30)
+        results = run_threads(6, lambda i: batcher.recognize_intent(INPUTS[i], CANDIDATES))
+        stats = batcher.stats()
+        batcher.close()
+
+        passed = (results == [CANDIDATES[i % 3] for i in range(6)] and stats["fallbacks"] >= 1
+                  and sorted(upstream.single_calls) == sorted(INPUTS[:6]))
+        self.test_results["fallback"] = {"stats": stats, "passed": passed}
+        return passed
+
+    def test_error_reply(self):
+        """测试服务出错时整批返回 unknown，不再逐条重发"""
+        print("\n测试服务错误")
+
+        upstream = BatchLLMClient(delay=0.05, mode="error")
+        batcher = IntentBatcher(upstream, max_delay_ms=30)
+        results = run_threads(4, lambda i: batcher.recognize_intent(INPUTS[i], CANDIDATES))
+        batcher.close()
+
+        passed = results == ["unknown"] * 4 and not upstream.single_calls
+        self.test_results["error_reply"] = {"results": results, "passed": passed}
+        return passed
+
+    def test_usage_charged_to_sessions(self):
+        """测试批量请求的用量分摊到各等待的会话，会话预算不会因批处理被绕过"""
+        print("\n测试批量用量分摊")
+
+        server = StubLLMServer(latency="fixed:0.05")
+        tracker = UsageTracker(session_token_budget=1)
+        client = ZhipuAIClient(api_key="test_key", base_url=server.url, usage_tracker=tracker)
+        batcher = IntentBatcher(client, max_delay_ms=50)
+        contexts = [{"session_id": f"s{i}", "script_module": "medical", "current_step": "welcome"}
+                    for i in range(4)]
+        results = run_threads(4, lambda i: batcher.recognize_intent(INPUTS[i], CANDIDATES, context=contexts[i]))
+        stats = batcher.stats()
+        batcher.close()
+        server.stop()
+
+        summary = tracker.summary()
+        session_tokens = [tracker.session_tokens(f"s{i}") for i in range(4)]
+        passed = (results == [CANDIDATES[i % 3] for i in range(4)] and stats["batches"] >= 1
+                  and all(tokens > 0 for tokens in session_tokens)
+                  and sum(session_tokens) == summary["total"]["total_tokens"]
+                  and "-" not in summary["by_session"]
+                  and all(tracker.over_budget(f"s{i}") for i in range(4)))
+        self.test_results["usage_charged_to_sessions"] = {"session_tokens": session_tokens, "stats": stats,
+                                                          "passed": passed}
+        print(f"   各会话用量: {session_tokens}")
+        return passed
+
+    def test_parse_intent_array(self):
+        """测试意图数组解析"""
+        print("\n测试意图数组解析")
+
+        checks = {
+            "plain": parse_intent_array('["挂号", "unknown"]', 2) == ["挂号", "unknown"],
+            "fenced": parse_intent_array('```json\n["体检"]\n```', 1) == ["体检"],
+            "wrong_length": parse_intent_array('["挂号"]', 2) is None,
+            "not_strings": parse_intent_array('[1, 2]', 2) is None,
+            "no_array": parse_intent_array("挂号", 1) is None,
+            "invalid_json": parse_intent_array("[挂号, 体检]", 2) is None,
+        }
+        passed = all(checks.values())
+        self.test_results["parse_intent_array"] = {"checks": checks, "passed": passed}
+        return passed
+
+    def run_all_tests(self):
+        """运行所有测试"""
+        print("开始意图识别微批处理测试")
+
+        test_methods = [method for method in dir(self) if method.startswith('test_') and callable(getattr(self, method))]
+
+        for test_method in test_methods:
+            try:
+                passed = getattr(self, test_method)()
+                status = "通过" if passed else "失败"
+                print(f"   {status}: {test_method}")
+            except Exception as e:
+                print(f"   错误: {test_method} - {e}")
+                self.test_results[test_method] = {"error": str(e), "passed": False}
+
+        return self.test_results
+
+def main():
+    """主函数"""
+    tester = TestIntentBatcher()
+    test_results = tester.run_all_tests()
+
+    passed_count = sum(1 for result in test_results.values() if result.get("passed", False))
+    total_count = len(test_results)
+
+    print(f"\n测试总结:")
+    print(f"   总测试数: {total_count}")
+    print(f"   通过数: {passed_count}")
+    print(f"   失败数: {total_count - passed_count}")
+
+    return passed_count == total_count
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,175 @@
+import os
+import sys
+import time
+import tempfile
+import threading
+from unittest.mock import patch
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, src_dir)
+
+from test_llm_stubs import MockResponse, MockRequests
+from intent_cache import IntentCache, normalize_input
+from llm_client import ZhipuAIClient
+
+class TestIntentCache:
+    """意图识别缓存测试类"""
+
+    def __init__(self):
+        self.test_results = {}
+        self.temp_dir = tempfile.mkdtemp(prefix="dsl_intent_cache_")
+
+    def test_normalized_key(self):
+        """测试全角、空白和句末标点不影响命中，候选集合顺序无关"""
+        print("\n测试键规范化")
+
+        cache = IntentCache()
+        cache.put("我想挂号", ["挂号", "体检"], "挂号")
+        checks = {
+            "punctuation": cache.get("我想挂号！", ["挂号", "体检"]) == "挂号",
+            "whitespace": cache.get(" 我想 挂号 ", ["体检", "挂号"]) == "挂号",
+            "fullwidth": normalize_input("ＡＢＣ？") == "abc",
+            "other_candidates": cache.get("我想挂号", ["挂号", "科普"]) is None,
+        }
+        stats = cache.stats()
+        passed = all(checks.values()) and stats["hits"] == 2 and stats["misses"] == 1
+        self.test_results["normalized_key"] = {"checks": checks, "stats": stats, "passed": passed}
+        return passed
+
+    def test_ttl_and_lru(self):
+        """测试过期和按最近使用淘汰"""
+        print("\n测试过期与LRU淘汰")
+
+        expiring = IntentCache(ttl=0.05)
+        expiring.put("买手机", ["购买"], "购买")
+        time.sleep(0.1)
+        expired = expiring.get("买手机", ["购买"]) is None and expiring.stats()["expirations"] == 1
+
+        cache = IntentCache(max_entries=2, ttl=None)
+        cache.put("a", ["x"], "x")
+        cache.put("b", ["x"], "x")
+        cache.get("a", ["x"])           # a 变为最近使用
+        cache.put("c", ["x"], "x")      # 淘汰 b
+        lru = (cache.get("a", ["x"]) == "x" and cache.get("b", ["x"]) is None
+               and cache.get("c", ["x"]) == "x" and cache.stats()["evictions"] == 1)
+
+        passed = expired and lru
+        self.test_results["ttl_and_lru"] = {"expired": expired, "lru": lru, "passed": passed}
+        return passed
+
+    def test_persistence(self):
+        """测试保存后重新加载，过期项和损坏文件被忽略"""
+        print("\n测试持久化")
+
+        path = os.path.join(self.temp_dir, "intents.json")
+        cache = IntentCache(ttl=None, persist_path=path)
+        cache.put("查一下退款", ["退款", "投诉"], "退款")
+        cache.put("我要投诉", ["退款", "投诉"], "投诉")
+        cache._entries[("过期", ("退款",))] = ("退款", time.time() - 1)
+        saved = cache.save()
+
+        restored = IntentCache(persist_path=path)
+        checks = {
+            "saved": saved == 2,
+            "restored": restored.stats()["entries"] == 2,
+            "hit": restored.get("查一下退款。", ["投诉", "退款"]) == "退款",
+        }
+
+        broken = os.path.join(self.temp_dir, "broken.json")
+        with open(broken, "w", encoding="utf-8") as f:
+            f.write("{not json")
+        checks["broken_file"] = IntentCache(persist_path=broken).stats()["entries"] == 0
+
+        passed = all(checks.values())
+        self.test_results["persistence"] = {"checks": checks, "passed": passed}
+        return passed
+
+    def test_thread_safety(self):
+        """测试多线程并发读写"""
+        print("\n测试线程安全")
+
+        cache = IntentCache(max_entries=50)
+        errors = []
+
+        def worker(worker_id):
+            try:
+                for i in range(500):
+                    text = f"输入{(worker_id + i) % 80}"
+                    if cache.get(text, ["x", "y"]) is None:
+                        cache.put(text, ["x", "y"], "x")
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = cache.stats()
+        passed = not errors and stats["entries"] <= 50 and stats["hits"] + stats["misses"] == 4000
+        self.test_results["thread_safety"] = {"stats": stats, "errors": len(errors), "passed": passed}
+        return passed
+
+    def test_client_uses_cache(self):
+        """测试客户端命中缓存时不调用API，unknown 结果不缓存"""
+        print("\n测试客户端集成")
+
+        def reply(content):
+            return MockResponse({"choices": [{"message": {"content": content}}]})
+
+        mock_requests = MockRequests()
+        mock_requests.set_responses([reply("购买"), reply("unknown"), reply("unknown")])
+        with patch('llm_client.requests', mock_requests):
+            client = ZhipuAIClient(api_key="test_key", intent_cache=IntentCache())
+            results = [
+                client.recognize_intent("我要买手机", ["购买", "退款"]),
+                client.recognize_intent("我要买手机！", ["购买", "退款"]),
+                client.recognize_intent("今天天气", ["购买", "退款"]),
+                client.recognize_intent("今天天气", ["购买", "退款"]),
+            ]
+        api_calls = len([call for call in mock_requests.call_history if call["method"] == "POST"])
+
+        passed = results == ["购买", "购买", "unknown", "unknown"] and api_calls == 3
+        self.test_results["client_uses_cache"] = {"results": results, "api_calls": api_calls, "passed": passed}
+        print(f"   API调用次数: {api_calls}")
+        return passed
+
+    def run_all_tests(self):
+        """运行所有测试"""
+        print("开始意图缓存测试")
+
+        test_methods = [method for method in dir(self) if method.startswith('test_') and callable(getattr(self, method))]
+
+        for test_method in test_methods:
+            try:
+                passed = getattr(self, test_method)()
+                status = "通过" if passed else "失败"
+                print(f"   {status}: {test_method}")
+            except Exception as e:
+                print(f"   错误: {test_method} - {e}")
+                self.test_results[test_method] = {"error": str(e), "passed": False}
+
+        return self.test_results
+
+def main():
+    """主函数"""
+    tester = TestIntentCache()
+    test_results = tester.run_all_tests()
+
+    passed_count = sum(1 for result in test_results.values() if result.get("passed", False))
+    total_count = len(test_results)
+
+    print(f"\n测试总结:")
+    print(f"   总测试数: {total_count}")
+    print(f"   通过数: {passed_count}")
+    print(f"   失败数: {total_count - passed_count}")
+
+    return passed_count == total_count
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -4,6 +4,8 @@ import json
 import io
 import contextlib
 import subprocess
+import sqlite3
+import tempfile
 
 TEST_RESULTS_DIR = r"D:\medical_dsl\test_results"
 os.makedirs(TEST_RESULTS_DIR, exist_ok=True)
@@ -32,7 +34,7 @@ def init_database():
         init_db_path = os.path.join(database_dir, "init_db.py")
         if os.path.exists(init_db_path):
             print(f"运行数据库初始化脚本: {init_db_path}")
-            result = subprocess.run([sys.executable, init_db_path], 
+            result = subprocess.run([sys.executable, init_db_path, "--reset"], 
                                   capture_output=True, text=True, cwd=database_dir)
             if result.returncode == 0:
                 print("数据库初始化成功")
@@ -274,6 +276,201 @@ class TestInterpreter:
         
         return result
     
+    def test_db_exec_result_capture(self):
+        """测试DBExec把影响行数和RETURNING返回值存入变量"""
+        print("\n测试DBExec结果捕获")
+        
+        db_path = os.path.join(tempfile.mkdtemp(prefix="dsl_exec_"), "exec.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE goods (name TEXT PRIMARY KEY, stock INTEGER)")
+        conn.execute("INSERT INTO goods VALUES ('phone', 5)")
+        conn.commit()
+        conn.close()
+        
+        script_ast = {
+            "module": "ecommerce",
+            "steps": {
+                "welcome": {
+                    "actions": [
+                        {"type": "ListenAssign", "variable": "quantity"},
+                        {"type": "DBExec", "query": "UPDATE goods SET stock = stock - {quantity} WHERE name='phone' AND stock >= {quantity}", "variable": "updated"},
+                        {"type": "DBExec", "query": "UPDATE goods SET stock = stock - {quantity} WHERE name='phone' AND stock >= {quantity} RETURNING stock", "variable": "remaining"},
+                        {"type": "DBExec", "query": "UPDATE goods SET stock = stock - {quantity} WHERE name='phone' AND stock >= {quantity}", "variable": "failed"},
+                        {"type": "Exit"}
+                    ]
+                }
+            }
+        }
+        interpreter = DSLInterpreter(script_ast, None, db_path)
+        interpreter.input_function = self.simulate_user_inputs(["2"])
+        output = self.capture_output(interpreter.run)
+        
+        result = {
+            "test_name": "DBExec结果捕获测试",
+            "output_lines": output.split('\n'),
+            "variables": interpreter.variables
+        }
+        result["passed"] = (
+            interpreter.variables.get("updated") == 1 and
+            interpreter.variables.get("remaining") == 1 and
+            interpreter.variables.get("failed") == 0
+        )
+        
+        return result
+    
+    def test_db_exec_failure_clears_result(self):
+        """测试DBExec失败时变量按未影响任何行处理，而不是保留上一条语句的结果"""
+        print("\n测试DBExec失败结果")
+        
+        db_path = os.path.join(tempfile.mkdtemp(prefix="dsl_exec_"), "exec_fail.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE goods (name TEXT PRIMARY KEY, stock INTEGER)")
+        conn.execute("INSERT INTO goods VALUES ('phone', 5)")
+        # 第二次扣减时由触发器中止，模拟约束失败
+        conn.execute("CREATE TRIGGER guard BEFORE UPDATE ON goods WHEN NEW.stock < 3 "
+                     "BEGIN SELECT RAISE(ABORT, 'stock guard'); END")
+        conn.commit()
+        conn.close()
+        
+        script_ast = {
+            "module": "ecommerce",
+            "steps": {
+                "welcome": {
+                    "actions": [
+                        {"type": "DBExec", "query": "UPDATE goods SET stock = stock - 2 WHERE name='phone' AND stock >= 2", "variable": "updated"},
+                        {"type": "DBExec", "query": "UPDATE goods SET stock = stock - 2 WHERE name='phone' AND stock >= 2", "variable": "updated"},
+                        {"type": "If", "condition": {"left": "updated", "operator": "==", "right": 0}, "target": "failed"},
+                        {"type": "Exit"}
+                    ]
+                },
+                "failed": {
+                    "actions": [
+                        {"type": "Speak", "message": "购买失败"},
+                        {"type": "Exit"}
+                    ]
+                }
+            }
+        }
+        interpreter = DSLInterpreter(script_ast, None, db_path)
+        output = self.capture_output(interpreter.run)
+        
+        result = {
+            "test_name": "DBExec失败结果测试",
+            "output_lines": output.split('\n'),
+            "variables": interpreter.variables
+        }
+        result["passed"] = (
+            interpreter.variables.get("updated") == 0 and
+            interpreter.last_exec_rowcount == 0 and
+            "购买失败" in output
+        )
+        
+        return result
+    
+    def test_db_query_projection(self):
+        """测试一次DBQuery把多列分别绑定到多个变量"""
+        print("\n测试多列投影")
+        
+        db_path = os.path.join(tempfile.mkdtemp(prefix="dsl_projection_"), "projection.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE orders (id TEXT PRIMARY KEY, status TEXT, amount INTEGER)")
+        conn.execute("INSERT INTO orders VALUES ('1001', 'shipped', 2999)")
+        conn.commit()
+        conn.close()
+        
+        script_ast = {
+            "module": "ecommerce",
+            "steps": {
+                "welcome": {
+                    "actions": [
+                        {"type": "DBQuery", "query": "SELECT status, amount FROM orders WHERE id='1001'", "variable": ["st", "amount"], "target": "missing"}
+                    ]
+                },
+                "missing": {
+                    "actions": [
+                        {"type": "DBQuery", "query": "SELECT status, amount FROM orders WHERE id='9999'", "variable": ["st2", "amount2"], "target": "done"}
+                    ]
+                },
+                "done": {
+                    "actions": [
+                        {"type": "Speak", "message": "订单状态{st}，金额{amount}"},
+                        {"type": "Exit"}
+                    ]
+                }
+            }
+        }
+        interpreter = DSLInterpreter(script_ast, None, db_path)
+        output = self.capture_output(interpreter.run)
+        
+        result = {
+            "test_name": "多列投影测试",
+            "output_lines": output.split('\n'),
+            "variables": interpreter.variables
+        }
+        result["passed"] = (
+            interpreter.variables.get("st") == "shipped" and
+            interpreter.variables.get("amount") == 2999 and
+            interpreter.variables.get("st2") is None and
+            "amount2" in interpreter.variables and interpreter.variables["amount2"] is None and
+            "订单状态shipped，金额2999" in output
+        )
+        
+        return result
+    
+    def test_db_query_rows_foreach(self):
+        """测试多行DBQuery按上限分批读取，并用ForEach逐行处理"""
+        print("\n测试多行查询与ForEach")
+        
+        db_path = os.path.join(tempfile.mkdtemp(prefix="dsl_rows_"), "rows.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE orders (id TEXT PRIMARY KEY, status TEXT)")
+        conn.executemany("INSERT INTO orders VALUES (?, ?)",
+                         [(str(1000 + i), "shipped" if i % 2 else "ordered") for i in range(500)])
+        conn.commit()
+        conn.close()
+        
+        script_ast = {
+            "module": "ecommerce",
+            "steps": {
+                "welcome": {
+                    "actions": [
+                        {"type": "DBQuery", "query": "SELECT id, status FROM orders ORDER BY id", "variable": "orders",
+                         "target": "listOrders", "multi_row": True, "max_rows": 3}
+                    ]
+                },
+                "listOrders": {
+                    "actions": [
+                        {"type": "ForEach", "item": "order", "source": "orders", "actions": [
+                            {"type": "Speak", "message": "订单{order.id}：{order.status}"}
+                        ]},
+                        {"type": "DBQuery", "query": "SELECT id FROM orders WHERE id='none'", "variable": "empty",
+                         "target": "done", "multi_row": True}
+                    ]
+                },
+                "done": {
+                    "actions": [{"type": "Exit"}]
+                }
+            }
+        }
+        interpreter = DSLInterpreter(script_ast, None, db_path)
+        output = self.capture_output(interpreter.run)
+        
+        orders = interpreter.variables.get("orders")
+        result = {
+            "test_name": "多行查询与ForEach测试",
+            "output_lines": output.split('\n'),
+            "orders": orders
+        }
+        result["passed"] = (
+            orders == [{"id": "1000", "status": "ordered"}, {"id": "1001", "status": "shipped"},
+                       {"id": "1002", "status": "ordered"}] and
+            "订单1000：ordered" in output and "订单1002：ordered" in output and
+            "只保留前 3 行" in output and
+            interpreter.variables.get("empty") == []
+        )
+        
+        return result
+    
     def run_all_tests(self):
         """运行所有测试"""
         print("开始DSL解释器测试")
@@ -284,7 +481,11 @@ class TestInterpreter:
             self.test_ai_reply_flow,
             self.test_ecommerce_flow,
             self.test_fallback_flow,
-            self.test_complaint_flow
+            self.test_complaint_flow,
+            self.test_db_exec_result_capture,
+            self.test_db_exec_failure_clears_result,
+            self.test_db_query_projection,
+            self.test_db_query_rows_foreach
         ]
         
         for test_func in tests:
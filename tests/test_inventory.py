@@ -0,0 +1,247 @@
+import os
+import sys
+import json
+import sqlite3
+import tempfile
+import threading
+import io
+import contextlib
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, src_dir)
+
+from inventory import InventoryEngine, default_journal_path
+from interpreter import DSLInterpreter
+from query_cache import QueryCache
+
+class TestInventoryEngine:
+    """内存库存引擎测试类"""
+
+    def __init__(self):
+        self.test_results = {}
+        self.temp_dir = tempfile.mkdtemp(prefix="dsl_inventory_")
+
+    def create_db(self, name: str, stock: int) -> str:
+        """创建带goods表的测试数据库"""
+        db_path = os.path.join(self.temp_dir, name)
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE goods (name TEXT PRIMARY KEY, stock INTEGER)")
+        conn.executemany("INSERT INTO goods VALUES (?, ?)", [("phone", stock), ("pen", stock)])
+        conn.commit()
+        conn.close()
+        return db_path
+
+    def read_stock(self, db_path: str, name: str = "phone") -> int:
+        conn = sqlite3.connect(db_path)
+        stock = conn.execute("SELECT stock FROM goods WHERE name=?", (name,)).fetchone()[0]
+        conn.close()
+        return stock
+
+    def test_concurrent_reserve(self):
+        """测试并发预留不会超卖，关闭后库存写回数据库"""
+        print("\n测试并发预留")
+
+        db_path = self.create_db("concurrent.db", 100)
+        engine = InventoryEngine(db_path, skus=["phone"], flush_interval_ms=5)
+        results = []
+        lock = threading.Lock()
+
+        def buyer():
+            ok = engine.reserve("phone", 3)
+            with lock:
+                results.append(ok)
+
+        threads = [threading.Thread(target=buyer) for _ in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        engine.release("phone", 1)
+        engine.close()
+
+        stats = engine.stats()
+        final_stock = self.read_stock(db_path)
+        passed = (results.count(True) == 33 and final_stock == 2 and
+                  stats["applied_seq"] == stats["journal_seq"] == 34 and
+                  os.path.getsize(engine.journal_path) == 0)
+        self.test_results["concurrent_reserve"] = {
+            "successes": results.count(True),
+            "final_stock": final_stock,
+            "stats": stats,
+            "passed": passed
+        }
+        return passed
+
+    def test_journal_replay(self):
+        """测试崩溃后从日志重放尚未写回的变更"""
+        print("\n测试日志重放")
+
+        db_path = self.create_db("replay.db", 10)
+        journal_path = db_path + ".inventory-journal"
+        engine = InventoryEngine(db_path, skus=["phone"], flush_interval_ms=60000)
+        engine.reserve("phone", 4)
+        engine.flush()
+        # 已写回的记录之后再写两条，然后模拟崩溃：不刷新、不关闭
+        engine.reserve("phone", 2)
+        engine.release("phone", 1)
+        engine._stop.set()
+        with open(journal_path, "a", encoding="utf-8") as f:
+            f.write('{"seq": 99, "sku": "pho')  # 崩溃时写了一半的记录
+        stock_before_replay = self.read_stock(db_path)
+
+        recovered = InventoryEngine(db_path, skus=["phone"], flush_interval_ms=60000)
+        in_memory = recovered.stock("phone")
+        recovered.close()
+
+        final_stock = self.read_stock(db_path)
+        passed = stock_before_replay == 6 and in_memory == 5 and final_stock == 5
+        self.test_results["journal_replay"] = {
+            "stock_before_replay": stock_before_replay,
+            "in_memory": in_memory,
+            "final_stock": final_stock,
+            "passed": passed
+        }
+        return passed
+
+    def test_dsl_reserve_action(self):
+        """测试Reserve/Release动作：引擎管理的商品走内存计数，其他商品回退到数据库更新"""
+        print("\n测试Reserve动作")
+
+        db_path = self.create_db("dsl.db", 5)
+        engine = InventoryEngine(db_path, skus=["phone"], flush_interval_ms=60000)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            interpreter = DSLInterpreter({"module": "ecommerce", "steps": {}}, None, db_path, inventory=engine)
+            interpreter.variables["quantity"] = "4"
+            interpreter._execute_action({"type": "Reserve", "sku": "phone", "quantity": "quantity", "variable": "first"})
+            interpreter._execute_action({"type": "Reserve", "sku": "phone", "quantity": "quantity", "variable": "second"})
+            interpreter._execute_action({"type": "Release", "sku": "phone", "quantity": 2})
+            interpreter._execute_action({"type": "Reserve", "sku": "pen", "quantity": 5, "variable": "pen"})
+            interpreter._execute_action({"type": "Reserve", "sku": "pen", "quantity": "missing", "variable": "bad"})
+            interpreter._release_db_conn()
+        engine_stock = engine.stock("phone")
+        engine.close()
+
+        variables = interpreter.variables
+        passed = (variables["first"] == 1 and variables["second"] == 0 and variables["pen"] == 1 and
+                  variables["bad"] == 0 and engine_stock == 3 and
+                  self.read_stock(db_path) == 3 and self.read_stock(db_path, "pen") == 0)
+        self.test_results["dsl_reserve_action"] = {
+            "variables": {k: variables[k] for k in ("first", "second", "pen", "bad")},
+            "engine_stock": engine_stock,
+            "passed": passed
+        }
+        return passed
+
+    def test_reserve_fallback_failure(self):
+        """测试数据库回退的条件更新失败时预留报告失败，而不是沿用上一次的成功结果"""
+        print("\n测试Reserve回退更新失败")
+
+        db_path = self.create_db("reserve_fail.db", 5)
+        conn = sqlite3.connect(db_path)
+        # 库存低于 3 的更新由触发器中止，模拟锁冲突或约束失败
+        conn.execute("CREATE TRIGGER guard BEFORE UPDATE ON goods WHEN NEW.stock < 3 "
+                     "BEGIN SELECT RAISE(ABORT, 'stock guard'); END")
+        conn.commit()
+        conn.close()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            interpreter = DSLInterpreter({"module": "ecommerce", "steps": {}}, None, db_path)
+            interpreter._execute_action({"type": "Reserve", "sku": "phone", "quantity": 2, "variable": "first"})
+            interpreter._execute_action({"type": "Reserve", "sku": "phone", "quantity": 2, "variable": "second"})
+            interpreter._release_db_conn()
+
+        variables = interpreter.variables
+        passed = variables["first"] == 1 and variables["second"] == 0 and self.read_stock(db_path) == 3
+        self.test_results["reserve_fallback_failure"] = {
+            "variables": {k: variables[k] for k in ("first", "second")},
+            "stock": self.read_stock(db_path),
+            "passed": passed
+        }
+        return passed
+
+    def test_flush_invalidates_query_cache(self):
+        """测试写回后查询缓存中的 goods 结果失效，DBQuery 读到写回后的库存"""
+        print("\n测试写回使查询缓存失效")
+
+        db_path = self.create_db("cached.db", 5)
+        cache = QueryCache(default_ttl=60)
+        engine = InventoryEngine(db_path, skus=["phone"], flush_interval_ms=60000,
+                                 on_flush=cache.invalidate_tables)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            interpreter = DSLInterpreter({"module": "ecommerce", "steps": {}}, None, db_path,
+                                         query_cache=cache, inventory=engine)
+            query = "SELECT stock FROM goods WHERE name='phone'"
+            interpreter._execute_db_query(query, "before", "next")
+            interpreter._execute_action({"type": "Reserve", "sku": "phone", "quantity": 2, "variable": "ok"})
+            engine.flush()
+            interpreter._execute_db_query(query, "after", "next")
+            interpreter._release_db_conn()
+        engine.close()
+
+        variables = interpreter.variables
+        passed = (variables["before"] == 5 and variables["ok"] == 1 and variables["after"] == 3
+                  and cache.stats()["invalidations"] >= 1)
+        self.test_results["flush_invalidates_query_cache"] = {
+            "before": variables["before"], "after": variables["after"], "passed": passed
+        }
+        return passed
+
+    def test_journal_path(self):
+        """测试日志路径：文件 URI 取文件名，内存数据库必须显式指定"""
+        print("\n测试日志路径")
+
+        checks = {
+            "file": default_journal_path("data/shop.db") == "data/shop.db.inventory-journal",
+            "uri": default_journal_path("file:data/shop.db?mode=rwc") == "data/shop.db.inventory-journal",
+        }
+        for name, db_path in (("memdb", "file:/shop?vfs=memdb"), ("memory", ":memory:"),
+                              ("mode_memory", "file:shop?mode=memory&cache=shared")):
+            try:
+                default_journal_path(db_path)
+                checks[name] = False
+            except ValueError:
+                checks[name] = True
+        passed = all(checks.values())
+        self.test_results["journal_path"] = {"checks": checks, "passed": passed}
+        return passed
+
+    def run_all_tests(self):
+        """运行所有测试"""
+        print("开始库存引擎测试")
+
+        test_methods = [method for method in dir(self) if method.startswith('test_') and callable(getattr(self, method))]
+
+        for test_method in test_methods:
+            try:
+                passed = getattr(self, test_method)()
+                status = "通过" if passed else "失败"
+                print(f"   {status}: {test_method}")
+            except Exception as e:
+                print(f"   错误: {test_method} - {e}")
+                self.test_results[test_method] = {"error": str(e), "passed": False}
+
+        return self.test_results
+
+def main():
+    """主函数"""
+    tester = TestInventoryEngine()
+    test_results = tester.run_all_tests()
+
+    passed_count = sum(1 for result in test_results.values() if result.get("passed", False))
+    total_count = len(test_results)
+
+    print(f"\n测试总结:")
+    print(f"   总测试数: {total_count}")
+    print(f"   通过数: {passed_count}")
+    print(f"   失败数: {total_count - passed_count}")
+
+    return passed_count == total_count
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,288 @@
+import io
+import os
+import sys
+import threading
+import contextlib
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, project_root)
+sys.path.insert(0, src_dir)
+
+from llm_backends import (LLMBackend, OpenAICompatibleClient, RuleBasedBackend, RoutingBackend,
+                          build_backend, http_clients, DEFAULT_RULE_REPLY)
+from llm_client import ZhipuAIClient
+from intent_batcher import IntentBatcher
+from dsl_parser import load_script_from_file
+from interpreter import DSLInterpreter
+from stub_llm_server import StubLLMServer, DEFAULT_REPLY
+from llm_usage import UsageTracker
+from rate_limiter import LLMRateLimiter
+
+class ClosingBackend(RuleBasedBackend):
+    """记录是否被关闭的规则后端"""
+
+    def __init__(self):
+        super().__init__()
+        self.closed = 0
+
+    def close(self):
+        self.closed += 1
+
+class DownBackend(RuleBasedBackend):
+    """熔断中的后端"""
+
+    available = False
+
+class TestLLMBackends:
+    """LLM后端接口测试类"""
+
+    def __init__(self):
+        self.test_results = {}
+
+    def test_protocol(self):
+        """测试各后端都满足 LLMBackend 接口"""
+        print("\n测试后端接口")
+
+        zhipu = ZhipuAIClient(api_key="test_key")
+        rules = RuleBasedBackend()
+        backends = [zhipu, OpenAICompatibleClient(), rules, RoutingBackend(rules, zhipu)]
+        passed = all(isinstance(backend, LLMBackend) for backend in backends) and not isinstance(object(), LLMBackend)
+        self.test_results["protocol"] = {"passed": passed}
+        return passed
+
+    def test_openai_compatible(self):
+        """测试 OpenAI 兼容客户端：地址补全、模型名、无密钥时的占位值，流式回复"""
+        print("\n测试OpenAI兼容后端")
+
+        server = StubLLMServer(token_delay=0.001)
+        previous = {name: os.environ.pop(name, None) for name in ("OPENAI_API_KEY", "OPENAI_MODEL")}
+        try:
+            client = OpenAICompatibleClient(base_url=server.openai_base_url + "/", model="local-7b")
+            explicit = OpenAICompatibleClient(base_url=server.openai_base_url + "/chat/completions")
+        finally:
+            for name, value in previous.items():
+                if value is not None:
+                    os.environ[name] = value
+        intent = client.recognize_intent("我想预约挂号", ["挂号", "体检"])
+        reply = client.generate_reply("头疼怎么办", {"script_module": "medical"})
+        deltas = []
+        streamed = client.stream_reply("头疼怎么办", {"script_module": "medical"}, deltas.append)
+        stats = server.stats()
+        client.close()
+        explicit.close()
+        server.stop()
+
+        passed = (client.base_url == server.openai_base_url + "/chat/completions" == explicit.base_url
+                  and client.model == "local-7b" and client.api_key == "EMPTY"
+                  and intent == "挂号" and reply == streamed == DEFAULT_REPLY and len(deltas) > 1
+                  and stats["ok"] == 3)
+        self.test_results["openai_compatible"] = {"base_url": client.base_url, "passed": passed}
+        return passed
+
+    def test_rule_based(self):
+        """测试规则后端：本地匹配候选意图，回复按模块固定"""
+        print("\n测试规则后端")
+
+        backend = RuleBasedBackend(replies={"medical": "请到导诊台咨询。"})
+        deltas = []
+        checks = {
+            "keyword": backend.recognize_intent("我想预约挂号", ["挂号", "体检"]) == "挂号",
+            "unknown": backend.recognize_intent("今天天气怎么样", ["挂号", "体检"]) == "unknown",
+            "longest": backend.recognize_intent("我买的手机要退货", ["买", "退货"]) == "退货",
+            "reply": backend.generate_reply("头疼", {"script_module": "Medical"}) == "请到导诊台咨询。",
+            "default_reply": backend.generate_reply("你好") == DEFAULT_RULE_REPLY,
+            "stream": backend.stream_reply("头疼", {"script_module": "medical"}, deltas.append) == "请到导诊台咨询。"
+                      and deltas == ["请到导诊台咨询。"],
+        }
+        passed = all(checks.values())
+        self.test_results["rule_based"] = {"checks": checks, "passed": passed}
+        return passed
+
+    def test_routing(self):
+        """测试意图识别和回复生成分派到不同后端"""
+        print("\n测试路由后端")
+
+        server = StubLLMServer(token_delay=0.001)
+        hosted = ZhipuAIClient(api_key="test_key", base_url=server.url)
+        local = ClosingBackend()
+        backend = RoutingBackend(local, hosted)
+        intent = backend.recognize_intent("我要体检", ["挂号", "体检"])
+        reply = backend.generate_reply("头疼怎么办", {"script_module": "medical"})
+        streamed = backend.stream_reply("头疼怎么办", {"script_module": "medical"})
+        sent = server.stats()["ok"]
+
+        # 批量意图识别交给规则后端：返回空结果，逐条回退后仍不经过托管服务
+        batcher = IntentBatcher(backend, max_delay_ms=20)
+        batched = batcher.recognize_intent("想做个体检", ["挂号", "体检"])
+        batcher.close()
+        after_batch = server.stats()["ok"]
+        server.stop()
+
+        passed = (intent == "体检" and reply == streamed == DEFAULT_REPLY and sent == 2
+                  and batched == "体检" and after_batch == 2 and local.closed == 1
+                  and backend.available and backend.base_url == server.url
+                  and http_clients(backend) == [hosted])
+        self.test_results["routing"] = {"sent": sent, "passed": passed}
+        return passed
+
+    def test_routing_availability(self):
+        """测试路由后端按调用类型判断可用性：一端熔断只影响该类调用"""
+        print("\n测试路由后端的可用性")
+
+        intent_down = RoutingBackend(DownBackend(), RuleBasedBackend())
+        reply_down = RoutingBackend(RuleBasedBackend(), DownBackend())
+        script_ast = load_script_from_file(os.path.join(project_root, "scripts", "medical.txt"))
+        checks = {}
+        for name, backend in (("intent_down", intent_down), ("reply_down", reply_down)):
+            # 经意图批处理器包装后仍按调用类型判断
+            batcher = IntentBatcher(backend, max_delay_ms=20)
+            interpreter = DSLInterpreter(script_ast, batcher)
+            checks[name] = (backend.available, interpreter._llm_available("intent"),
+                            interpreter._llm_available("reply"))
+            batcher.close()
+
+        passed = (checks["intent_down"] == (True, False, True)
+                  and checks["reply_down"] == (True, True, False))
+        self.test_results["routing_availability"] = {"checks": checks, "passed": passed}
+        return passed
+
+    def test_build_backend(self):
+        """测试按配置创建后端"""
+        print("\n测试按配置创建后端")
+
+        single = build_backend("zhipu", "zhipu", options={"zhipu": {"base_url": "http://localhost:1/x"}})
+        routed = build_backend("openai", "zhipu", options={"openai": {"base_url": "http://localhost:2/v1",
+                                                                       "model": "local-7b"}})
+        rules = build_backend("rules", "rules")
+
+        previous = {name: os.environ.get(name) for name in ("LLM_INTENT_BACKEND", "LLM_REPLY_BACKEND")}
+        os.environ["LLM_INTENT_BACKEND"] = "rules"
+        os.environ["LLM_REPLY_BACKEND"] = "zhipu"
+        try:
+            from_env = build_backend()
+        finally:
+            for name, value in previous.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+        try:
+            build_backend("unknown", "zhipu")
+            rejected = False
+        except ValueError:
+            rejected = True
+
+        passed = (isinstance(single, ZhipuAIClient) and single.base_url == "http://localhost:1/x"
+                  and isinstance(routed, RoutingBackend)
+                  and isinstance(routed.intent_backend, OpenAICompatibleClient)
+                  and routed.intent_backend.base_url == "http://localhost:2/v1/chat/completions"
+                  and routed.intent_backend.model == "local-7b"
+                  and type(routed.reply_backend) is ZhipuAIClient
+                  and len(http_clients(routed)) == 2 and http_clients(rules) == []
+                  and isinstance(from_env, RoutingBackend) and isinstance(from_env.intent_backend, RuleBasedBackend)
+                  and rejected)
+        self.test_results["build_backend"] = {"passed": passed}
+        return passed
+
+    def test_interpreter_routing(self):
+        """测试解释器经路由后端运行：意图在本地识别，只有 AIReply 请求托管服务"""
+        print("\n测试解释器使用路由后端")
+
+        server = StubLLMServer(token_delay=0.001)
+        backend = RoutingBackend(RuleBasedBackend(), ZhipuAIClient(api_key="test_key", base_url=server.url))
+        script_ast = load_script_from_file(os.path.join(project_root, "scripts", "medical.txt"))
+        interpreter = DSLInterpreter(script_ast, backend)
+        inputs = iter(["今天天气怎么样", "科普", "自由提问", "我这两天老是咳嗽", "退出", "退出"])
+        interpreter.input_function = lambda prompt=None: next(inputs)
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            interpreter.run()
+        stats = server.stats()
+        backend.close()
+        server.stop()
+
+        text = output.getvalue()
+        passed = ("我不太明白您的意思" in text and DEFAULT_REPLY in text and stats["ok"] == 1
+                  and interpreter.intent_stats.get("llm") == 1)
+        self.test_results["interpreter_routing"] = {"intent_stats": interpreter.intent_stats, "passed": passed}
+        return passed
+
+    def test_gui_shared_backend(self):
+        """测试多用户界面按配置创建共享后端，限流、用量和熔断只挂在发HTTP请求的客户端上"""
+        print("\n测试多用户界面的共享后端")
+
+        from src.gui_multi_user import MultiUserDSLChatbotGUI
+        # 界面按包路径导入，后端类型要用同一份模块检查
+        from src import llm_backends as gui_backends
+
+        server = StubLLMServer(token_delay=0.001)
+        # 只测试共享客户端的创建，不创建窗口
+        gui = MultiUserDSLChatbotGUI.__new__(MultiUserDSLChatbotGUI)
+        gui.llm_client = None
+        gui.llm_client_checked = False
+        gui.llm_client_lock = threading.Lock()
+        gui.intent_batch_window_ms = None
+        gui.rate_limiter = LLMRateLimiter(requests_per_minute=600)
+        gui.usage_tracker = UsageTracker()
+        gui.llm_intent_backend = "rules"
+        gui.llm_reply_backend = "zhipu"
+        gui.llm_backend_options = {"zhipu": {"base_url": server.url}}
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            shared = gui.get_shared_llm_client()
+        backend = shared.async_client.client
+        hosted = gui_backends.http_clients(backend)
+        intent = shared.recognize_intent("我要体检", ["挂号", "体检"])
+        reply = shared.generate_reply("头疼怎么办", {"script_module": "medical", "session_id": "u1"})
+        sent = server.stats().get("ok", 0)
+        shared.close()
+        server.stop()
+
+        passed = (isinstance(backend, gui_backends.RoutingBackend)
+                  and isinstance(backend.intent_backend, gui_backends.RuleBasedBackend)
+                  and len(hosted) == 1 and hosted[0].rate_limiter is gui.rate_limiter
+                  and hosted[0].usage_tracker is gui.usage_tracker and hosted[0].resilience is not None
+                  and intent == "体检" and reply == DEFAULT_REPLY and sent == 1
+                  and gui.usage_tracker.session_tokens("u1") > 0)
+        self.test_results["gui_shared_backend"] = {"sent": sent, "passed": passed}
+        return passed
+
+    def run_all_tests(self):
+        """运行所有测试"""
+        print("开始LLM后端测试")
+
+        test_methods = [method for method in dir(self) if method.startswith('test_') and callable(getattr(self, method))]
+
+        for test_method in test_methods:
+            try:
+                passed = getattr(self, test_method)()
+                status = "通过" if passed else "失败"
+                print(f"   {status}: {test_method}")
+            except Exception as e:
+                print(f"   错误: {test_method} - {e}")
+                self.test_results[test_method] = {"error": str(e), "passed": False}
+
+        return self.test_results
+
+def main():
+    """主函数"""
+    tester = TestLLMBackends()
+    test_results = tester.run_all_tests()
+
+    passed_count = sum(1 for result in test_results.values() if result.get("passed", False))
+    total_count = len(test_results)
+
+    print(f"\n测试总结:")
+    print(f"   总测试数: {total_count}")
+    print(f"   通过数: {passed_count}")
+    print(f"   失败数: {total_count - passed_count}")
+
+    return passed_count == total_count
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -1,6 +1,7 @@
 import sys
 import os
 import json
+import tempfile
 from unittest.mock import patch
 
 
@@ -17,7 +18,9 @@ from test_llm_stubs import MockResponse, MockRequests, TEST_SCENARIOS
 
 # 导入要测试的模块
 try:
-    from llm_client import ZhipuAIClient
+    from llm_client import ZhipuAIClient, is_error_reply
+    from reply_cache import ReplyCache
+    from rate_limiter import estimate_tokens, estimate_messages_tokens
 except ImportError as e:
     print(f"无法导入ZhipuAIClient: {e}")
     sys.exit(1)
@@ -314,6 +317,87 @@ class TestZhipuAIClient:
         
         return passed
     
+    def test_error_reply_marker(self):
+        """测试只有客户端自己的错误提示被标记，正常回答中出现“失败”“错误”不算错误"""
+        print("\n测试错误回复标记")
+        
+        answer = "手术失败的概率很低，网上说不能吃药的说法是错误的，医院服务时间内都可以咨询。"
+        mock_requests = MockRequests()
+        mock_requests.set_responses([
+            MockResponse({"choices": [{"message": {"content": answer}}]}),
+            mock_requests.exceptions.RequestException("模拟网络错误"),
+        ])
+        context = {"script_module": "medical", "current_step": "sciAI",
+                   "conversation_history": [{"role": "user", "content": "手术风险大吗"}]}
+        
+        with tempfile.TemporaryDirectory() as tmp:
+            with patch('llm_client.requests', mock_requests):
+                client = ZhipuAIClient(api_key="test_key", reply_cache=ReplyCache(os.path.join(tmp, "replies.db")))
+                reply = client.generate_reply("手术风险大吗", context)
+                cached = client.generate_reply("手术风险大吗", context)
+                failed = client.generate_reply("头疼怎么办", context)
+            client.reply_cache.close()
+        no_key = ZhipuAIClient(api_key="test_key")
+        no_key.api_key = None
+        disabled = no_key.generate_reply("你好")
+        
+        passed = (reply == cached == answer and not is_error_reply(reply)
+                  and len(mock_requests.call_history) == 2
+                  and is_error_reply(failed) and failed.startswith("网络错误")
+                  and is_error_reply(disabled) and not is_error_reply("AI服务暂时不可用"))
+        self.test_results["error_reply_marker"] = {
+            "reply": reply,
+            "failed": str(failed),
+            "passed": passed
+        }
+        
+        print(f"   结果: {'通过' if passed else '失败'}")
+        
+        return passed
+    
+    def test_reply_messages_budget(self):
+        """测试回复消息：系统提示复用，历史按token预算截取，过长输入截断"""
+        print("\n测试回复消息的token预算")
+
+        client = ZhipuAIClient(api_key="test_key", history_token_budget=100, max_input_tokens=50)
+        history = []
+        for i in range(10):
+            history.append({"role": "user", "content": f"第{i}个问题" + "很长的描述" * (i % 3) * 5})
+            history.append({"role": "assistant", "content": f"第{i}个回答"})
+        long_input = "我要投诉" + "这件事情非常让人生气" * 40
+        history.append({"role": "user", "content": long_input})
+        context = {"script_module": "medical", "conversation_history": history}
+
+        messages = client._reply_messages(long_input, context)
+        again = client._reply_messages("你好", {"script_module": "Medical"})
+        history_part = messages[1:-1]
+        history_tokens = estimate_messages_tokens(history_part)
+
+        passed = (
+            messages[0] is again[0]
+            and messages[0]["content"].startswith("你是智慧医院的专业客服助手")
+            and history_part == history[-1 - len(history_part):-1]
+            and history_part[-1]["content"] == "第9个回答"
+            and 0 < history_tokens <= 100
+            and estimate_tokens(messages[-1]["content"]) <= 50
+            and messages[-1]["content"].startswith("我要投诉")
+            and messages[-1]["content"].endswith("已截断）")
+            and again[-1] == {"role": "user", "content": "你好"}
+            and client._reply_messages("你好", {"script_module": "unknown"})[0]["content"].startswith("你是专业的智能客服助手")
+        )
+        self.test_results["reply_messages_budget"] = {
+            "scenario": "回复消息token预算",
+            "history_messages": len(history_part),
+            "history_tokens": history_tokens,
+            "input_tokens": estimate_tokens(messages[-1]["content"]),
+            "passed": passed
+        }
+
+        print(f"   保留历史消息: {len(history_part)}条，约{history_tokens}个token")
+        print(f"   结果: {'通过' if passed else '失败'}")
+
+        return passed
+
     def test_no_api_key(self):
         """测试无API密钥情况"""
         print("\n测试无API密钥情况")
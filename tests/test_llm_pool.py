@@ -0,0 +1,182 @@
+import os
+import sys
+import json
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, src_dir)
+
+from llm_client import ZhipuAIClient
+
+class CountingHandler(BaseHTTPRequestHandler):
+    """本地替身API：每个TCP连接调用一次 setup，借此统计建立的连接数"""
+
+    protocol_version = "HTTP/1.1"  # 支持 keep-alive
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length))
+        with self.server.lock:
+            self.server.requests += 1
+        # 回显用户输入中的第一个候选意图，便于校验结果
+        content = self.server.reply or payload["messages"][-1]["content"]
+        body = json.dumps({"choices": [{"message": {"content": content}}]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+class CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, reply=None):
+        super().__init__(("127.0.0.1", 0), CountingHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.reply = reply
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/api/paas/v4/chat/completions"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class TestHTTPConnectionPool:
+    """LLM客户端HTTP长连接测试类"""
+
+    def __init__(self):
+        self.test_results = {}
+
+    def make_client(self, server, pool_size=10):
+        client = ZhipuAIClient(api_key="test_key", pool_size=pool_size)
+        client.base_url = server.url
+        return client
+
+    def test_sequential_calls_reuse_connection(self):
+        """测试连续调用复用同一个连接"""
+        print("\n测试连接复用")
+
+        server = CountingServer(reply="挂号")
+        client = self.make_client(server)
+        results = [client.recognize_intent("我想挂号", ["挂号", "体检"]) for _ in range(20)]
+        client.close()
+        server.stop()
+
+        passed = results == ["挂号"] * 20 and server.requests == 20 and server.connections == 1
+        self.test_results["sequential_calls_reuse_connection"] = {
+            "requests": server.requests,
+            "connections": server.connections,
+            "passed": passed
+        }
+        print(f"   请求数: {server.requests}, 连接数: {server.connections}")
+        return passed
+
+    def test_shared_across_threads(self):
+        """测试多个会话线程共享一个客户端，连接数受连接池限制"""
+        print("\n测试多线程共享")
+
+        server = CountingServer(reply="购买")
+        client = self.make_client(server, pool_size=4)
+        errors = []
+
+        def session():
+            for _ in range(10):
+                if client.recognize_intent("我要买手机", ["购买", "退款"]) != "购买":
+                    errors.append("unexpected")
+
+        threads = [threading.Thread(target=session) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        client.close()
+        server.stop()
+
+        passed = not errors and server.requests == 40 and server.connections <= 4
+        self.test_results["shared_across_threads"] = {
+            "requests": server.requests,
+            "connections": server.connections,
+            "errors": len(errors),
+            "passed": passed
+        }
+        print(f"   请求数: {server.requests}, 连接数: {server.connections}")
+        return passed
+
+    def test_warm_up(self):
+        """测试预热建立的连接被后续请求复用"""
+        print("\n测试连接预热")
+
+        server = CountingServer(reply="体检")
+        client = self.make_client(server)
+        warmed = client.warm_up(1)
+        after_warm_up = server.connections
+        result = client.recognize_intent("我要体检", ["挂号", "体检"])
+        client.close()
+        server.stop()
+
+        passed = warmed == 1 and after_warm_up == 1 and server.connections == 1 and result == "体检"
+        self.test_results["warm_up"] = {
+            "warmed": warmed,
+            "connections": server.connections,
+            "passed": passed
+        }
+        return passed
+
+    def run_all_tests(self):
+        """运行所有测试"""
+        print("开始HTTP长连接测试")
+
+        test_methods = [method for method in dir(self) if method.startswith('test_') and callable(getattr(self, method))]
+
+        for test_method in test_methods:
+            try:
+                passed = getattr(self, test_method)()
+                status = "通过" if passed else "失败"
+                print(f"   {status}: {test_method}")
+            except Exception as e:
+                print(f"   错误: {test_method} - {e}")
+                self.test_results[test_method] = {"error": str(e), "passed": False}
+
+        return self.test_results
+
+def main():
+    """主函数"""
+    tester = TestHTTPConnectionPool()
+    test_results = tester.run_all_tests()
+
+    passed_count = sum(1 for result in test_results.values() if result.get("passed", False))
+    total_count = len(test_results)
+
+    print(f"\n测试总结:")
+    print(f"   总测试数: {total_count}")
+    print(f"   通过数: {passed_count}")
+    print(f"   失败数: {total_count - passed_count}")
+
+    return passed_count == total_count
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,225 @@
+import os
+import sys
+import io
+import json
+import time
+import threading
+import contextlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, project_root)
+sys.path.insert(0, src_dir)
+
+from llm_client import ZhipuAIClient, iter_sse_data
+from interpreter import DSLInterpreter
+from async_llm_client import SyncLLMClient
+
+REPLY_TOKENS = ["您好，", "建议", "多喝水", "、", "注意", "休息", "，", "如有", "不适", "请及时就医。"]
+
+class SSEHandler(BaseHTTPRequestHandler):
+    """本地替身API：stream=true 时按固定间隔逐段发送 SSE，否则生成完毕后一次返回"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        if not payload.get("stream"):
+            time.sleep(self.server.token_delay * len(REPLY_TOKENS))
+            body = json.dumps({"choices": [{"message": {"content": "".join(REPLY_TOKENS)}}]}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        self.write_chunk(b": keep-alive\n\n")
+        for i, token in enumerate(REPLY_TOKENS):
+            time.sleep(self.server.token_delay)
+            event = f"data: {json.dumps({'choices': [{'delta': {'content': token}}]}, ensure_ascii=False)}\n\n"
+            data = event.encode("utf-8")
+            if i == 1:
+                # 在一个汉字的 UTF-8 编码中间拆成两个分块
+                cut = data.index("建".encode("utf-8")) + 1
+                self.write_chunk(data[:cut])
+                self.write_chunk(data[cut:])
+            else:
+                self.write_chunk(data)
+        self.write_chunk(b"data: [DONE]\n\n")
+        self.write_chunk(b"")
+
+    def write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+class SSEServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, token_delay=0.05):
+        super().__init__(("127.0.0.1", 0), SSEHandler)
+        self.token_delay = token_delay
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/api/paas/v4/chat/completions"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class TestLLMStream:
+    """流式回复测试类"""
+
+    def __init__(self):
+        self.test_results = {}
+
+    def make_client(self, server):
+        client = ZhipuAIClient(api_key="test_key")
+        client.base_url = server.url
+        return client
+
+    def test_sse_parsing(self):
+        """测试SSE解析：注释、多行data、事件边界"""
+        print("\n测试SSE解析")
+
+        lines = [": ping", "", "data: a", "", "data:b", "data: c", "", "event: x", "data: [DONE]"]
+        events = list(iter_sse_data(lines))
+        passed = events == ["a", "b\nc", "[DONE]"]
+        self.test_results["sse_parsing"] = {"events": events, "passed": passed}
+        return passed
+
+    def test_time_to_first_token(self):
+        """测试首个增量文本的到达时间远早于完整回复"""
+        print("\n测试首字延迟")
+
+        server = SSEServer(token_delay=0.05)
+        client = self.make_client(server)
+        client.warm_up(1)
+
+        deltas = []
+        first = []
+        start = time.perf_counter()
+
+        def on_delta(delta):
+            if not first:
+                first.append(time.perf_counter() - start)
+            deltas.append(delta)
+
+        reply = client.stream_reply("头疼怎么办", {"script_module": "medical"}, on_delta)
+        stream_total = time.perf_counter() - start
+
+        start = time.perf_counter()
+        blocking_reply = client.generate_reply("头疼怎么办", {"script_module": "medical"})
+        blocking_total = time.perf_counter() - start
+        client.close()
+        server.stop()
+
+        ttft = first[0] if first else None
+        passed = (deltas == REPLY_TOKENS and reply == blocking_reply == "".join(REPLY_TOKENS)
+                  and ttft is not None and ttft < blocking_total / 4)
+        self.test_results["time_to_first_token"] = {
+            "ttft_ms": round(ttft * 1000, 1) if ttft is not None else None,
+            "stream_total_ms": round(stream_total * 1000, 1),
+            "blocking_total_ms": round(blocking_total * 1000, 1),
+            "passed": passed
+        }
+        print(f"   流式首字: {self.test_results['time_to_first_token']['ttft_ms']}ms, "
+              f"流式完成: {round(stream_total * 1000, 1)}ms, 非流式完成: {round(blocking_total * 1000, 1)}ms")
+        return passed
+
+    def test_interpreter_streaming(self):
+        """测试解释器流式输出，结束后完整回复写入对话历史"""
+        print("\n测试解释器流式输出")
+
+        server = SSEServer(token_delay=0.01)
+        # 经同步外观调用，与多用户界面的用法一致
+        client = SyncLLMClient(self.make_client(server), max_in_flight=2)
+        interpreter = DSLInterpreter({"module": "medical", "steps": {}}, llm_client=client)
+        interpreter.stream_replies = True
+        interpreter.conversation_history.append({"role": "user", "content": "头疼怎么办"})
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            interpreter._execute_ai_reply()
+        client.close()
+        server.stop()
+
+        full = "".join(REPLY_TOKENS)
+        passed = (f"机器人: {full}\n" in output.getvalue()
+                  and interpreter.conversation_history[-1] == {"role": "assistant", "content": full})
+        self.test_results["interpreter_streaming"] = {"passed": passed}
+        return passed
+
+    def test_gui_stream_callback(self):
+        """测试多用户界面的解释器通过流式回调逐段输出"""
+        print("\n测试GUI流式回调")
+
+        from src.gui_multi_user import ThreadSafeDSLInterpreter
+
+        server = SSEServer(token_delay=0.01)
+        client = self.make_client(server)
+        interpreter = ThreadSafeDSLInterpreter({"module": "medical", "steps": {}}, llm_client=client)
+        messages = []
+        chunks = []
+        interpreter.set_gui_output_callback(messages.append)
+        interpreter.set_gui_stream_callback(lambda delta, done: chunks.append((delta, done)))
+        interpreter.conversation_history.append({"role": "user", "content": "头疼怎么办"})
+        interpreter._execute_ai_reply()
+        client.close()
+        server.stop()
+
+        full = "".join(REPLY_TOKENS)
+        passed = (messages == ["正在思考中..."]
+                  and [delta for delta, done in chunks if not done] == REPLY_TOKENS
+                  and chunks[-1] == ("", True)
+                  and interpreter.conversation_history[-1]["content"] == full)
+        self.test_results["gui_stream_callback"] = {"chunks": len(chunks), "passed": passed}
+        return passed
+
+    def run_all_tests(self):
+        """运行所有测试"""
+        print("开始流式回复测试")
+
+        test_methods = [method for method in dir(self) if method.startswith('test_') and callable(getattr(self, method))]
+
+        for test_method in test_methods:
+            try:
+                passed = getattr(self, test_method)()
+                status = "通过" if passed else "失败"
+                print(f"   {status}: {test_method}")
+            except Exception as e:
+                print(f"   错误: {test_method} - {e}")
+                self.test_results[test_method] = {"error": str(e), "passed": False}
+
+        return self.test_results
+
+def main():
+    """主函数"""
+    tester = TestLLMStream()
+    test_results = tester.run_all_tests()
+
+    passed_count = sum(1 for result in test_results.values() if result.get("passed", False))
+    total_count = len(test_results)
+
+    print(f"\n测试总结:")
+    print(f"   总测试数: {total_count}")
+    print(f"   通过数: {passed_count}")
+    print(f"   失败数: {total_count - passed_count}")
+
+    return passed_count == total_count
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
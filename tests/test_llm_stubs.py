@@ -38,6 +38,22 @@ class MockRequests:
         """设置预定义的响应序列"""
         self.responses = responses
     
+    def Session(self):
+        """模拟requests.Session，请求记录在同一个对象上"""
+        return self
+    
+    def mount(self, prefix, adapter):
+        """模拟挂载连接池适配器"""
+        pass
+    
+    def head(self, url, timeout=None):
+        """模拟预热连接的HEAD请求"""
+        self.call_history.append({"method": "HEAD", "url": url, "timeout": timeout})
+        return MockResponse({})
+    
+    def close(self):
+        pass
+    
     def post(self, url, headers=None, json=None, timeout=None):
         """模拟POST请求"""
         self.call_history.append({
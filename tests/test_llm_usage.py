@@ -0,0 +1,223 @@
+import io
+import os
+import sys
+import csv
+import json
+import time
+import tempfile
+import contextlib
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, src_dir)
+
+from llm_usage import UsageTracker
+from llm_client import ZhipuAIClient
+from dsl_parser import load_script_from_file
+from interpreter import DSLInterpreter
+from stub_llm_server import StubLLMServer
+
+def make_context(session_id, step, module="medical"):
+    """直接测试汇总逻辑用的上下文；客户端经解释器记录的步骤见 test_client_records"""
+    return {"session_id": session_id, "current_step": step, "script_module": module,
+            "conversation_history": [], "variables": {}}
+
+class TestLLMUsage:
+    """LLM用量统计测试类"""
+
+    def __init__(self):
+        self.test_results = {}
+
+    def test_aggregation(self):
+        """测试按会话、按步骤累计用量"""
+        print("\n测试用量汇总")
+
+        tracker = UsageTracker()
+        tracker.record("reply", make_context("s1", "sciAI"), 0.2, 100, 50)
+        tracker.record("reply", make_context("s1", "sciAI"), 0.4, 120, 30)
+        tracker.record("intent", make_context("s2", "welcome"), 0.1, 80, 2)
+        tracker.record("reply", make_context("s2", "regAI"), 1.0, 0, 0, ok=False)
+        tracker.record("intent", None, 0.05, 300, 10)
+        summary = tracker.summary()
+
+        sci = summary["by_step"]["medical.sciAI"]
+        passed = (sci["calls"] == 2 and sci["total_tokens"] == 300 and sci["avg_latency_ms"] == 300.0
+                  and sci["max_latency_ms"] == 400.0
+                  and summary["by_step"]["medical.regAI"]["errors"] == 1
+                  and summary["by_session"]["s2"]["total_tokens"] == 82
+                  and summary["by_session"]["-"]["calls"] == 1
+                  and summary["total"]["calls"] == 5 and summary["total"]["total_tokens"] == 692
+                  and tracker.session_tokens("s1") == 300 and tracker.session_tokens("nobody") == 0)
+        self.test_results["aggregation"] = {"summary": summary, "passed": passed}
+        return passed
+
+    def test_budget(self):
+        """测试会话token预算"""
+        print("\n测试会话预算")
+
+        tracker = UsageTracker(session_token_budget=200)
+        tracker.record("reply", make_context("s1", "sciAI"), 0.1, 150, 40)
+        below = tracker.over_budget("s1")
+        tracker.record("reply", make_context("s1", "sciAI"), 0.1, 5, 5)
+        reached = tracker.over_budget("s1")
+
+        unlimited = UsageTracker()
+        unlimited.record("reply", make_context("s1", "sciAI"), 0.1, 10 ** 6, 0)
+
+        passed = (not below and reached and not tracker.over_budget("s2") and not tracker.over_budget(None)
+                  and not unlimited.over_budget("s1"))
+        self.test_results["budget"] = {"passed": passed}
+        return passed
+
+    def test_export(self):
+        """测试导出 CSV 明细和 JSON 汇总"""
+        print("\n测试导出")
+
+        tracker = UsageTracker(max_records=2)
+        for i in range(3):
+            tracker.record("reply", make_context("s1", f"step{i}"), 0.1, 10 * i, 1)
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, "usage.csv")
+            json_path = os.path.join(tmp, "usage.json")
+            tracker.export(csv_path)
+            tracker.export(json_path)
+            with open(csv_path, encoding="utf-8") as f:
+                rows = list(csv.DictReader(f))
+            with open(json_path, encoding="utf-8") as f:
+                summary = json.load(f)
+
+        # 明细只保留最近的 max_records 条，汇总不受影响
+        passed = ([row["step"] for row in rows] == ["step1", "step2"] and rows[1]["total_tokens"] == "21"
+                  and rows[0]["session_id"] == "s1" and summary["total"]["calls"] == 3
+                  and "medical.step0" in summary["by_step"])
+        self.test_results["export"] = {"rows": len(rows), "passed": passed}
+        return passed
+
+    def run_script(self, script_name, client, inputs, stream=False):
+        """用给定输入跑完一个脚本，返回解释器"""
+        script_ast = load_script_from_file(os.path.join(project_root, "scripts", script_name))
+        interpreter = DSLInterpreter(script_ast, client)
+        interpreter.stream_replies = stream
+        answers = iter(inputs)
+        interpreter.input_function = lambda prompt=None: next(answers)
+        with contextlib.redirect_stdout(io.StringIO()):
+            interpreter.run()
+        return interpreter
+
+    def test_client_records(self):
+        """测试解释器驱动的调用按实际步骤记录用量：Listen 之后的 AIReply 计入所在步骤"""
+        print("\n测试客户端记录用量")
+
+        server = StubLLMServer(latency="fixed:0.05", token_delay=0.001)
+        tracker = UsageTracker()
+        client = ZhipuAIClient(api_key="test_key", base_url=server.url, usage_tracker=tracker)
+        medical = self.run_script("medical.txt", client,
+                                  ["今天天气怎么样", "科普", "自由提问", "熬夜有什么危害", "退出"], stream=True)
+        ecommerce = self.run_script("ecommerce.txt", client, ["投诉", "快递三天还没到", "退出"])
+        client.close()
+        server.stop()
+
+        down = ZhipuAIClient(api_key="test_key", base_url="http://127.0.0.1:9/x", usage_tracker=tracker, timeout=1)
+        failed = self.run_script("medical.txt", down, ["科普", "自由提问", "你好", "退出"])
+        down.close()
+
+        def calls(interpreter):
+            return [(record.kind, record.step) for record in tracker.records()
+                    if record.session_id == interpreter.session_id]
+
+        ok_records = [record for record in tracker.records() if record.ok]
+        by_step = tracker.summary()["by_step"]
+        passed = (calls(medical) == [("intent", "welcome"), ("stream", "sciAI")]
+                  and calls(ecommerce) == [("reply", "complaintStart")]
+                  and calls(failed) == [("reply", "sciAI")]
+                  and all(record.latency_ms >= 50 for record in ok_records)
+                  and all(record.prompt_tokens > 0 and record.completion_tokens > 0 and not record.estimated
+                          for record in ok_records)
+                  and by_step["medical.sciAI"]["calls"] == 2 and by_step["medical.sciAI"]["errors"] == 1
+                  and by_step["ecommerce.complaintStart"]["total_tokens"] > 0
+                  and by_step["medical.welcome"]["calls"] == 1 and "ecommerce.welcome" not in by_step)
+        self.test_results["client_records"] = {"records": [r._asdict() for r in tracker.records()], "passed": passed}
+        return passed
+
+    def test_estimated_usage(self):
+        """测试响应没有 usage 时按字符估计"""
+        print("\n测试用量估计")
+
+        tracker = UsageTracker()
+        client = ZhipuAIClient(api_key="test_key", usage_tracker=tracker)
+        messages = [{"role": "user", "content": "头疼怎么办"}]
+        client._record_usage("reply", make_context("s1", "sciAI"), time.perf_counter(), messages, "多休息", {})
+        record = tracker.records()[0]
+
+        passed = record.estimated and record.prompt_tokens == 9 and record.completion_tokens == 3
+        self.test_results["estimated_usage"] = {"record": record._asdict(), "passed": passed}
+        return passed
+
+    def test_budget_switches_to_rule_mode(self):
+        """测试会话用量超出预算后该会话不再调用AI，改走默认分支"""
+        print("\n测试超出预算后改用规则模式")
+
+        server = StubLLMServer()
+        tracker = UsageTracker(session_token_budget=50)
+        client = ZhipuAIClient(api_key="test_key", base_url=server.url, usage_tracker=tracker)
+        script_ast = load_script_from_file(os.path.join(project_root, "scripts", "medical.txt"))
+        interpreter = DSLInterpreter(script_ast, client)
+        other = DSLInterpreter(script_ast, client)
+        inputs = iter(["今天天气怎么样", "食堂几点开门", "退出"])
+        interpreter.input_function = lambda prompt=None: next(inputs)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            interpreter.run()
+        requests_sent = server.stats().get("ok", 0)
+        records = tracker.records()
+        client.close()
+        server.stop()
+
+        # 第一次意图识别的提示就超出预算，第二句只在本地匹配；其他会话不受影响
+        passed = (requests_sent == 1 and len(records) == 1
+                  and records[0].session_id == interpreter.session_id and records[0].step == "welcome"
+                  and tracker.over_budget(interpreter.session_id)
+                  and interpreter.intent_stats.get("llm") == 1 and interpreter.intent_stats.get("default") == 2
+                  and other._llm_available() and not interpreter._llm_available())
+        self.test_results["budget_switches_to_rule_mode"] = {
+            "intent_stats": interpreter.intent_stats, "passed": passed
+        }
+        return passed
+
+    def run_all_tests(self):
+        """运行所有测试"""
+        print("开始LLM用量统计测试")
+
+        test_methods = [method for method in dir(self) if method.startswith('test_') and callable(getattr(self, method))]
+
+        for test_method in test_methods:
+            try:
+                passed = getattr(self, test_method)()
+                status = "通过" if passed else "失败"
+                print(f"   {status}: {test_method}")
+            except Exception as e:
+                print(f"   错误: {test_method} - {e}")
+                self.test_results[test_method] = {"error": str(e), "passed": False}
+
+        return self.test_results
+
+def main():
+    """主函数"""
+    tester = TestLLMUsage()
+    test_results = tester.run_all_tests()
+
+    passed_count = sum(1 for result in test_results.values() if result.get("passed", False))
+    total_count = len(test_results)
+
+    print(f"\n测试总结:")
+    print(f"   总测试数: {total_count}")
+    print(f"   通过数: {passed_count}")
+    print(f"   失败数: {total_count - passed_count}")
+
+    return passed_count == total_count
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
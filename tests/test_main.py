@@ -46,7 +46,7 @@ class TestRunner:
         print("开始电商模块测试...")
         
         from database.init_db import init_db
-        init_db()
+        init_db(reset=True)
         
         test1_inputs = ["购买", "手机", "2", "退出"]
         test1_result = self.run_chatbot_test("ecommerce", test1_inputs, "电商-购买手机")
@@ -236,6 +236,63 @@ Step fallback
 '''
     return run_test("边界情况测试", test_script, ['module', 'steps'])
 
+def test_db_extensions():
+    """测试数据库动作的扩展语法"""
+    test_script = '''
+module "数据库扩展测试"
+
+Step refundStart
+    Listen assign orderId
+    DBQuery "SELECT status FROM orders WHERE id={orderId}" -> goto checkRefundStatus st cache 60
+    DBQuery "SELECT changes() as updated" -> goto checkRefundStatus updated cache 0
+    DBExec "UPDATE goods SET stock = stock - 1 WHERE name='phone' RETURNING stock" -> assign remaining
+    DBQuery "SELECT name, stock FROM goods WHERE name='phone'" -> goto checkRefundStatus item, left cache 30
+    DBQuery "SELECT id, status FROM orders" -> goto checkRefundStatus orders rows 5 cache 10
+    Reserve "phone" quantity -> assign ok
+    Release "phone" 2
+
+Step checkRefundStatus
+    If st == "ordered" -> goto refundStart
+    ForEach order in orders
+        Speak "{order.id}: {order.status}"
+    EndForEach
+    Exit
+'''
+    result = run_test("数据库扩展语法测试", test_script, ['module', 'steps'])
+    actions = result['steps']['refundStart']['actions']
+    assert actions[1]['cache_ttl'] == 60
+    assert actions[2]['cache_ttl'] == 0
+    assert actions[3]['variable'] == 'remaining'
+    assert actions[4]['variable'] == ['item', 'left'] and actions[4]['cache_ttl'] == 30
+    assert actions[5]['multi_row'] and actions[5]['max_rows'] == 5 and actions[5]['cache_ttl'] == 10
+    assert actions[6] == {'type': 'Reserve', 'sku': 'phone', 'quantity': 'quantity', 'variable': 'ok'}
+    assert actions[7] == {'type': 'Release', 'sku': 'phone', 'quantity': 2}
+    loop = result['steps']['checkRefundStatus']['actions'][1]
+    assert loop['type'] == 'ForEach' and loop['item'] == 'order' and loop['source'] == 'orders'
+    assert loop['actions'] == [{'type': 'Speak', 'message': '{order.id}: {order.status}'}]
+    return result
+
+def test_synonyms():
+    """测试同义词语法"""
+    test_script = '''
+module "同义词测试"
+
+Step welcome
+    Listen
+    Case "挂号" -> goto reg
+    Synonym "挂号" "看病" "看医生"
+    Synonym "挂号" "门诊"
+    Default -> goto welcome
+
+Step reg
+    Exit
+'''
+    result = run_test("同义词语法测试", test_script, ['module', 'steps'])
+    actions = result['steps']['welcome']['actions']
+    assert actions[2] == {'type': 'Synonym', 'pattern': '挂号', 'phrases': ['看病', '看医生']}
+    assert actions[3] == {'type': 'Synonym', 'pattern': '挂号', 'phrases': ['门诊']}
+    return result
+
 def save_test_results(results, filename):
     """保存测试结果到文件"""
     try:
@@ -265,6 +322,8 @@ def main():
     all_results['medical'] = test_medical_script()
     all_results['ecommerce'] = test_ecommerce_script()
     all_results['edge_cases'] = test_edge_cases()
+    all_results['db_extensions'] = test_db_extensions()
+    all_results['synonyms'] = test_synonyms()
     
     # 统计测试结果
     successful_tests = sum(1 for result in all_results.values() if result is not None)
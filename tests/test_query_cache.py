@@ -0,0 +1,177 @@
+import os
+import sys
+import sqlite3
+import tempfile
+import io
+import contextlib
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, src_dir)
+
+from query_cache import QueryCache, is_cacheable, read_tables, write_tables
+from interpreter import DSLInterpreter
+
+class TestQueryCache:
+    """DBQuery结果缓存测试类"""
+
+    def __init__(self):
+        self.test_results = {}
+        self.temp_dir = tempfile.mkdtemp(prefix="dsl_cache_")
+
+    def create_db(self, name: str) -> str:
+        """创建带goods和orders表的测试数据库"""
+        db_path = os.path.join(self.temp_dir, name)
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE goods (name TEXT PRIMARY KEY, stock INTEGER)")
+        conn.execute("CREATE TABLE orders (id TEXT PRIMARY KEY, status TEXT)")
+        conn.execute("INSERT INTO goods VALUES ('phone', 10)")
+        conn.execute("INSERT INTO orders VALUES ('1001', 'ordered')")
+        conn.commit()
+        conn.close()
+        return db_path
+
+    def test_sql_analysis(self):
+        """测试表名提取与可缓存判断"""
+        print("\n测试SQL分析")
+
+        checks = {
+            "read_join": read_tables("SELECT g.stock FROM goods g JOIN orders o ON o.id = g.name") == {"goods", "orders"},
+            "write_update": write_tables("UPDATE goods SET stock = stock - 1") == {"goods"},
+            "write_insert": write_tables("INSERT OR REPLACE INTO orders VALUES ('1', 'x')") == {"orders"},
+            "write_delete": write_tables("DELETE FROM orders WHERE id='1'") == {"orders"},
+            "write_ddl": write_tables("DROP TABLE goods") is None,
+            "cacheable_select": is_cacheable("SELECT status FROM orders WHERE id=1"),
+            "changes_not_cacheable": not is_cacheable("SELECT changes() as updated"),
+            "now_not_cacheable": not is_cacheable("SELECT * FROM orders WHERE ts < datetime('now')"),
+            "update_not_cacheable": not is_cacheable("UPDATE goods SET stock = 1"),
+        }
+        passed = all(checks.values())
+        self.test_results["sql_analysis"] = {"checks": checks, "passed": passed}
+        return passed
+
+    def test_invalidation_by_table(self):
+        """测试写表只使读取该表的缓存失效"""
+        print("\n测试按表失效")
+
+        cache = QueryCache()
+        goods_key = cache.make_key("SELECT stock FROM goods WHERE name='{item}'", {"item": "phone"})
+        orders_key = cache.make_key("SELECT status FROM orders WHERE id={orderId}", {"orderId": "1001"})
+        cache.put(goods_key, 10, {"goods"}, cache.generation({"goods"}))
+        cache.put(orders_key, "ordered", {"orders"}, cache.generation({"orders"}))
+
+        cache.invalidate_tables({"goods"})
+        goods_hit, _ = cache.get(goods_key)
+        orders_hit, orders_value = cache.get(orders_key)
+
+        passed = not goods_hit and orders_hit and orders_value == "ordered"
+        self.test_results["invalidation_by_table"] = {"stats": cache.stats(), "passed": passed}
+        return passed
+
+    def test_stale_put_discarded(self):
+        """测试查询期间表被写入时放弃写回"""
+        print("\n测试并发写入后的写回保护")
+
+        cache = QueryCache()
+        key = cache.make_key("SELECT stock FROM goods", {})
+        generation = cache.generation({"goods"})
+        cache.invalidate_tables({"goods"})
+        cache.put(key, 10, {"goods"}, generation)
+        hit, _ = cache.get(key)
+
+        passed = not hit
+        self.test_results["stale_put_discarded"] = {"passed": passed}
+        return passed
+
+    def test_ttl_and_lru(self):
+        """测试有效期与容量淘汰"""
+        print("\n测试TTL与LRU淘汰")
+
+        cache = QueryCache(max_entries=2)
+        keys = [cache.make_key(f"SELECT stock FROM goods WHERE name='{name}'", {}) for name in ("a", "b", "c")]
+        cache.put(keys[0], 1, {"goods"}, cache.generation({"goods"}), ttl=-1)
+        expired_hit, _ = cache.get(keys[0])
+
+        cache.put(keys[0], 1, {"goods"}, cache.generation({"goods"}))
+        cache.put(keys[1], 2, {"goods"}, cache.generation({"goods"}))
+        cache.get(keys[0])
+        cache.put(keys[2], 3, {"goods"}, cache.generation({"goods"}))
+        evicted_hit, _ = cache.get(keys[1])
+        kept_hit, _ = cache.get(keys[0])
+
+        stats = cache.stats()
+        passed = not expired_hit and not evicted_hit and kept_hit and stats["evictions"] == 1
+        self.test_results["ttl_and_lru"] = {"stats": stats, "passed": passed}
+        return passed
+
+    def test_interpreter_read_through(self):
+        """测试解释器读穿缓存并在DBExec后失效"""
+        print("\n测试解释器读穿缓存")
+
+        db_path = self.create_db("interpreter.db")
+        cache = QueryCache()
+        script_ast = {"module": "ecommerce", "steps": {}}
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            interpreter = DSLInterpreter(script_ast, None, db_path, query_cache=cache)
+            interpreter._execute_db_query("SELECT stock FROM goods WHERE name='phone'", "stock", "next")
+            first = interpreter.variables["stock"]
+            interpreter._execute_db_query("SELECT stock FROM goods WHERE name='phone'", "stock", "next")
+            interpreter._execute_db_query("SELECT status FROM orders WHERE id=1001", "st", "next", cache_ttl=60)
+            interpreter._execute_db_exec("UPDATE goods SET stock = stock - 3 WHERE name='phone'")
+            interpreter._execute_db_query("SELECT stock FROM goods WHERE name='phone'", "stock", "next")
+            after_update = interpreter.variables["stock"]
+            interpreter._execute_db_query("SELECT status FROM orders WHERE id=1001", "st", "next", cache_ttl=60)
+            interpreter._execute_db_query("SELECT changes() as updated", "updated", "next")
+            interpreter._release_db_conn()
+
+        stats = cache.stats()
+        # goods: 未命中、命中、失效后未命中；orders: 未命中、命中；changes() 不进入缓存
+        passed = (first == 10 and after_update == 7 and
+                  stats["hits"] == 2 and stats["misses"] == 3 and stats["entries"] == 2)
+        self.test_results["interpreter_read_through"] = {
+            "first": first,
+            "after_update": after_update,
+            "stats": stats,
+            "passed": passed
+        }
+        print(f"   缓存统计: {stats}")
+        return passed
+
+    def run_all_tests(self):
+        """运行所有测试"""
+        print("开始查询缓存测试")
+
+        test_methods = [method for method in dir(self) if method.startswith('test_') and callable(getattr(self, method))]
+
+        for test_method in test_methods:
+            try:
+                passed = getattr(self, test_method)()
+                status = "通过" if passed else "失败"
+                print(f"   {status}: {test_method}")
+            except Exception as e:
+                print(f"   错误: {test_method} - {e}")
+                self.test_results[test_method] = {"error": str(e), "passed": False}
+
+        return self.test_results
+
+def main():
+    """主函数"""
+    tester = TestQueryCache()
+    test_results = tester.run_all_tests()
+
+    passed_count = sum(1 for result in test_results.values() if result.get("passed", False))
+    total_count = len(test_results)
+
+    print(f"\n测试总结:")
+    print(f"   总测试数: {total_count}")
+    print(f"   通过数: {passed_count}")
+    print(f"   失败数: {total_count - passed_count}")
+
+    return passed_count == total_count
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
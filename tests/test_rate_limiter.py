@@ -0,0 +1,262 @@
+import io
+import os
+import sys
+import time
+import threading
+import contextlib
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, src_dir)
+
+from rate_limiter import (LLMRateLimiter, TokenBucket, PRIORITY_INTENT, PRIORITY_REPLY,
+                          estimate_tokens, estimate_messages_tokens)
+from llm_client import ZhipuAIClient, CircuitBreaker, ResilientCaller, RetryPolicy, is_error_reply
+from dsl_parser import load_script_from_file
+from interpreter import DSLInterpreter
+from stub_llm_server import StubLLMServer
+
+class TestRateLimiter:
+    """客户端限流测试类"""
+
+    def __init__(self):
+        self.test_results = {}
+
+    def test_estimate_tokens(self):
+        """测试token估计：中文一字一个，其余四个字符一个"""
+        print("\n测试token估计")
+
+        checks = {
+            "empty": estimate_tokens("") == 0,
+            "chinese": estimate_tokens("我想挂号") == 4,
+            "ascii": estimate_tokens("hello world!") == 3,
+            "mixed": estimate_tokens("挂号abcd") == 3,
+            "messages": estimate_messages_tokens([{"role": "user", "content": "你好"}]) == 6,
+        }
+        passed = all(checks.values())
+        self.test_results["estimate_tokens"] = {"checks": checks, "passed": passed}
+        return passed
+
+    def test_request_bucket(self):
+        """测试每分钟请求数：桶内的请求立即放行，等不及的立即拒绝"""
+        print("\n测试每分钟请求数")
+
+        limiter = LLMRateLimiter(requests_per_minute=5, max_wait={PRIORITY_INTENT: 0, PRIORITY_REPLY: 0})
+        start = time.perf_counter()
+        results = [limiter.acquire(priority=PRIORITY_INTENT) for _ in range(7)]
+        elapsed = time.perf_counter() - start
+        stats = limiter.stats()
+
+        passed = (results == [True] * 5 + [False] * 2 and elapsed < 0.1
+                  and stats["granted"]["intent"] == 5 and stats["shed"]["intent"] == 2)
+        self.test_results["request_bucket"] = {"results": results, "stats": stats, "passed": passed}
+        return passed
+
+    def test_token_bucket(self):
+        """测试每分钟token数：大请求耗尽配额，超出桶容量的请求等桶满即放行"""
+        print("\n测试每分钟token数")
+
+        limiter = LLMRateLimiter(tokens_per_minute=1000, max_wait={PRIORITY_REPLY: 0})
+        first = limiter.acquire(800, PRIORITY_REPLY)
+        second = limiter.acquire(800, PRIORITY_REPLY)
+        small = limiter.acquire(100, PRIORITY_REPLY)
+
+        bucket = TokenBucket(60, capacity=2)
+        bucket.take(5)
+        oversized_wait = bucket.wait_time(5)
+
+        passed = first and not second and small and oversized_wait == 2.0
+        self.test_results["token_bucket"] = {"oversized_wait": oversized_wait, "passed": passed}
+        return passed
+
+    def test_wait_for_refill(self):
+        """测试令牌不足但能在 max_wait 内补上时等待后放行"""
+        print("\n测试等待补充")
+
+        # 每秒补充5个请求
+        limiter = LLMRateLimiter(requests_per_minute=300, max_wait={PRIORITY_REPLY: 1.0})
+        limiter.request_bucket.tokens = 0
+        start = time.perf_counter()
+        granted = limiter.acquire(priority=PRIORITY_REPLY)
+        elapsed = time.perf_counter() - start
+
+        passed = granted and 0.15 <= elapsed < 0.6 and limiter.stats()["avg_wait_ms"] > 100
+        self.test_results["wait_for_refill"] = {"elapsed": round(elapsed, 3), "passed": passed}
+        return passed
+
+    def test_intent_priority(self):
+        """测试配额紧张时后到的意图识别先于排队中的回复生成放行"""
+        print("\n测试优先级")
+
+        # 每秒补充4个请求，桶内没有余量
+        limiter = LLMRateLimiter(requests_per_minute=240, max_wait={PRIORITY_INTENT: 2.0, PRIORITY_REPLY: 2.0})
+        limiter.request_bucket.tokens = 0
+        order = []
+        lock = threading.Lock()
+
+        def worker(name, priority):
+            if limiter.acquire(priority=priority):
+                with lock:
+                    order.append(name)
+
+        replies = [threading.Thread(target=worker, args=(f"reply{i}", PRIORITY_REPLY)) for i in range(2)]
+        for thread in replies:
+            thread.start()
+            time.sleep(0.02)
+        intent = threading.Thread(target=worker, args=("intent", PRIORITY_INTENT))
+        intent.start()
+        for thread in replies + [intent]:
+            thread.join()
+
+        passed = order[0] == "intent" and sorted(order) == ["intent", "reply0", "reply1"]
+        self.test_results["intent_priority"] = {"order": order, "passed": passed}
+        return passed
+
+    def test_queue_limit_and_backoff(self):
+        """测试排队已满时立即拒绝，backoff 期间暂停放行"""
+        print("\n测试排队上限与暂停")
+
+        limiter = LLMRateLimiter(requests_per_minute=60, max_queue=0)
+        queue_full = limiter.acquire(priority=PRIORITY_INTENT)
+
+        paused = LLMRateLimiter(requests_per_minute=600, max_wait={PRIORITY_INTENT: 0.05, PRIORITY_REPLY: 1.0})
+        paused.backoff(0.3)
+        shed_during_pause = paused.acquire(priority=PRIORITY_INTENT)
+        start = time.perf_counter()
+        waited = paused.acquire(priority=PRIORITY_REPLY)
+        elapsed = time.perf_counter() - start
+
+        passed = (not queue_full and not shed_during_pause and waited and elapsed >= 0.2
+                  and paused.stats()["backoffs"] == 1)
+        self.test_results["queue_limit_and_backoff"] = {"elapsed": round(elapsed, 3), "passed": passed}
+        return passed
+
+    def test_client_shed(self):
+        """测试被拒绝的请求不发给服务：意图识别返回 unknown，回复返回不可用提示"""
+        print("\n测试客户端拒绝")
+
+        server = StubLLMServer()
+        limiter = LLMRateLimiter(requests_per_minute=1, max_wait={PRIORITY_INTENT: 0, PRIORITY_REPLY: 0})
+        client = ZhipuAIClient(api_key="test_key", base_url=server.url, rate_limiter=limiter)
+        first = client.recognize_intent("我想预约挂号", ["挂号", "体检"])
+        shed_intent = client.recognize_intent("我想体检", ["挂号", "体检"])
+        shed_reply = client.generate_reply("头疼怎么办")
+        stats = server.stats()
+        client.close()
+        server.stop()
+
+        passed = (first == "挂号" and shed_intent == "unknown" and "不可用" in shed_reply
+                  and stats["ok"] == 1 and limiter.stats()["shed"] == {"intent": 1, "reply": 1})
+        self.test_results["client_shed"] = {"shed_reply": shed_reply, "passed": passed}
+        return passed
+
+    def test_retries_pass_limiter(self):
+        """测试每次重试都经过限流器：配额用完后重试被拒绝，首次尝试被拒绝不计入熔断"""
+        print("\n测试重试经过限流")
+
+        server = StubLLMServer(error_rate=1.0)
+        limiter = LLMRateLimiter(requests_per_minute=2, max_wait={PRIORITY_INTENT: 0, PRIORITY_REPLY: 0})
+        breaker = CircuitBreaker(failure_threshold=5)
+        resilience = ResilientCaller(retry=RetryPolicy(max_attempts=4, base_delay=0.01), breaker=breaker)
+        client = ZhipuAIClient(api_key="test_key", base_url=server.url, rate_limiter=limiter,
+                               resilience=resilience)
+        retried = client.generate_reply("头疼怎么办")
+        refused = client.generate_reply("头疼怎么办")
+        stats = limiter.stats()
+        server_stats = server.stats()
+        failures = breaker.stats()["consecutive_failures"]
+        client.close()
+        server.stop()
+
+        # 第一次调用：两次尝试用完配额，第三次尝试被拒绝；第二次调用没有发出请求
+        passed = (is_error_reply(retried) and "限流" in retried and is_error_reply(refused)
+                  and server_stats.get("errors") == 2 and stats["granted"]["reply"] == 2
+                  and stats["shed"]["reply"] == 2 and failures == 1)
+        self.test_results["retries_pass_limiter"] = {
+            "limiter": stats, "server": server_stats, "failures": failures, "passed": passed
+        }
+        return passed
+
+    def test_shed_routes_to_default(self):
+        """测试限流时脚本对话立即走 Default 分支，不等待也不请求服务"""
+        print("\n测试限流走默认分支")
+
+        server = StubLLMServer()
+        limiter = LLMRateLimiter(requests_per_minute=1, max_wait={PRIORITY_INTENT: 0, PRIORITY_REPLY: 0})
+        limiter.request_bucket.tokens = 0
+        client = ZhipuAIClient(api_key="test_key", base_url=server.url, rate_limiter=limiter)
+        script_ast = load_script_from_file(os.path.join(project_root, "scripts", "medical.txt"))
+        interpreter = DSLInterpreter(script_ast, client)
+        inputs = iter(["今天天气怎么样", "退出"])
+        interpreter.input_function = lambda prompt=None: next(inputs)
+
+        output = io.StringIO()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(output):
+            interpreter.run()
+        elapsed = time.perf_counter() - start
+        stats = server.stats()
+        client.close()
+        server.stop()
+
+        passed = "我不太明白您的意思" in output.getvalue() and elapsed < 1.0 and stats.get("ok", 0) == 0
+        self.test_results["shed_routes_to_default"] = {"elapsed": round(elapsed, 3), "passed": passed}
+        return passed
+
+    def test_server_429_backoff(self):
+        """测试服务端返回 429 时按 Retry-After 暂停放行"""
+        print("\n测试服务端限流")
+
+        server = StubLLMServer(rate_limit=1)
+        limiter = LLMRateLimiter(requests_per_minute=600, max_wait={PRIORITY_INTENT: 0.1, PRIORITY_REPLY: 0.1})
+        client = ZhipuAIClient(api_key="test_key", base_url=server.url, rate_limiter=limiter)
+        replies = [client.generate_reply("你好") for _ in range(3)]
+        stats = limiter.stats()
+        server_stats = server.stats()
+        client.close()
+        server.stop()
+
+        # 第二个请求收到429后暂停1秒，第三个请求在客户端就被拒绝
+        passed = (not replies[0].startswith("网络错误") and replies[1].startswith("网络错误")
+                  and "限流" in replies[2] and stats["backoffs"] == 1
+                  and server_stats.get("rate_limited", 0) == 1)
+        self.test_results["server_429_backoff"] = {"replies": replies, "stats": stats, "passed": passed}
+        return passed
+
+    def run_all_tests(self):
+        """运行所有测试"""
+        print("开始客户端限流测试")
+
+        test_methods = [method for method in dir(self) if method.startswith('test_') and callable(getattr(self, method))]
+
+        for test_method in test_methods:
+            try:
+                passed = getattr(self, test_method)()
+                status = "通过" if passed else "失败"
+                print(f"   {status}: {test_method}")
+            except Exception as e:
+                print(f"   错误: {test_method} - {e}")
+                self.test_results[test_method] = {"error": str(e), "passed": False}
+
+        return self.test_results
+
+def main():
+    """主函数"""
+    tester = TestRateLimiter()
+    test_results = tester.run_all_tests()
+
+    passed_count = sum(1 for result in test_results.values() if result.get("passed", False))
+    total_count = len(test_results)
+
+    print(f"\n测试总结:")
+    print(f"   总测试数: {total_count}")
+    print(f"   通过数: {passed_count}")
+    print(f"   失败数: {total_count - passed_count}")
+
+    return passed_count == total_count
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
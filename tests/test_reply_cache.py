@@ -0,0 +1,262 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import threading
+import io
+import contextlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, src_dir)
+
+from llm_client import ZhipuAIClient
+from reply_cache import ReplyCache
+from dsl_parser import load_script_from_file
+from interpreter import DSLInterpreter
+
+class EchoHandler(BaseHTTPRequestHandler):
+    """本地替身API：记录收到的消息，回复中带上请求序号"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        with self.server.lock:
+            self.server.payloads.append(payload)
+            number = len(self.server.payloads)
+        reply = f"第{number}次生成：多喝水，注意休息。"
+        if payload.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for part in (reply[:5], reply[5:]):
+                event = {"choices": [{"delta": {"content": part}}]}
+                self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+            return
+        body = json.dumps({"choices": [{"message": {"content": reply}}]}, ensure_ascii=False).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class EchoServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), EchoHandler)
+        self.payloads = []
+        self.lock = threading.Lock()
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/api/paas/v4/chat/completions"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+def make_context(step, question, earlier=None):
+    """模拟解释器在 AIReply 时传入的上下文"""
+    history = list(earlier or [])
+    history.append({"role": "assistant", "content": "请告诉我您想了解的健康问题："})
+    history.append({"role": "user", "content": question})
+    return {"conversation_history": history, "current_step": step, "script_module": "medical", "variables": {}}
+
+class TestReplyCache:
+    """AI回复缓存测试类"""
+
+    def __init__(self):
+        self.test_results = {}
+        self.temp_dir = tempfile.mkdtemp(prefix="reply_cache_")
+
+    def db_path(self, name):
+        return os.path.join(self.temp_dir, f"{name}.db")
+
+    def test_faq_hits(self):
+        """测试允许列表中的步骤相同问题只生成一次，其他步骤不缓存"""
+        print("\n测试问答缓存命中")
+
+        server = EchoServer()
+        client = ZhipuAIClient(api_key="test_key", reply_cache=ReplyCache(self.db_path("hits")))
+        client.base_url = server.url
+
+        first = client.generate_reply("熬夜有什么危害", make_context("sciAI", "熬夜有什么危害"))
+        again = client.generate_reply("熬夜有什么危害？", make_context("sciAI", "熬夜有什么危害？"))
+        # 不同的历史窗口（如换了提示语）是不同的键
+        other_prompt = make_context("sciAI", "熬夜有什么危害")
+        other_prompt["conversation_history"][-2]["content"] = "您还有什么想问的？"
+        different_window = client.generate_reply("熬夜有什么危害", other_prompt)
+        not_allowed = [client.generate_reply("熬夜有什么危害", make_context("welcome", "熬夜有什么危害"))
+                       for _ in range(2)]
+        stats = client.reply_cache.stats()
+        client.reply_cache.close()
+        client.close()
+        server.stop()
+
+        passed = (first == again and len(server.payloads) == 4 and different_window != first
+                  and not_allowed[0] != not_allowed[1] and stats["hits"] == 1 and stats["entries"] == 2)
+        self.test_results["faq_hits"] = {"upstream_calls": len(server.payloads), "stats": stats, "passed": passed}
+        return passed
+
+    def test_interpreter_sci_ai_hits(self):
+        """测试解释器两次进入 sciAI 问同一问题，第二次回复来自缓存"""
+        print("\n测试解释器中的问答缓存")
+
+        server = EchoServer()
+        client = ZhipuAIClient(api_key="test_key", base_url=server.url,
+                               reply_cache=ReplyCache(self.db_path("interpreter")))
+        script_ast = load_script_from_file(os.path.join(project_root, "scripts", "medical.txt"))
+        interpreter = DSLInterpreter(script_ast, client)
+        inputs = iter(["科普", "自由提问", "熬夜有什么危害", "科普", "自由提问", "熬夜有什么危害", "退出"])
+        interpreter.input_function = lambda prompt=None: next(inputs)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            interpreter.run()
+        replies = [msg["content"] for msg in interpreter.conversation_history
+                   if msg["role"] == "assistant" and "生成" in msg["content"]]
+        stats = client.reply_cache.stats()
+        client.reply_cache.close()
+        client.close()
+        server.stop()
+
+        passed = (len(replies) == 2 and replies[0] == replies[1] and len(server.payloads) == 1
+                  and stats["hits"] == 1)
+        self.test_results["interpreter_sci_ai_hits"] = {
+            "upstream_calls": len(server.payloads), "stats": stats, "passed": passed
+        }
+        return passed
+
+    def test_history_window_only(self):
+        """测试缓存步骤生成回复时只带历史窗口，早先的个人信息不进入请求"""
+        print("\n测试历史窗口")
+
+        server = EchoServer()
+        cache = ReplyCache(self.db_path("window"))
+        client = ZhipuAIClient(api_key="test_key", reply_cache=cache)
+        client.base_url = server.url
+        earlier = [{"role": "user", "content": "我叫张三，身份证号1101..."},
+                   {"role": "assistant", "content": "好的，张三先生"}]
+        client.generate_reply("头疼怎么办", make_context("regAI", "头疼怎么办", earlier))
+        # 同样的问题换一段更早的对话，仍命中
+        reply = client.generate_reply("头疼怎么办", make_context("regAI", "头疼怎么办", earlier[:1]))
+        cache.close()
+        client.close()
+        server.stop()
+
+        sent = json.dumps(server.payloads, ensure_ascii=False)
+        roles = [msg["role"] for msg in server.payloads[0]["messages"]]
+        passed = (len(server.payloads) == 1 and "张三" not in sent and reply.startswith("第1次生成")
+                  and roles == ["system", "assistant", "user"])
+        self.test_results["history_window_only"] = {"roles": roles, "passed": passed}
+        return passed
+
+    def test_ttl_and_eviction(self):
+        """测试过期和超过容量时淘汰最久未使用的项"""
+        print("\n测试过期与淘汰")
+
+        cache = ReplyCache(self.db_path("bounds"), ttl=0.2, max_entries=2)
+        keys = [cache.make_key(question, make_context("sciAI", question)) for question in ("问题一", "问题二", "问题三")]
+        cache.put(keys[0], "回复一")
+        time.sleep(0.01)
+        cache.put(keys[1], "回复二")
+        time.sleep(0.01)
+        touched = cache.get(keys[0]) == "回复一"
+        cache.put(keys[2], "回复三")
+        evicted = cache.get(keys[1]) is None and cache.get(keys[0]) == "回复一"
+        time.sleep(0.25)
+        expired = cache.get(keys[2]) is None
+        stats = cache.stats()
+        cache.close()
+
+        passed = touched and evicted and expired and stats["evictions"] == 1 and stats["expirations"] >= 1
+        self.test_results["ttl_and_eviction"] = {"stats": stats, "passed": passed}
+        return passed
+
+    def test_persistence(self):
+        """测试重启后缓存仍然可用"""
+        print("\n测试持久化")
+
+        path = self.db_path("persist")
+        context = make_context("sciAI", "失眠怎么办")
+        cache = ReplyCache(path)
+        cache.put(cache.make_key("失眠怎么办", context), "睡前少看手机。")
+        cache.close()
+
+        reopened = ReplyCache(path)
+        reply = reopened.get(reopened.make_key("失眠怎么办。", context))
+        reopened.close()
+
+        passed = reply == "睡前少看手机。"
+        self.test_results["persistence"] = {"passed": passed}
+        return passed
+
+    def test_stream_reply(self):
+        """测试流式回复：完整收到后写入缓存，命中时一次性输出"""
+        print("\n测试流式回复缓存")
+
+        server = EchoServer()
+        cache = ReplyCache(self.db_path("stream"))
+        client = ZhipuAIClient(api_key="test_key", reply_cache=cache)
+        client.base_url = server.url
+        first_deltas, second_deltas = [], []
+        first = client.stream_reply("感冒吃什么", make_context("sciAI", "感冒吃什么"), first_deltas.append)
+        second = client.stream_reply("感冒吃什么", make_context("sciAI", "感冒吃什么"), second_deltas.append)
+        cache.close()
+        client.close()
+        server.stop()
+
+        passed = (first == second and len(first_deltas) == 2 and second_deltas == [first]
+                  and len(server.payloads) == 1)
+        self.test_results["stream_reply"] = {"passed": passed}
+        return passed
+
+    def run_all_tests(self):
+        """运行所有测试"""
+        print("开始AI回复缓存测试")
+
+        test_methods = [method for method in dir(self) if method.startswith('test_') and callable(getattr(self, method))]
+
+        for test_method in test_methods:
+            try:
+                passed = getattr(self, test_method)()
+                status = "通过" if passed else "失败"
+                print(f"   {status}: {test_method}")
+            except Exception as e:
+                print(f"   错误: {test_method} - {e}")
+                self.test_results[test_method] = {"error": str(e), "passed": False}
+
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        return self.test_results
+
+def main():
+    """主函数"""
+    tester = TestReplyCache()
+    test_results = tester.run_all_tests()
+
+    passed_count = sum(1 for result in test_results.values() if result.get("passed", False))
+    total_count = len(test_results)
+
+    print(f"\n测试总结:")
+    print(f"   总测试数: {total_count}")
+    print(f"   通过数: {passed_count}")
+    print(f"   失败数: {total_count - passed_count}")
+
+    return passed_count == total_count
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,177 @@
+import os
+import sys
+import time
+import threading
+
+import requests
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, src_dir)
+
+from stub_llm_server import StubLLMServer, LatencyModel, DEFAULT_REPLY
+from llm_client import ZhipuAIClient
+from resilience import ResilientCaller, RetryPolicy
+from intent_batcher import IntentBatcher
+
+class TestStubLLMServer:
+    """替身LLM服务测试类"""
+
+    def __init__(self):
+        self.test_results = {}
+
+    def test_chat_completions(self):
+        """测试客户端经 base_url 访问替身服务：意图识别、回复、流式回复"""
+        print("\n测试请求/响应格式")
+
+        server = StubLLMServer(token_delay=0.01)
+        client = ZhipuAIClient(api_key="test_key", base_url=server.url)
+        intent = client.recognize_intent("我想预约挂号", ["挂号", "体检"])
+        unknown = client.recognize_intent("今天天气怎么样", ["挂号", "体检"])
+        reply = client.generate_reply("头疼怎么办", {"script_module": "medical"})
+        deltas = []
+        streamed = client.stream_reply("头疼怎么办", {"script_module": "medical"}, deltas.append)
+        no_auth = requests.post(server.url, json={"messages": []}).status_code
+        stats = server.stats()
+        client.close()
+        server.stop()
+
+        passed = (intent == "挂号" and unknown == "unknown" and reply == streamed == DEFAULT_REPLY
+                  and len(deltas) > 1 and no_auth == 401 and stats["ok"] == 4)
+        self.test_results["chat_completions"] = {"stats": stats, "passed": passed}
+        return passed
+
+    def test_batch_prompt(self):
+        """测试批量意图识别提示返回 JSON 数组"""
+        print("\n测试批量意图识别")
+
+        server = StubLLMServer()
+        batcher = IntentBatcher(ZhipuAIClient(api_key="test_key", base_url=server.url), max_delay_ms=50)
+        results = {}
+        inputs = ["我要挂号", "想做个体检", "随便问问"]
+        threads = [threading.Thread(target=lambda text=text: results.__setitem__(
+            text, batcher.recognize_intent(text, ["挂号", "体检"]))) for text in inputs]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = batcher.stats()
+        batcher.close()
+        server.stop()
+
+        passed = (results == {"我要挂号": "挂号", "想做个体检": "体检", "随便问问": "unknown"}
+                  and stats["fallbacks"] == 0)
+        self.test_results["batch_prompt"] = {"stats": stats, "passed": passed}
+        return passed
+
+    def test_error_injection(self):
+        """测试注入的 5xx 错误可被客户端重试"""
+        print("\n测试错误注入")
+
+        server = StubLLMServer(error_rate=0.5)
+        plain = ZhipuAIClient(api_key="test_key", base_url=server.url)
+        plain_failures = sum(plain.generate_reply("你好").startswith("网络错误") for _ in range(40))
+        retrying = ZhipuAIClient(api_key="test_key", base_url=server.url, resilience=ResilientCaller(
+            retry=RetryPolicy(max_attempts=10, base_delay=0.001, max_delay=0.01)))
+        retry_failures = sum(retrying.generate_reply("你好").startswith("网络错误") for _ in range(40))
+        stats = server.stats()
+        plain.close()
+        retrying.close()
+        server.stop()
+
+        passed = 5 <= plain_failures <= 35 and retry_failures <= 1 and stats["errors"] >= 10
+        self.test_results["error_injection"] = {
+            "plain_failures": plain_failures, "retry_failures": retry_failures, "stats": stats, "passed": passed
+        }
+        return passed
+
+    def test_rate_limit_and_latency(self):
+        """测试限流返回 429，延迟分布生效"""
+        print("\n测试限流与延迟")
+
+        server = StubLLMServer(rate_limit=2, latency="fixed:0.05")
+        session = requests.Session()
+        payload = {"model": "glm-4", "messages": [{"role": "user", "content": "你好"}]}
+        headers = {"Authorization": "Bearer test_key"}
+        start = time.perf_counter()
+        first = session.post(server.url, json=payload, headers=headers)
+        latency = time.perf_counter() - start
+        burst = [session.post(server.url, json=payload, headers=headers).status_code for _ in range(3)]
+        time.sleep(0.6)
+        refilled = session.post(server.url, json=payload, headers=headers).status_code
+        session.close()
+        server.stop()
+
+        samples = [LatencyModel("lognormal:0.5,0.6").sample() for _ in range(2000)]
+        samples.sort()
+        try:
+            LatencyModel("normal:1")
+            rejected = False
+        except ValueError:
+            rejected = True
+
+        passed = (first.status_code == 200 and latency >= 0.05 and burst[0] == 200 and burst[1:] == [429, 429]
+                  and refilled == 200 and first.json()["usage"]["total_tokens"] > 0
+                  and 0.4 < samples[1000] < 0.6 and samples[1900] > 1.0 and rejected
+                  and LatencyModel("uniform:0.1,0.2").sample() <= 0.2)
+        self.test_results["rate_limit_and_latency"] = {"burst": burst, "passed": passed}
+        return passed
+
+    def test_base_url_env(self):
+        """测试 ZHIPU_BASE_URL 环境变量"""
+        print("\n测试base_url配置")
+
+        previous = os.environ.get("ZHIPU_BASE_URL")
+        os.environ["ZHIPU_BASE_URL"] = "http://127.0.0.1:8900/api/paas/v4/chat/completions"
+        try:
+            from_env = ZhipuAIClient(api_key="test_key")
+            explicit = ZhipuAIClient(api_key="test_key", base_url="http://localhost:1/x")
+        finally:
+            if previous is None:
+                del os.environ["ZHIPU_BASE_URL"]
+            else:
+                os.environ["ZHIPU_BASE_URL"] = previous
+        default = ZhipuAIClient(api_key="test_key")
+
+        passed = (from_env.base_url.startswith("http://127.0.0.1:8900") and explicit.base_url == "http://localhost:1/x"
+                  and default.base_url.startswith("https://open.bigmodel.cn"))
+        self.test_results["base_url_env"] = {"passed": passed}
+        return passed
+
+    def run_all_tests(self):
+        """运行所有测试"""
+        print("开始替身LLM服务测试")
+
+        test_methods = [method for method in dir(self) if method.startswith('test_') and callable(getattr(self, method))]
+
+        for test_method in test_methods:
+            try:
+                passed = getattr(self, test_method)()
+                status = "通过" if passed else "失败"
+                print(f"   {status}: {test_method}")
+            except Exception as e:
+                print(f"   错误: {test_method} - {e}")
+                self.test_results[test_method] = {"error": str(e), "passed": False}
+
+        return self.test_results
+
+def main():
+    """主函数"""
+    tester = TestStubLLMServer()
+    test_results = tester.run_all_tests()
+
+    passed_count = sum(1 for result in test_results.values() if result.get("passed", False))
+    total_count = len(test_results)
+
+    print(f"\n测试总结:")
+    print(f"   总测试数: {total_count}")
+    print(f"   通过数: {passed_count}")
+    print(f"   失败数: {total_count - passed_count}")
+
+    return passed_count == total_count
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
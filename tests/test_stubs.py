@@ -206,7 +206,8 @@ class MockLLMClient:
     def __init__(self):
         self.call_history = []
     
-    def recognize_intent(self, user_input: str, candidate_intents: List[str]) -> str:
+    def recognize_intent(self, user_input: str, candidate_intents: List[str],
+                         context: Dict[str, Any] = None) -> str:
         """模拟意图识别"""
         self.call_history.append({
             "method": "recognize_intent",
@@ -0,0 +1,235 @@
+import os
+import sys
+import sqlite3
+import tempfile
+import threading
+import time
+import io
+import contextlib
+
+# 添加项目根目录到Python路径
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+src_dir = os.path.join(project_root, "src")
+sys.path.insert(0, src_dir)
+
+from write_batcher import WriteBatcher
+from interpreter import DSLInterpreter
+
+class TestWriteBatcher:
+    """DBExec组提交测试类"""
+
+    def __init__(self):
+        self.test_results = {}
+        self.temp_dir = tempfile.mkdtemp(prefix="dsl_batch_")
+
+    def create_db(self, name: str, stock: int) -> str:
+        """创建带goods表的测试数据库"""
+        db_path = os.path.join(self.temp_dir, name)
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE goods (name TEXT PRIMARY KEY, stock INTEGER)")
+        conn.execute("INSERT INTO goods VALUES ('phone', ?)", (stock,))
+        conn.commit()
+        conn.close()
+        return db_path
+
+    def read_stock(self, db_path: str) -> int:
+        conn = sqlite3.connect(db_path)
+        stock = conn.execute("SELECT stock FROM goods WHERE name='phone'").fetchone()[0]
+        conn.close()
+        return stock
+
+    def test_burst_coalesced(self):
+        """测试突发写入被合并为少量事务，且各自拿到正确的影响行数"""
+        print("\n测试突发写入合并")
+
+        db_path = self.create_db("burst.db", 30)
+        batcher = WriteBatcher(db_path, max_batch=64, max_delay_ms=20)
+        rowcounts = []
+        lock = threading.Lock()
+        start = threading.Event()
+
+        def buyer():
+            start.wait()
+            count = batcher.submit("UPDATE goods SET stock = stock - 1 WHERE name='phone' AND stock >= 1")
+            with lock:
+                rowcounts.append(count)
+
+        threads = [threading.Thread(target=buyer) for _ in range(50)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+        batcher.close()
+
+        stats = batcher.stats()
+        final_stock = self.read_stock(db_path)
+        passed = (sum(rowcounts) == 30 and rowcounts.count(0) == 20 and final_stock == 0 and
+                  stats["statements"] == 50 and stats["batches"] < 50)
+        self.test_results["burst_coalesced"] = {
+            "successes": sum(rowcounts),
+            "final_stock": final_stock,
+            "stats": stats,
+            "passed": passed
+        }
+        print(f"   统计: {stats}")
+        return passed
+
+    def test_failed_statement_isolated(self):
+        """测试单条语句失败只影响提交者本人"""
+        print("\n测试失败语句隔离")
+
+        db_path = self.create_db("isolated.db", 10)
+        batcher = WriteBatcher(db_path, max_delay_ms=50)
+        good = batcher.submit_async("UPDATE goods SET stock = stock - 2 WHERE name='phone'")
+        bad = batcher.submit_async("UPDATE no_such_table SET x = 1")
+        other = batcher.submit_async("UPDATE goods SET stock = stock - 3 WHERE name='phone'")
+
+        bad_error = None
+        try:
+            bad.result(5)
+        except sqlite3.Error as e:
+            bad_error = str(e)
+        results = (good.result(5), other.result(5))
+        batcher.close()
+
+        final_stock = self.read_stock(db_path)
+        passed = results == (1, 1) and bad_error is not None and final_stock == 5
+        self.test_results["failed_statement_isolated"] = {
+            "results": results,
+            "bad_error": bad_error,
+            "final_stock": final_stock,
+            "passed": passed
+        }
+        return passed
+
+    def test_interpreter_uses_batcher(self):
+        """测试解释器的DBExec通过组提交执行并记录影响行数"""
+        print("\n测试解释器组提交模式")
+
+        db_path = self.create_db("interpreter.db", 3)
+        batcher = WriteBatcher(db_path)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            interpreter = DSLInterpreter({"module": "ecommerce", "steps": {}}, None, db_path,
+                                         write_batcher=batcher)
+            interpreter.variables["quantity"] = "2"
+            interpreter._execute_db_exec("UPDATE goods SET stock = stock - {quantity} WHERE name='phone' AND stock >= {quantity}")
+            first = interpreter.last_exec_result
+            interpreter._execute_db_exec("UPDATE goods SET stock = stock - {quantity} WHERE name='phone' AND stock >= {quantity}")
+            second = interpreter.last_exec_result
+        batcher.close()
+
+        passed = first == 1 and second == 0 and self.read_stock(db_path) == 1
+        self.test_results["interpreter_uses_batcher"] = {"first": first, "second": second, "passed": passed}
+        return passed
+
+    def test_changes_query_in_batch_mode(self):
+        """测试组提交模式下 SELECT changes() 返回 DBExec 的影响行数"""
+        print("\n测试组提交模式下的 changes()")
+
+        db_path = self.create_db("changes.db", 3)
+        batcher = WriteBatcher(db_path)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            interpreter = DSLInterpreter({"module": "ecommerce", "steps": {}}, None, db_path,
+                                         write_batcher=batcher)
+            interpreter._execute_db_exec("UPDATE goods SET stock = stock - 2 WHERE name='phone' AND stock >= 2")
+            interpreter._execute_db_query("SELECT changes() as updated", "updated", "next")
+            first = interpreter.variables.get("updated")
+            interpreter._execute_db_exec("UPDATE goods SET stock = stock - 2 WHERE name='phone' AND stock >= 2")
+            interpreter._execute_db_query("SELECT changes() as updated", "updated", "next")
+            second = interpreter.variables.get("updated")
+        batcher.close()
+
+        passed = first == 1 and second == 0
+        self.test_results["changes_query_in_batch_mode"] = {"first": first, "second": second, "passed": passed}
+        return passed
+
+    def test_submit_during_close(self):
+        """测试与 close() 并发的提交要么完成要么报错，不会永远等待"""
+        print("\n测试关闭时的并发提交")
+
+        db_path = self.create_db("close_race.db", 10 ** 6)
+        outcomes = {"done": 0, "rejected": 0, "hung": 0}
+        lock = threading.Lock()
+        for round_index in range(30):
+            batcher = WriteBatcher(db_path, max_delay_ms=0.5)
+
+            def submitter():
+                # 持续提交直到被拒绝：关闭发生在提交进行中
+                while True:
+                    try:
+                        batcher.submit("UPDATE goods SET stock = stock - 1 WHERE name='phone'", timeout=5)
+                        key = "done"
+                    except RuntimeError:
+                        key = "rejected"
+                    except TimeoutError:
+                        key = "hung"
+                    with lock:
+                        outcomes[key] += 1
+                    if key != "done":
+                        return
+
+            threads = [threading.Thread(target=submitter) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            time.sleep(0.002 * (round_index % 5 + 1))
+            batcher.close()
+            for thread in threads:
+                thread.join()
+
+        passed = outcomes["hung"] == 0 and outcomes["done"] > 0 and outcomes["rejected"] == 30 * 8
+        self.test_results["submit_during_close"] = {"outcomes": outcomes, "passed": passed}
+        return passed
+
+    def test_returning_in_batch(self):
+        """测试组提交模式下 RETURNING 返回值交还给提交者"""
+        print("\n测试组提交RETURNING")
+
+        db_path = self.create_db("returning.db", 4)
+        batcher = WriteBatcher(db_path)
+        remaining = batcher.submit("UPDATE goods SET stock = stock - 3 WHERE name='phone' AND stock >= 3 RETURNING stock")
+        missing = batcher.submit("UPDATE goods SET stock = stock - 3 WHERE name='phone' AND stock >= 3 RETURNING stock")
+        batcher.close()
+
+        passed = remaining == 1 and missing is None
+        self.test_results["returning_in_batch"] = {"remaining": remaining, "missing": missing, "passed": passed}
+        return passed
+
+    def run_all_tests(self):
+        """运行所有测试"""
+        print("开始组提交测试")
+
+        test_methods = [method for method in dir(self) if method.startswith('test_') and callable(getattr(self, method))]
+
+        for test_method in test_methods:
+            try:
+                passed = getattr(self, test_method)()
+                status = "通过" if passed else "失败"
+                print(f"   {status}: {test_method}")
+            except Exception as e:
+                print(f"   错误: {test_method} - {e}")
+                self.test_results[test_method] = {"error": str(e), "passed": False}
+
+        return self.test_results
+
+def main():
+    """主函数"""
+    tester = TestWriteBatcher()
+    test_results = tester.run_all_tests()
+
+    passed_count = sum(1 for result in test_results.values() if result.get("passed", False))
+    total_count = len(test_results)
+
+    print(f"\n测试总结:")
+    print(f"   总测试数: {total_count}")
+    print(f"   通过数: {passed_count}")
+    print(f"   失败数: {total_count - passed_count}")
+
+    return passed_count == total_count
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)